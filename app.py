@@ -1,18 +1,25 @@
 # app.py
 
+import importlib
 import streamlit as st
-from configs.config import LOG_LEVEL
-from ui.create_puzzle import run as run_create_puzzle
-from ui.map_piece import run as run_map_piece
-from ui.display_instructions import run as run_display_instructions
-import logging
+from configs.config import METRICS_ENABLED, METRICS_PORT
+from database.backends import warm_up
+from utils.logger import setup_logging
+from utils.metrics import start_http_server, trace
+
+# Secciones de la barra lateral y módulo de UI de cada una. Solo se importa
+# el de la sección elegida: el resto (y sus servicios) no cuesta al arrancar.
+PAGES = {
+    "1. Crear Puzzle": "ui.create_puzzle",
+    "2. Mapear Piezas": "ui.map_piece",
+    "3. Ver Instrucciones": "ui.display_instructions",
+    "4. Importar Piezas": "ui.import_pieces",
+    "5. Snapshots": "ui.snapshots",
+}
 
 def main():
-    # Configurar logger
-    logging.basicConfig(
-        format="%(asctime)s %(levelname)s %(message)s",
-        level=LOG_LEVEL
-    )
+    # Configurar logger (una sola configuración, la de utils.logger)
+    setup_logging()
 
     st.set_page_config(
         page_title="Puzzle Mapper",
@@ -20,25 +27,30 @@ def main():
         initial_sidebar_state="expanded"
     )
 
+    # Abre la conexión en segundo plano mientras se dibuja la página
+    warm_up()
+    if METRICS_ENABLED and METRICS_PORT:
+        start_http_server(METRICS_PORT)
+
     # Sidebar de navegación
     st.sidebar.title("Puzzle Mapper")
-    page = st.sidebar.radio(
-        "🗂️ Elige una sección:",
-        ("1. Crear Puzzle", "2. Mapear Piezas", "3. Ver Instrucciones")
-    )
+    page = st.sidebar.radio("🗂️ Elige una sección:", tuple(PAGES))
+    profiling = METRICS_ENABLED and st.sidebar.checkbox("Mostrar perfilado", value=False)
 
     # Encabezado común
     st.markdown("## 🧩 Puzzle Mapper App")
 
     # Ruteo a la sección correspondiente
-    if page.startswith("1"):
-        run_create_puzzle()
-    elif page.startswith("2"):
-        run_map_piece()
-    elif page.startswith("3"):
-        run_display_instructions()
-    else:
+    module = PAGES.get(page)
+    if module is None:
         st.error("Sección no válida")
+        return
+    # Se miden todas las llamadas del rerun para el panel de perfilado
+    with trace() as rerun:
+        importlib.import_module(module).run()
+    if profiling:
+        from ui.profiling import render_panel
+        render_panel(rerun)
 
 if __name__ == "__main__":
     main()
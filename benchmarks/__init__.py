@@ -0,0 +1,8 @@
+# benchmarks/__init__.py
+"""
+Benchmarks de rendimiento con puzzles sintéticos.
+
+`generator` crea puzzles de distintas formas y tamaños, `backend` elige la
+base de datos (MongoDB local o en memoria) y `runner` mide las rutas de
+datos de la aplicación. Se ejecutan con `python -m benchmarks`.
+"""
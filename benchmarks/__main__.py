@@ -0,0 +1,100 @@
+# benchmarks/__main__.py
+"""
+Línea de comandos de los benchmarks.
+
+Ejemplos:
+    python -m benchmarks --backend mongomock --shapes grid,spiral --sizes 100,1000
+    python -m benchmarks --backend local --sizes 100000 --output actual.json
+    python -m benchmarks --sizes 1000 --compare base.json --output actual.json
+
+El informe JSON se escribe en --output (o en la salida estándar). Con
+--compare, se listan los benchmarks cuya latencia p50 empeoró respecto al
+informe base y el proceso termina con código 1 si hay alguno.
+"""
+
+import argparse
+import json
+import platform
+import subprocess
+import sys
+from datetime import datetime, timezone
+
+from benchmarks.backend import BACKENDS, setup_backend
+from benchmarks.generator import SHAPES
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", choices=BACKENDS, default="mongomock")
+    parser.add_argument("--shapes", default=",".join(SHAPES),
+                        help="formas separadas por coma (%(default)s)")
+    parser.add_argument("--sizes", default="100,1000,10000",
+                        help="número de piezas separados por coma, hasta 1000000 (%(default)s)")
+    parser.add_argument("--repeat", type=int, default=5, help="repeticiones por benchmark")
+    parser.add_argument("--writes", type=int, default=50, help="llamadas a add_or_update_piece")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="archivo JSON de salida (por defecto, stdout)")
+    parser.add_argument("--compare", help="informe JSON base para detectar regresiones")
+    parser.add_argument("--threshold", type=float, default=1.2,
+                        help="factor de empeoramiento de p50 que cuenta como regresión")
+    args = parser.parse_args(argv)
+
+    shapes = [s.strip() for s in args.shapes.split(",") if s.strip()]
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    for shape in shapes:
+        if shape not in SHAPES:
+            parser.error(f"forma desconocida: {shape}")
+
+    setup_backend(args.backend)
+    from benchmarks.runner import compare, run_suite
+
+    results = []
+    for shape in shapes:
+        for size in sizes:
+            print(f"· {shape} / {size} piezas", file=sys.stderr)
+            results.append(run_suite(shape, size, args.repeat, args.seed, args.writes))
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "commit": _git_commit(),
+            "backend": args.backend,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "repeat": args.repeat,
+        },
+        "results": results,
+    }
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, report, args.threshold)
+        for line in regressions:
+            print(f"REGRESIÓN {line}", file=sys.stderr)
+        if regressions:
+            return 1
+    return 0
+
+
+def _git_commit():
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True
+        )
+        return out.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,116 @@
+# benchmarks/backend.py
+"""
+Base de datos sobre la que corren los benchmarks.
+
+- "local": el almacenamiento configurado (STORAGE_BACKEND; con MongoDB, el
+  indicado por MONGO_URI/DB_NAME, p. ej. un mongod local). Los benchmarks
+  crean y borran sus propios puzzles, pero conviene usar una base de datos
+  dedicada.
+- "mongomock": un MongoDB en memoria dentro del mismo proceso (paquete
+  opcional `mongomock`). Mide el código de la aplicación sin red; los tiempos
+  de consulta no son representativos de un servidor real.
+- "memory" y "sqlite": los backends del mismo nombre (ver `database.backends`);
+  SQLite, sobre un archivo temporal que se borra al salir.
+
+`setup_backend` debe llamarse antes de importar `database.repositories`
+(o cualquier servicio), porque la configuración se lee al importarse.
+"""
+
+import asyncio
+import atexit
+import os
+import shutil
+import sys
+import tempfile
+
+BACKENDS = ("mongomock", "memory", "sqlite", "local")
+
+
+def setup_backend(name: str) -> None:
+    if name == "local":
+        return
+    if name not in BACKENDS:
+        raise ValueError(f"Backend desconocido: '{name}'. Opciones: {', '.join(BACKENDS)}.")
+    if "configs.config" in sys.modules:
+        raise RuntimeError("setup_backend debe llamarse antes de importar los repositorios.")
+    if name in ("memory", "sqlite"):
+        os.environ["STORAGE_BACKEND"] = name
+        if name == "sqlite":
+            tmp = tempfile.mkdtemp(prefix="puzzle-bench-")
+            atexit.register(shutil.rmtree, tmp, ignore_errors=True)
+            os.environ["SQLITE_PATH"] = os.path.join(tmp, "bench.db")
+        return
+    try:
+        import mongomock
+    except ImportError as exc:
+        raise ImportError(
+            "El backend 'mongomock' requiere el paquete opcional mongomock (pip install mongomock)."
+        ) from exc
+
+    # configs.config exige estas variables aunque no se use un servidor real
+    os.environ["STORAGE_BACKEND"] = "mongo"
+    os.environ.setdefault("MONGO_URI", "mongodb://localhost")
+    os.environ.setdefault("DB_NAME", "puzzle_benchmarks")
+
+    import database.async_client as async_client
+    import database.client as client
+
+    client._client = mongomock.MongoClient()
+    async_client._client = _AsyncClient(client._client)
+
+# ─── A D A P T A D O R   A S Í N C R O N O ────────────────────────────────────
+# mongomock solo ofrece la API síncrona: se envuelve para que la capa
+# asíncrona (`async_repositories`) funcione sobre los mismos datos.
+
+class _AsyncCursor:
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def sort(self, *args, **kwargs) -> "_AsyncCursor":
+        self._cursor = self._cursor.sort(*args, **kwargs)
+        return self
+
+    def limit(self, n: int) -> "_AsyncCursor":
+        self._cursor = self._cursor.limit(n)
+        return self
+
+    async def to_list(self, length=None) -> list:
+        return list(self._cursor)
+
+
+class _AsyncCollection:
+    def __init__(self, collection):
+        self._collection = collection
+
+    def find(self, *args, **kwargs) -> _AsyncCursor:
+        return _AsyncCursor(self._collection.find(*args, **kwargs))
+
+    async def aggregate(self, *args, **kwargs) -> _AsyncCursor:
+        return _AsyncCursor(self._collection.aggregate(*args, **kwargs))
+
+    def __getattr__(self, name):
+        method = getattr(self._collection, name)
+
+        async def call(*args, **kwargs):
+            await asyncio.sleep(0)
+            return method(*args, **kwargs)
+        return call
+
+
+class _AsyncDatabase:
+    def __init__(self, db):
+        self._db = db
+
+    def __getattr__(self, name) -> _AsyncCollection:
+        return _AsyncCollection(self._db[name])
+
+    def __getitem__(self, name) -> _AsyncCollection:
+        return _AsyncCollection(self._db[name])
+
+
+class _AsyncClient:
+    def __init__(self, client):
+        self._client = client
+
+    def __getitem__(self, name) -> _AsyncDatabase:
+        return _AsyncDatabase(self._client[name])
@@ -0,0 +1,147 @@
+# benchmarks/generator.py
+"""
+Generador de puzzles sintéticos para los benchmarks.
+
+Cada forma coloca las piezas en una cuadrícula y las conecta con sus vecinas
+ortogonales; el edgeId sigue la convención de `EDGE_DIRECTION`
+(1 norte, 2 este, 3 sur, 4 oeste) y los tipos son complementarios
+(una pieza es "macho" donde su vecina es "hembra").
+
+Formas disponibles:
+- "grid":    rectángulo casi cuadrado completo.
+- "spiral":  una sola cadena enrollada en espiral (recorridos muy profundos).
+- "islands": muchas cuadrículas pequeñas sin conexión entre sí.
+- "dense":   mancha irregular crecida al azar, con huecos y bordes dentados.
+
+Los documentos generados tienen la forma que espera `bulk_upsert_pieces`:
+{code, sector, edges, neighbors}.
+"""
+
+import math
+import random
+from typing import Dict, Iterator, List, Optional, Tuple
+
+SHAPES = ("grid", "spiral", "islands", "dense")
+SECTORS = ["NO", "NE", "SO", "SE"]
+
+# (dx, dy) de cada edgeId; y crece hacia el sur
+_DIRECTIONS = {1: (0, -1), 2: (1, 0), 3: (0, 1), 4: (-1, 0)}
+
+Cell = Tuple[int, int]
+
+
+def generate_pieces(shape: str, size: int, seed: int = 0) -> List[dict]:
+    """
+    Genera `size` piezas con la forma indicada. Con la misma semilla el
+    resultado es siempre el mismo, para comparar versiones entre sí.
+    """
+    if size < 1:
+        raise ValueError("size debe ser mayor que cero.")
+    if shape == "grid":
+        cells = list(_grid_cells(size))
+    elif shape == "spiral":
+        cells = list(_spiral_cells(size))
+        return _to_documents(cells, links=set(zip(cells, cells[1:])))
+    elif shape == "islands":
+        cells = list(_island_cells(size))
+    elif shape == "dense":
+        cells = _dense_cells(size, random.Random(seed))
+    else:
+        raise ValueError(f"Forma desconocida: '{shape}'. Opciones: {', '.join(SHAPES)}.")
+    return _to_documents(cells)
+
+
+def piece_code(i: int) -> str:
+    return f"P{i + 1}"
+
+# ─── F O R M A S ──────────────────────────────────────────────────────────────
+
+def _grid_cells(size: int) -> Iterator[Cell]:
+    width = math.ceil(math.sqrt(size))
+    for i in range(size):
+        yield i % width, i // width
+
+
+def _spiral_cells(size: int) -> Iterator[Cell]:
+    # Espiral cuadrada desde el centro: tramos de 1, 1, 2, 2, 3, 3...
+    x = y = 0
+    yield x, y
+    produced, step, d = 1, 1, 0
+    order = (2, 3, 4, 1)  # este, sur, oeste, norte
+    while produced < size:
+        for _ in range(2):
+            dx, dy = _DIRECTIONS[order[d % 4]]
+            for _ in range(step):
+                if produced == size:
+                    return
+                x, y = x + dx, y + dy
+                yield x, y
+                produced += 1
+            d += 1
+        step += 1
+
+
+def _island_cells(size: int, island_size: int = 25) -> Iterator[Cell]:
+    # Islas de hasta 5x5 separadas por una columna vacía
+    side = math.ceil(math.sqrt(island_size))
+    per_row = max(1, math.ceil(math.sqrt(math.ceil(size / island_size))))
+    for i in range(size):
+        island, k = divmod(i, island_size)
+        ox = (island % per_row) * (side + 1)
+        oy = (island // per_row) * (side + 1)
+        yield ox + k % side, oy + k // side
+
+
+def _dense_cells(size: int, rng: random.Random) -> List[Cell]:
+    # Crecimiento aleatorio desde el centro: cada pieza nueva se pega a una
+    # celda libre junto a una pieza existente elegida al azar
+    cells: List[Cell] = [(0, 0)]
+    taken = {(0, 0)}
+    while len(cells) < size:
+        cx, cy = cells[rng.randrange(len(cells))]
+        dx, dy = _DIRECTIONS[rng.randint(1, 4)]
+        cell = (cx + dx, cy + dy)
+        if cell not in taken:
+            taken.add(cell)
+            cells.append(cell)
+    return cells
+
+# ─── D O C U M E N T O S ──────────────────────────────────────────────────────
+
+def _to_documents(
+    cells: List[Cell],
+    links: Optional[set] = None
+) -> List[dict]:
+    """
+    Convierte celdas en documentos de pieza. Sin `links`, se conectan todas
+    las celdas adyacentes; con `links`, solo esos pares (en ambos sentidos).
+    """
+    index: Dict[Cell, int] = {cell: i for i, cell in enumerate(cells)}
+    if links is not None:
+        linked = links | {(b, a) for a, b in links}
+
+    xs = [x for x, _ in cells]
+    ys = [y for _, y in cells]
+    mid_x = (min(xs) + max(xs)) / 2
+    mid_y = (min(ys) + max(ys)) / 2
+
+    docs = []
+    for i, (x, y) in enumerate(cells):
+        edges, neighbors = [], []
+        for eid, (dx, dy) in _DIRECTIONS.items():
+            # Tipo complementario con la vecina: depende de la paridad de la celda
+            male = (x + y + eid) % 2 == 0
+            edges.append({"edgeId": eid, "type": "macho" if male else "hembra"})
+            j = index.get((x + dx, y + dy))
+            if j is not None and (links is None or ((x, y), cells[j]) in linked):
+                neighbors.append({"edgeId": eid, "neighborCode": piece_code(j)})
+            else:
+                neighbors.append({"edgeId": eid, "neighborCode": None})
+        sector = SECTORS[(x > mid_x) + 2 * (y > mid_y)]
+        docs.append({
+            "code": piece_code(i),
+            "sector": sector,
+            "edges": edges,
+            "neighbors": neighbors,
+        })
+    return docs
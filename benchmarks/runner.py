@@ -0,0 +1,213 @@
+# benchmarks/runner.py
+"""
+Ejecución y medición de los benchmarks.
+
+Cada benchmark se repite `repeat` veces midiendo la latencia de cada llamada;
+después se ejecuta una vez más bajo `tracemalloc` para obtener el pico de
+memoria (aparte, porque tracemalloc ralentiza la ejecución). El resultado es
+un diccionario serializable a JSON con throughput, percentiles de latencia
+y memoria pico por benchmark.
+
+Los servicios se importan dentro de las funciones: el backend de la base de
+datos tiene que configurarse antes (ver `benchmarks.backend`).
+"""
+
+import io
+import json
+import math
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional
+
+from benchmarks.generator import SECTORS, generate_pieces
+
+# Resultado serializable a JSON
+Result = Dict[str, Any]
+
+
+def measure(
+    fn: Callable[[], Any],
+    repeat: int,
+    setup: Optional[Callable[[], None]] = None,
+    items: Optional[Callable[[Any], int]] = None
+) -> Result:
+    """
+    Mide `fn` `repeat` veces (más una bajo tracemalloc). `setup` se llama
+    antes de cada ejecución, fuera del tiempo medido; `items` indica cuántos
+    elementos procesó cada llamada a partir de su resultado (por defecto 1).
+    """
+    latencies: List[float] = []
+    processed = 0
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        result = fn()
+        latencies.append(time.perf_counter() - start)
+        processed += items(result) if items else 1
+
+    if setup:
+        setup()
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    total = sum(latencies)
+    latencies.sort()
+    return {
+        "iterations": repeat,
+        "items": processed,
+        "total_s": round(total, 6),
+        "throughput_per_s": round(processed / total, 2) if total > 0 else None,
+        "latency_ms": {
+            "mean": _ms(total / repeat),
+            "p50": _ms(percentile(latencies, 50)),
+            "p90": _ms(percentile(latencies, 90)),
+            "p99": _ms(percentile(latencies, 99)),
+            "max": _ms(latencies[-1]),
+        },
+        "peak_memory_mb": round(peak / 2**20, 3),
+    }
+
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    """Percentil `p` (0-100) por interpolación lineal sobre valores ordenados."""
+    if not sorted_values:
+        return math.nan
+    k = (len(sorted_values) - 1) * p / 100
+    lo, hi = math.floor(k), math.ceil(k)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+def _ms(seconds: float) -> float:
+    return round(seconds * 1000, 3)
+
+# ─── S U I T E ────────────────────────────────────────────────────────────────
+
+def run_suite(shape: str, size: int, repeat: int = 5, seed: int = 0, writes: int = 50) -> Result:
+    """
+    Crea un puzzle sintético, mide las rutas de datos de la aplicación sobre
+    él y lo borra al terminar.
+    """
+    from database.repositories import delete_instruction_plans
+    from services import read_cache
+    from services.import_service import import_pieces
+    from services.instruction_cache import invalidate_puzzle
+    from services.instruction_service import generate_instructions, get_instruction_window
+    from services.puzzle_service import (
+        add_or_update_piece, add_puzzle, list_piece_codes,
+        list_piece_summaries, list_pieces, list_puzzle_summaries, load_graph, remove_puzzle,
+    )
+
+    start = time.perf_counter()
+    docs = generate_pieces(shape, size, seed)
+    generated_s = time.perf_counter() - start
+    start_code = docs[0]["code"]
+
+    puzzle = add_puzzle(f"bench-{shape}-{size}", size, SECTORS)
+    pid = puzzle.id
+
+    def cold_reads() -> None:
+        read_cache.clear()
+
+    def cold_instructions() -> None:
+        delete_instruction_plans(pid)
+        invalidate_puzzle(pid)
+
+    results: Dict[str, Result] = {}
+    try:
+        jsonl = "\n".join(json.dumps(d) for d in docs)
+        results["import_pieces"] = measure(
+            lambda: import_pieces(pid, io.StringIO(jsonl), fmt="json"),
+            1, items=lambda report: report.processed,
+        )
+
+        results["list_pieces"] = measure(
+            lambda: list_pieces(pid), repeat, setup=cold_reads, items=len
+        )
+        results["list_pieces_cached"] = measure(lambda: list_pieces(pid), repeat, items=len)
+        results["load_graph"] = measure(lambda: load_graph(pid), repeat, items=len)
+
+        sample = docs[:max(1, min(writes, size))]
+        results["add_or_update_piece"] = measure(
+            _round_robin(lambda d: add_or_update_piece(
+                pid, d["code"], d["sector"], d["edges"], d["neighbors"]
+            ), sample),
+            len(sample),
+        )
+
+        results["generate_instructions"] = measure(
+            lambda: generate_instructions(pid, start_code),
+            repeat, setup=cold_instructions, items=len,
+        )
+        results["generate_instructions_cached"] = measure(
+            lambda: generate_instructions(pid, start_code), repeat, items=len
+        )
+
+        # Rutas de datos de las páginas de Streamlit (primera carga, sin caché)
+        results["ui_puzzle_list"] = measure(
+            lambda: list_puzzle_summaries()[0], repeat, setup=cold_reads, items=len
+        )
+        results["ui_piece_page"] = measure(
+            lambda: list_piece_summaries(pid)[0], repeat, setup=cold_reads, items=len
+        )
+        results["ui_piece_codes"] = measure(
+            lambda: list_piece_codes(pid), repeat, setup=cold_reads, items=len
+        )
+        results["ui_instruction_window"] = measure(
+            lambda: get_instruction_window(pid, start_code, 0, 50),
+            repeat, setup=cold_instructions, items=len,
+        )
+    finally:
+        remove_puzzle(pid)
+
+    return {
+        "shape": shape,
+        "size": size,
+        "seed": seed,
+        "generate_s": round(generated_s, 6),
+        "benchmarks": results,
+    }
+
+
+def _round_robin(fn: Callable[[Any], Any], items: List[Any]) -> Callable[[], Any]:
+    """Función sin argumentos que aplica `fn` a cada elemento por turnos."""
+    state = {"i": 0}
+
+    def call() -> Any:
+        item = items[state["i"] % len(items)]
+        state["i"] += 1
+        return fn(item)
+    return call
+
+# ─── C O M P A R A C I Ó N ────────────────────────────────────────────────────
+
+def compare(baseline: Result, current: Result, threshold: float = 1.2) -> List[str]:
+    """
+    Compara la latencia p50 de dos informes (mismas formas y tamaños) y
+    devuelve una línea por benchmark que empeoró más de `threshold` veces.
+    """
+    def index(report: Result) -> Dict[tuple, Result]:
+        return {
+            (suite["shape"], suite["size"], name): bench
+            for suite in report["results"]
+            for name, bench in suite["benchmarks"].items()
+        }
+
+    before = index(baseline)
+    regressions = []
+    for key, bench in sorted(index(current).items()):
+        old = before.get(key)
+        if not old:
+            continue
+        old_p50, new_p50 = old["latency_ms"]["p50"], bench["latency_ms"]["p50"]
+        if old_p50 > 0 and new_p50 / old_p50 > threshold:
+            shape, size, name = key
+            regressions.append(
+                f"{shape}/{size} {name}: p50 {old_p50:.3f} ms -> {new_p50:.3f} ms "
+                f"(x{new_p50 / old_p50:.2f})"
+            )
+    return regressions
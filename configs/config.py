@@ -1,9 +1,13 @@
 """
 Configuración global del proyecto.
 
-Carga las variables de entorno definidas en el archivo .env y valida
-que las obligatorias estén presentes (MONGO_URI, DB_NAME).
-También define el nivel de logging por defecto.
+Carga las variables de entorno definidas en el archivo .env y elige el
+backend de almacenamiento. También define el nivel de logging por defecto,
+las opciones del cliente de MongoDB y los límites de las cachés.
+
+Importar este módulo no falla aunque falten variables: las obligatorias de
+MongoDB (MONGO_URI, DB_NAME) se validan con `require_mongo_settings()` al
+abrir la primera conexión.
 """
 
 import os
@@ -12,15 +16,67 @@ from dotenv import load_dotenv
 # Carga variables de entorno desde .env
 load_dotenv()
 
+# Backend de almacenamiento: "mongo" (por defecto), "memory" o "sqlite"
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "mongo").strip().lower()
+
+# Archivo de la base de datos con el backend "sqlite"
+SQLITE_PATH = os.getenv("SQLITE_PATH", "puzzles.db")
+
 # Conexión a MongoDB
 MONGO_URI = os.getenv("MONGO_URI")
 DB_NAME   = os.getenv("DB_NAME")
 
+# Pool de conexiones (por cliente, síncrono y asíncrono)
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", 20))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", 2))
+MONGO_MAX_IDLE_TIME_MS = int(os.getenv("MONGO_MAX_IDLE_TIME_MS", 60_000))
+
+# Tiempo máximo (ms) para encontrar un servidor disponible antes de fallar
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", 5_000))
+
+# Compresión del protocolo, en orden de preferencia (p. ej. "zstd,snappy,zlib").
+# zstd y snappy requieren los paquetes opcionales zstandard y python-snappy;
+# vacío = sin compresión
+MONGO_COMPRESSORS = [
+    c.strip().lower() for c in os.getenv("MONGO_COMPRESSORS", "").split(",") if c.strip()
+]
+
 # Nivel de logging
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
 
-# Validaciones básicas
-if not MONGO_URI:
-    raise ValueError("La variable de entorno MONGO_URI no está definida.")
-if not DB_NAME:
-    raise ValueError("La variable de entorno DB_NAME no está definida.")
+# Memoria máxima (bytes) de la caché de instrucciones generadas
+INSTRUCTION_CACHE_MAX_BYTES = int(os.getenv("INSTRUCTION_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+
+# Tiempo (segundos) que un proceso da por buena la revisión de un puzzle que
+# ya conoce antes de volver a leerla (para ver escrituras de otros procesos)
+REVISION_TTL_SECONDS = float(os.getenv("REVISION_TTL_SECONDS", 2))
+
+# Caché de lecturas de puzzles y piezas: vida de cada entrada (segundos) y
+# máximo de elementos cacheados (una lista de N piezas cuenta como N)
+READ_CACHE_TTL_SECONDS = float(os.getenv("READ_CACHE_TTL_SECONDS", 30))
+READ_CACHE_MAX_ITEMS = int(os.getenv("READ_CACHE_MAX_ITEMS", 100_000))
+
+# Vida (segundos) de la reserva de revisión de una escritura de piezas: si el
+# proceso que la reservó no la libera antes, deja de retener la revisión publicada
+REVISION_LEASE_SECONDS = float(os.getenv("REVISION_LEASE_SECONDS", 300))
+
+# Guardado diferido de piezas (services.write_behind): activado, piezas por
+# lote y espera máxima (segundos) de una pieza en la cola antes de escribirse
+WRITE_BEHIND_ENABLED = os.getenv("WRITE_BEHIND_ENABLED", "false").strip().lower() in ("1", "true", "yes")
+WRITE_BEHIND_BATCH_SIZE = int(os.getenv("WRITE_BEHIND_BATCH_SIZE", 100))
+WRITE_BEHIND_FLUSH_SECONDS = float(os.getenv("WRITE_BEHIND_FLUSH_SECONDS", 0.5))
+
+# Instrumentación (utils.metrics): activada, medición de bytes (serializa
+# cada resultado, costoso), umbral de aviso de llamadas lentas (ms, 0 = sin
+# aviso) y puerto HTTP opcional para exponer /metrics a Prometheus
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").strip().lower() in ("1", "true", "yes")
+METRICS_TRACK_BYTES = os.getenv("METRICS_TRACK_BYTES", "false").strip().lower() in ("1", "true", "yes")
+METRICS_SLOW_CALL_MS = float(os.getenv("METRICS_SLOW_CALL_MS", 1_000))
+METRICS_PORT = int(os.getenv("METRICS_PORT") or 0) or None
+
+def require_mongo_settings() -> None:
+    """Valida las variables obligatorias de MongoDB; se llama al conectar."""
+    if not MONGO_URI:
+        raise ValueError("La variable de entorno MONGO_URI no está definida.")
+    if not DB_NAME:
+        raise ValueError("La variable de entorno DB_NAME no está definida.")
@@ -0,0 +1,85 @@
+# database/async_client.py
+"""
+Conexión asíncrona a MongoDB.
+
+Streamlit ejecuta las páginas de forma síncrona, así que el cliente
+`AsyncMongoClient` vive en un bucle de eventos propio, en un hilo de fondo:
+`run_sync()` ejecuta ahí una corrutina y espera su resultado, y
+`run_concurrently()` lanza varias lecturas independientes a la vez, de modo
+que la latencia total es la de la consulta más lenta y no la suma de todas.
+
+El cliente usa las mismas opciones que el síncrono y, como él, se crea en
+la primera llamada a `get_async_db()` y asegura los índices si ningún
+cliente lo ha hecho aún (`database.indexes.ensure_indexes_once`).
+"""
+
+import asyncio
+import contextvars
+import threading
+from typing import Any, Awaitable, Coroutine, List, TypeVar
+
+from configs.config import MONGO_URI, DB_NAME, require_mongo_settings
+from database.client import CLIENT_OPTIONS
+
+T = TypeVar("T")
+
+_loop = None
+_loop_lock = threading.Lock()
+_client = None
+_client_lock = threading.Lock()
+
+def _get_loop() -> asyncio.AbstractEventLoop:
+    """Bucle de eventos de fondo, creado en la primera llamada."""
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(
+                target=loop.run_forever, name="mongo-async", daemon=True
+            ).start()
+            _loop = loop
+    return _loop
+
+def run_sync(coro: Coroutine[Any, Any, T]) -> T:
+    """
+    Ejecuta una corrutina en el bucle del cliente asíncrono y devuelve su
+    resultado. No debe llamarse desde dentro de ese mismo bucle.
+    La corrutina ve las ContextVars del hilo que llama (p. ej. la traza de
+    `utils.metrics`), como si se ejecutara en él.
+    """
+    context = contextvars.copy_context()
+
+    async def in_caller_context() -> T:
+        for var, value in context.items():
+            var.set(value)
+        return await coro
+    return asyncio.run_coroutine_threadsafe(in_caller_context(), _get_loop()).result()
+
+def run_concurrently(*aws: Awaitable[Any]) -> List[Any]:
+    """
+    Ejecuta varias consultas independientes a la vez y devuelve sus
+    resultados en el mismo orden. Si alguna falla, se propaga su excepción.
+    """
+    async def gather() -> List[Any]:
+        return list(await asyncio.gather(*aws))
+    return run_sync(gather())
+
+def get_async_db():
+    """
+    Devuelve la base de datos DB_NAME sobre un `AsyncMongoClient` único.
+    El cliente se crea dentro del bucle de fondo, al que queda ligado.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                require_mongo_settings()
+                from pymongo import AsyncMongoClient
+                from database.indexes import ensure_indexes_async, ensure_indexes_once
+
+                async def create() -> AsyncMongoClient:
+                    return AsyncMongoClient(MONGO_URI, **CLIENT_OPTIONS)
+                client = run_sync(create())
+                ensure_indexes_once(lambda: run_sync(ensure_indexes_async(client[DB_NAME])))
+                _client = client
+    return _client[DB_NAME]
@@ -0,0 +1,231 @@
+# database/async_repositories.py
+"""
+Variante asíncrona de `repositories.py`.
+
+Expone las mismas funciones, con los mismos parámetros y resultados, pero
+como corrutinas: los servicios pueden lanzar lecturas independientes a la
+vez con `run_concurrently` (ver `database.async_client`). Con MongoDB se
+usa `AsyncMongoClient`; con los demás backends, el repositorio síncrono
+ejecutado en hilos (ver `database.backends`). Cada llamada se mide con
+`utils.metrics` (capa "async_repository").
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+from database.backends import get_async_repository as _repo
+from utils.metrics import timed
+
+# ─── P U Z Z L E S ────────────────────────────────────────────────────────────
+
+@timed("async_repository")
+async def create_puzzle(puzzle_doc: dict) -> dict:
+    """Inserta un nuevo puzzle y devuelve el documento creado (con _id)."""
+    return await _repo().create_puzzle(puzzle_doc)
+
+@timed("async_repository")
+async def get_puzzle_by_id(puzzle_id: str) -> Optional[dict]:
+    """Obtiene un puzzle por su _id (string)."""
+    return await _repo().get_puzzle_by_id(puzzle_id)
+
+@timed("async_repository")
+async def get_all_puzzles() -> List[dict]:
+    """Devuelve todos los puzzles."""
+    return await _repo().get_all_puzzles()
+
+@timed("async_repository")
+async def get_puzzles_page(
+    after_id: Optional[str] = None,
+    limit: int = 50,
+    projection: Optional[Dict[str, Any]] = None,
+    descending: bool = False
+) -> List[dict]:
+    """Página de puzzles ordenada por _id, paginada por clave (ver repositories)."""
+    return await _repo().get_puzzles_page(after_id, limit, projection, descending)
+
+@timed("async_repository")
+async def update_puzzle(puzzle_id: str, update_doc: dict) -> Optional[dict]:
+    """Actualiza campos de un puzzle y devuelve el puzzle actualizado."""
+    return await _repo().update_puzzle(puzzle_id, update_doc)
+
+@timed("async_repository")
+async def upsert_puzzle(puzzle_id: str, update_doc: dict) -> dict:
+    """Actualiza un puzzle o lo crea con ese _id si no existe, de forma atómica."""
+    return await _repo().upsert_puzzle(puzzle_id, update_doc)
+
+@timed("async_repository")
+async def reserve_puzzle_revision(puzzle_id: str, writer: str) -> int:
+    """
+    Reserva atómicamente la siguiente revisión del puzzle para una escritura
+    de piezas (`writer` la identifica) y la devuelve. No se publica hasta
+    `publish_puzzle_revision`.
+    """
+    return await _repo().reserve_puzzle_revision(puzzle_id, writer)
+
+@timed("async_repository")
+async def publish_puzzle_revision(puzzle_id: str, writer: str) -> int:
+    """
+    Libera la reserva de `writer` y, si no queda ninguna viva, publica la
+    última revisión reservada. Devuelve la revisión publicada.
+    """
+    return await _repo().publish_puzzle_revision(puzzle_id, writer)
+
+@timed("async_repository")
+async def get_puzzle_revision(puzzle_id: str) -> int:
+    """Devuelve la revisión publicada del puzzle (0 si nunca se modificaron sus piezas)."""
+    return await _repo().get_puzzle_revision(puzzle_id)
+
+@timed("async_repository")
+async def delete_puzzle(puzzle_id: str) -> bool:
+    """Elimina un puzzle. Devuelve True si se borró al menos un documento."""
+    return await _repo().delete_puzzle(puzzle_id)
+
+# ─── P I E C E S ───────────────────────────────────────────────────────────────
+
+@timed("async_repository")
+async def create_piece(piece_doc: dict) -> dict:
+    """Inserta una nueva pieza y devuelve el documento creado (con _id)."""
+    return await _repo().create_piece(piece_doc)
+
+@timed("async_repository")
+async def get_piece_by_id(piece_id: str) -> Optional[dict]:
+    """Obtiene una pieza por su _id (string)."""
+    return await _repo().get_piece_by_id(piece_id)
+
+@timed("async_repository")
+async def get_piece_by_code(puzzle_id: str, code: str) -> Optional[dict]:
+    """Busca una pieza dentro de un puzzle por su código legible (P1, P2…)."""
+    return await _repo().get_piece_by_code(puzzle_id, code)
+
+@timed("async_repository")
+async def get_pieces_by_puzzle(
+    puzzle_id: str,
+    projection: Optional[Dict[str, Any]] = None
+) -> List[dict]:
+    """Devuelve todas las piezas de un puzzle, con proyección opcional."""
+    return await _repo().get_pieces_by_puzzle(puzzle_id, projection)
+
+@timed("async_repository")
+async def get_pieces_page(
+    puzzle_id: str,
+    after_code: Optional[str] = None,
+    limit: int = 100,
+    projection: Optional[Dict[str, Any]] = None
+) -> List[dict]:
+    """Página de piezas de un puzzle ordenada por código (ver repositories)."""
+    return await _repo().get_pieces_page(puzzle_id, after_code, limit, projection)
+
+@timed("async_repository")
+async def get_pieces_by_sector(
+    puzzle_id: str,
+    sector: str,
+    projection: Optional[Dict[str, Any]] = None
+) -> List[dict]:
+    """Piezas de un sector del puzzle (índice puzzleId_sector)."""
+    return await _repo().get_pieces_by_sector(puzzle_id, sector, projection)
+
+@timed("async_repository")
+async def get_pieces_by_codes(
+    puzzle_id: str,
+    codes: List[str],
+    projection: Optional[Dict[str, Any]] = None
+) -> List[dict]:
+    """Piezas del puzzle con alguno de los códigos indicados."""
+    return await _repo().get_pieces_by_codes(puzzle_id, codes, projection)
+
+@timed("async_repository")
+async def get_pieces_changed_since(
+    puzzle_id: str,
+    revision: int,
+    projection: Optional[Dict[str, Any]] = None
+) -> List[dict]:
+    """Piezas escritas después de la revisión `revision` del puzzle."""
+    return await _repo().get_pieces_changed_since(puzzle_id, revision, projection)
+
+@timed("async_repository")
+async def count_pieces_by_sector(puzzle_id: str) -> Dict[str, int]:
+    """Número de piezas por sector, agregado en la base de datos."""
+    return await _repo().count_pieces_by_sector(puzzle_id)
+
+@timed("async_repository")
+async def get_sector_links(puzzle_id: str) -> List[dict]:
+    """Enlaces entre sectores distintos: {fromSector, toSector, count}."""
+    return await _repo().get_sector_links(puzzle_id)
+
+@timed("async_repository")
+async def update_piece(piece_id: str, update_doc: dict) -> Optional[dict]:
+    """Actualiza campos de una pieza y devuelve la pieza actualizada."""
+    return await _repo().update_piece(piece_id, update_doc)
+
+@timed("async_repository")
+async def upsert_piece(puzzle_id: str, code: str, update_doc: dict) -> dict:
+    """Actualiza la pieza (puzzleId, code) o la crea si no existe, de forma atómica."""
+    return await _repo().upsert_piece(puzzle_id, code, update_doc)
+
+@timed("async_repository")
+async def bulk_upsert_pieces(puzzle_id: str, piece_docs: List[dict]) -> Dict[str, int]:
+    """Inserta o actualiza un lote de piezas en un solo bulk_write no ordenado."""
+    return await _repo().bulk_upsert_pieces(puzzle_id, piece_docs)
+
+@timed("async_repository")
+async def delete_piece(piece_id: str) -> bool:
+    """Elimina una pieza. Devuelve True si se borró al menos un documento."""
+    return await _repo().delete_piece(piece_id)
+
+# ─── P I E C E   L I N K S ────────────────────────────────────────────────────
+
+@timed("async_repository")
+async def replace_piece_links(
+    puzzle_id: str, links_by_code: Dict[str, List[dict]], sectors: Dict[str, str]
+) -> None:
+    """Reemplaza los enlaces salientes de las piezas indicadas (ver `repositories`)."""
+    return await _repo().replace_piece_links(puzzle_id, links_by_code, sectors)
+
+@timed("async_repository")
+async def get_links_from(puzzle_id: str, code: str) -> List[dict]:
+    """Enlaces declarados por la pieza `code` (hacia sus vecinos)."""
+    return await _repo().get_links_from(puzzle_id, code)
+
+@timed("async_repository")
+async def get_links_to(puzzle_id: str, code: str) -> List[dict]:
+    """Enlaces de otras piezas que apuntan a `code`."""
+    return await _repo().get_links_to(puzzle_id, code)
+
+@timed("async_repository")
+async def get_links_touching(puzzle_id: str, codes: List[str]) -> List[dict]:
+    """Enlaces que salen de o llegan a alguna de las piezas `codes`."""
+    return await _repo().get_links_touching(puzzle_id, codes)
+
+@timed("async_repository")
+async def delete_piece_links(puzzle_id: str) -> int:
+    """Elimina todos los enlaces de un puzzle. Devuelve cuántos se borraron."""
+    return await _repo().delete_piece_links(puzzle_id)
+
+# ─── I N S T R U C T I O N   P L A N S ───────────────────────────────────────
+
+@timed("async_repository")
+async def get_instruction_plan(
+    puzzle_id: str, start_code: str, strategy: str, revision: int
+) -> Optional[dict]:
+    """Obtiene el plan materializado de (puzzle, pieza inicial, estrategia, revisión)."""
+    return await _repo().get_instruction_plan(puzzle_id, start_code, strategy, revision)
+
+@timed("async_repository")
+async def get_latest_instruction_plan(
+    puzzle_id: str, start_code: str, strategy: str
+) -> Optional[dict]:
+    """Obtiene el plan de la revisión más alta guardada, sin conocer la revisión."""
+    return await _repo().get_latest_instruction_plan(puzzle_id, start_code, strategy)
+
+@timed("async_repository")
+async def save_instruction_plan(plan_doc: dict) -> None:
+    """Guarda (o reemplaza) un plan identificado por (puzzleId, startCode, strategy, revision)."""
+    return await _repo().save_instruction_plan(plan_doc)
+
+@timed("async_repository")
+async def get_instruction_plan_keys(puzzle_id: str) -> List[Tuple[str, str]]:
+    """Devuelve los pares (startCode, strategy) con algún plan guardado para el puzzle."""
+    return await _repo().get_instruction_plan_keys(puzzle_id)
+
+@timed("async_repository")
+async def delete_instruction_plans(puzzle_id: str, below_revision: Optional[int] = None) -> int:
+    """Elimina los planes de un puzzle (solo los anteriores a `below_revision` si se indica)."""
+    return await _repo().delete_instruction_plans(puzzle_id, below_revision)
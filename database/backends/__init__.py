@@ -0,0 +1,122 @@
+# database/backends/__init__.py
+"""
+Backends de almacenamiento intercambiables.
+
+- "mongo": MongoDB (por defecto), con `MONGO_URI` y `DB_NAME`.
+- "memory": diccionarios en el propio proceso; los datos no persisten.
+- "sqlite": archivo SQLite embebido en `SQLITE_PATH`.
+
+El backend se elige con `STORAGE_BACKEND` (ver `configs.config`).
+`get_repository()` y `get_async_repository()` devuelven instancias únicas,
+creadas en la primera llamada; los servicios no las usan directamente sino
+a través de `database.repositories` y `database.async_repositories`.
+Nada se conecta al importar: `warm_up()` abre la conexión en segundo plano
+al arrancar y `ping()` sirve de comprobación de salud.
+"""
+
+import threading
+import time
+from typing import Any, Optional
+
+from configs.config import STORAGE_BACKEND, SQLITE_PATH
+from database.backends.base import Repository, ThreadedAsyncRepository
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+BACKENDS = ("mongo", "memory", "sqlite")
+
+_lock = threading.Lock()
+_repository: Optional[Repository] = None
+_async_repository: Optional[Any] = None
+_warm_up_thread: Optional[threading.Thread] = None
+
+
+def _create_repository(name: str) -> Repository:
+    if name == "mongo":
+        from database.backends.mongo import MongoRepository
+        from database.client import get_db
+        return MongoRepository(get_db())
+    if name == "memory":
+        from database.backends.memory import MemoryRepository
+        return MemoryRepository()
+    if name == "sqlite":
+        from database.backends.sqlite import SQLiteRepository
+        return SQLiteRepository(SQLITE_PATH)
+    raise ValueError(f"Backend desconocido: '{name}'. Opciones: {', '.join(BACKENDS)}.")
+
+
+def get_repository() -> Repository:
+    """Repositorio síncrono del backend configurado."""
+    global _repository
+    with _lock:
+        if _repository is None:
+            _repository = _create_repository(STORAGE_BACKEND)
+    return _repository
+
+
+def get_async_repository():
+    """
+    Repositorio asíncrono del backend configurado: `AsyncMongoRepository` para
+    MongoDB; para el resto, el repositorio síncrono ejecutado en hilos.
+    """
+    global _async_repository
+    if _async_repository is None:
+        if STORAGE_BACKEND == "mongo":
+            from database.async_client import get_async_db
+            from database.backends.mongo import AsyncMongoRepository
+            repository = AsyncMongoRepository(get_async_db())
+        else:
+            repository = ThreadedAsyncRepository(get_repository())
+        with _lock:
+            if _async_repository is None:
+                _async_repository = repository
+    return _async_repository
+
+
+def ping() -> float:
+    """
+    Comprobación de salud: abre la conexión si hace falta, verifica que el
+    almacenamiento responde y devuelve la latencia en milisegundos.
+    Lanza la excepción del backend si no está disponible.
+    """
+    repository = get_repository()
+    start = time.perf_counter()
+    repository.ping()
+    return (time.perf_counter() - start) * 1000
+
+
+def warm_up() -> threading.Thread:
+    """
+    Calienta la conexión en un hilo de fondo (una sola vez por proceso):
+    crea el cliente, asegura los índices y hace un `ping`, mientras la
+    interfaz se dibuja. Con MongoDB registra además los índices faltantes o
+    sin uso (`database.indexes.log_index_report`). Un fallo se registra y no
+    interrumpe el arranque; las consultas posteriores lo volverán a intentar.
+    """
+    global _warm_up_thread
+    with _lock:
+        if _warm_up_thread is None:
+            _warm_up_thread = threading.Thread(target=_warm_up, name="storage-warm-up", daemon=True)
+            _warm_up_thread.start()
+    return _warm_up_thread
+
+
+def _warm_up() -> None:
+    try:
+        latency = ping()
+    except Exception as e:
+        logger.warning("El backend '%s' no responde: %s", STORAGE_BACKEND, e)
+    else:
+        logger.info("Backend '%s' listo (ping %.1f ms).", STORAGE_BACKEND, latency)
+        if STORAGE_BACKEND == "mongo":
+            _log_index_report()
+
+
+def _log_index_report() -> None:
+    from database.client import get_db
+    from database.indexes import log_index_report
+    try:
+        log_index_report(get_db())
+    except Exception as e:
+        logger.warning("No se pudo revisar los índices: %s", e)
@@ -0,0 +1,293 @@
+# database/backends/base.py
+"""
+Interfaz común de los backends de almacenamiento.
+
+`Repository` declara las operaciones que usan los servicios (las mismas
+funciones que expone `database.repositories`). Los documentos que entran y
+salen tienen siempre la forma de MongoDB: `_id` y `puzzleId` como ObjectId,
+el resto de campos tal cual. Así los servicios no saben qué backend hay
+debajo.
+
+Revisiones de un puzzle: cada escritura de piezas reserva una revisión
+(`reserve_puzzle_revision`, contador `reservedRevision` más una reserva con
+vida en `writers`) y la libera al terminar (`publish_puzzle_revision`).
+`revision`, la que leen todos, solo avanza hasta el contador cuando no
+queda ninguna reserva viva: todo lo escrito con una revisión publicada ya
+está en la base de datos. Las reservas caducan a los REVISION_LEASE_SECONDS
+(una escritura que no termina no retiene la revisión para siempre).
+
+Incluye además utilidades para los backends que no son MongoDB (proyección,
+operadores de actualización `$set`/`$inc`, reservas de revisión, copia de
+documentos) y
+`ThreadedAsyncRepository`, que ofrece la interfaz asíncrona ejecutando un
+repositorio síncrono en hilos.
+"""
+
+import asyncio
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from configs.config import REVISION_LEASE_SECONDS
+
+# Tamaño máximo de página en los listados paginados
+MAX_PAGE_SIZE = 500
+
+
+def page_size(limit: int) -> int:
+    return max(1, min(int(limit), MAX_PAGE_SIZE))
+
+
+class Repository(ABC):
+    """Operaciones de acceso a datos; cada backend las implementa todas."""
+
+    def ping(self) -> None:
+        """Comprueba que el almacenamiento responde; lanza una excepción si no."""
+
+    # ─── P U Z Z L E S ────────────────────────────────────────────────────────
+
+    @abstractmethod
+    def create_puzzle(self, puzzle_doc: dict) -> dict: ...
+
+    @abstractmethod
+    def get_puzzle_by_id(self, puzzle_id: str) -> Optional[dict]: ...
+
+    @abstractmethod
+    def get_all_puzzles(self) -> List[dict]: ...
+
+    @abstractmethod
+    def get_puzzles_page(
+        self,
+        after_id: Optional[str] = None,
+        limit: int = 50,
+        projection: Optional[Dict[str, Any]] = None,
+        descending: bool = False
+    ) -> List[dict]: ...
+
+    @abstractmethod
+    def update_puzzle(self, puzzle_id: str, update_doc: dict) -> Optional[dict]: ...
+
+    @abstractmethod
+    def upsert_puzzle(self, puzzle_id: str, update_doc: dict) -> dict: ...
+
+    @abstractmethod
+    def reserve_puzzle_revision(self, puzzle_id: str, writer: str) -> int: ...
+
+    @abstractmethod
+    def publish_puzzle_revision(self, puzzle_id: str, writer: str) -> int: ...
+
+    @abstractmethod
+    def get_puzzle_revision(self, puzzle_id: str) -> int: ...
+
+    @abstractmethod
+    def delete_puzzle(self, puzzle_id: str) -> bool: ...
+
+    # ─── P I E C E S ──────────────────────────────────────────────────────────
+
+    @abstractmethod
+    def create_piece(self, piece_doc: dict) -> dict: ...
+
+    @abstractmethod
+    def get_piece_by_id(self, piece_id: str) -> Optional[dict]: ...
+
+    @abstractmethod
+    def get_piece_by_code(self, puzzle_id: str, code: str) -> Optional[dict]: ...
+
+    def get_pieces_by_puzzle(
+        self,
+        puzzle_id: str,
+        projection: Optional[Dict[str, Any]] = None
+    ) -> List[dict]:
+        return list(self.iter_pieces_by_puzzle(puzzle_id, projection))
+
+    @abstractmethod
+    def iter_pieces_by_puzzle(
+        self,
+        puzzle_id: str,
+        projection: Optional[Dict[str, Any]] = None,
+        batch_size: int = 10_000
+    ) -> Iterator[dict]: ...
+
+    @abstractmethod
+    def get_pieces_by_sector(
+        self,
+        puzzle_id: str,
+        sector: str,
+        projection: Optional[Dict[str, Any]] = None
+    ) -> List[dict]: ...
+
+    @abstractmethod
+    def get_pieces_by_codes(
+        self,
+        puzzle_id: str,
+        codes: List[str],
+        projection: Optional[Dict[str, Any]] = None
+    ) -> List[dict]: ...
+
+    @abstractmethod
+    def get_pieces_changed_since(
+        self,
+        puzzle_id: str,
+        revision: int,
+        projection: Optional[Dict[str, Any]] = None
+    ) -> List[dict]: ...
+
+    @abstractmethod
+    def count_pieces_by_sector(self, puzzle_id: str) -> Dict[str, int]: ...
+
+    @abstractmethod
+    def get_sector_links(self, puzzle_id: str) -> List[dict]: ...
+
+    @abstractmethod
+    def get_pieces_page(
+        self,
+        puzzle_id: str,
+        after_code: Optional[str] = None,
+        limit: int = 100,
+        projection: Optional[Dict[str, Any]] = None
+    ) -> List[dict]: ...
+
+    @abstractmethod
+    def update_piece(self, piece_id: str, update_doc: dict) -> Optional[dict]: ...
+
+    @abstractmethod
+    def upsert_piece(self, puzzle_id: str, code: str, update_doc: dict) -> dict: ...
+
+    @abstractmethod
+    def bulk_upsert_pieces(self, puzzle_id: str, piece_docs: List[dict]) -> Dict[str, int]: ...
+
+    @abstractmethod
+    def delete_piece(self, piece_id: str) -> bool: ...
+
+    # ─── P I E C E   L I N K S ────────────────────────────────────────────────
+
+    @abstractmethod
+    def replace_piece_links(
+        self, puzzle_id: str, links_by_code: Dict[str, List[dict]], sectors: Dict[str, str]
+    ) -> None: ...
+
+    @abstractmethod
+    def get_links_from(self, puzzle_id: str, code: str) -> List[dict]: ...
+
+    @abstractmethod
+    def get_links_to(self, puzzle_id: str, code: str) -> List[dict]: ...
+
+    @abstractmethod
+    def get_links_touching(self, puzzle_id: str, codes: List[str]) -> List[dict]: ...
+
+    @abstractmethod
+    def delete_piece_links(self, puzzle_id: str) -> int: ...
+
+    # ─── I N S T R U C T I O N   P L A N S ───────────────────────────────────
+
+    @abstractmethod
+    def get_instruction_plan(
+        self, puzzle_id: str, start_code: str, strategy: str, revision: int
+    ) -> Optional[dict]: ...
+
+    @abstractmethod
+    def get_latest_instruction_plan(
+        self, puzzle_id: str, start_code: str, strategy: str
+    ) -> Optional[dict]: ...
+
+    @abstractmethod
+    def save_instruction_plan(self, plan_doc: dict) -> None: ...
+
+    @abstractmethod
+    def get_instruction_plan_keys(self, puzzle_id: str) -> List[Tuple[str, str]]: ...
+
+    @abstractmethod
+    def delete_instruction_plans(self, puzzle_id: str, below_revision: Optional[int] = None) -> int: ...
+
+
+class ThreadedAsyncRepository:
+    """
+    Interfaz asíncrona sobre un repositorio síncrono: cada método se ejecuta
+    en un hilo con `asyncio.to_thread`, de modo que varias llamadas lanzadas
+    con `run_concurrently` no se bloquean entre sí.
+    """
+
+    def __init__(self, repository: Repository):
+        self._repository = repository
+
+    def __getattr__(self, name: str):
+        method = getattr(self._repository, name)
+
+        async def call(*args, **kwargs):
+            return await asyncio.to_thread(method, *args, **kwargs)
+        return call
+
+# ─── U T I L I D A D E S   D E   D O C U M E N T O S ──────────────────────────
+
+def clone(value: Any) -> Any:
+    """Copia profunda de un documento (dicts y listas); más rápida que deepcopy."""
+    if isinstance(value, dict):
+        return {k: clone(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [clone(v) for v in value]
+    return value
+
+
+def project(doc: dict, projection: Optional[Dict[str, Any]]) -> dict:
+    """
+    Aplica una proyección al estilo MongoDB: de inclusión ({campo: 1}) o de
+    exclusión ({campo: 0}); `_id` se incluye salvo que se excluya.
+    Devuelve siempre una copia.
+    """
+    if not projection:
+        return clone(doc)
+    included = [k for k, v in projection.items() if v and k != "_id"]
+    if included:
+        out = {k: clone(doc[k]) for k in included if k in doc}
+        if projection.get("_id", 1) and "_id" in doc:
+            out["_id"] = doc["_id"]
+        return out
+    excluded = {k for k, v in projection.items() if not v}
+    return {k: clone(v) for k, v in doc.items() if k not in excluded}
+
+
+def apply_update(doc: dict, update: Dict[str, Dict[str, Any]]) -> None:
+    """Aplica en el sitio los operadores `$set` e `$inc` (los únicos que se usan)."""
+    for operator, fields in update.items():
+        if operator == "$set":
+            for k, v in fields.items():
+                doc[k] = clone(v)
+        elif operator == "$inc":
+            for k, v in fields.items():
+                doc[k] = doc.get(k, 0) + v
+        else:
+            raise ValueError(f"Operador de actualización no soportado: {operator}")
+
+
+def neighbor_links(neighbors: List[dict]) -> List[Tuple[int, str]]:
+    """
+    Enlaces (edgeId, vecino) de una lista de neighbors: sin vecinos vacíos y
+    uno por conexión (si una conexión se repite, prevalece la última).
+    """
+    links = {nb["edgeId"]: nb["neighborCode"] for nb in neighbors if nb.get("neighborCode")}
+    return list(links.items())
+
+
+def reserve_revision(doc: dict, writer: str, now: float) -> int:
+    """
+    Reserva en el sitio la siguiente revisión de un puzzle para `writer`
+    (descarta las reservas caducadas) y la devuelve.
+    """
+    reserved = max(doc.get("reservedRevision", 0), doc.get("revision", 0)) + 1
+    doc["reservedRevision"] = reserved
+    doc["writers"] = _live_writers(doc, now) + [{"id": writer, "at": now}]
+    return reserved
+
+
+def publish_revision(doc: dict, writer: str, now: float) -> int:
+    """
+    Libera en el sitio la reserva de `writer`; sin reservas vivas, la revisión
+    publicada pasa a ser la última reservada. Devuelve la revisión publicada.
+    """
+    doc["writers"] = [w for w in _live_writers(doc, now) if w["id"] != writer]
+    if not doc["writers"]:
+        doc["revision"] = max(doc.get("revision", 0), doc.get("reservedRevision", 0))
+    return doc.get("revision", 0)
+
+
+def _live_writers(doc: dict, now: float) -> List[dict]:
+    return [w for w in doc.get("writers") or () if w["at"] >= now - REVISION_LEASE_SECONDS]
@@ -0,0 +1,383 @@
+# database/backends/memory.py
+"""
+Backend en memoria.
+
+Guarda los documentos en diccionarios del proceso, con índices equivalentes
+a los de MongoDB: (puzzleId, code) de piezas, listas de códigos ordenadas
+para la paginación, enlaces por origen y por destino, y planes por clave.
+Sirve para ejecutar la aplicación, pruebas o benchmarks sin servidor; los
+datos se pierden al terminar el proceso.
+
+Todas las operaciones se serializan con un lock y devuelven copias, de modo
+que quien lee no puede modificar los datos guardados.
+"""
+
+import threading
+import time
+from bisect import bisect_right, insort
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from bson import ObjectId
+from database.backends.base import (
+    Repository, apply_update, clone, neighbor_links, page_size, project, publish_revision,
+    reserve_revision
+)
+
+_PlanKey = Tuple[ObjectId, str, str, int]
+
+
+class MemoryRepository(Repository):
+    """Repositorio en memoria, seguro entre hilos."""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._puzzles: Dict[ObjectId, dict] = {}
+        self._pieces: Dict[ObjectId, dict] = {}
+        # puzzleId -> {code: _id} y códigos ordenados (índice único (puzzleId, code))
+        self._piece_ids: Dict[ObjectId, Dict[str, ObjectId]] = {}
+        self._sorted_codes: Dict[ObjectId, List[str]] = {}
+        # puzzleId -> fromCode -> [(edgeId, toCode)] y puzzleId -> toCode -> {fromCode}
+        self._links_from: Dict[ObjectId, Dict[str, List[Tuple[int, str]]]] = {}
+        self._links_to: Dict[ObjectId, Dict[str, set]] = {}
+        self._plans: Dict[_PlanKey, dict] = {}
+
+    # ─── P U Z Z L E S ────────────────────────────────────────────────────────
+
+    def create_puzzle(self, puzzle_doc: dict) -> dict:
+        doc = {**clone(puzzle_doc), "_id": puzzle_doc.get("_id") or ObjectId()}
+        with self._lock:
+            self._puzzles[doc["_id"]] = doc
+        return clone(doc)
+
+    def get_puzzle_by_id(self, puzzle_id: str) -> Optional[dict]:
+        with self._lock:
+            doc = self._puzzles.get(ObjectId(puzzle_id))
+            return clone(doc) if doc else None
+
+    def get_all_puzzles(self) -> List[dict]:
+        with self._lock:
+            return [clone(d) for _, d in sorted(self._puzzles.items())]
+
+    def get_puzzles_page(
+        self,
+        after_id: Optional[str] = None,
+        limit: int = 50,
+        projection: Optional[Dict[str, Any]] = None,
+        descending: bool = False
+    ) -> List[dict]:
+        with self._lock:
+            ids = sorted(self._puzzles, reverse=descending)
+            if after_id:
+                after = ObjectId(after_id)
+                ids = [i for i in ids if (i < after if descending else i > after)]
+            return [project(self._puzzles[i], projection) for i in ids[:page_size(limit)]]
+
+    def update_puzzle(self, puzzle_id: str, update_doc: dict) -> Optional[dict]:
+        with self._lock:
+            doc = self._puzzles.get(ObjectId(puzzle_id))
+            if doc is None:
+                return None
+            apply_update(doc, {"$set": update_doc})
+            return clone(doc)
+
+    def upsert_puzzle(self, puzzle_id: str, update_doc: dict) -> dict:
+        with self._lock:
+            oid = ObjectId(puzzle_id)
+            doc = self._puzzles.setdefault(oid, {"_id": oid})
+            apply_update(doc, {"$set": update_doc})
+            return clone(doc)
+
+    def reserve_puzzle_revision(self, puzzle_id: str, writer: str) -> int:
+        with self._lock:
+            doc = self._puzzles.get(ObjectId(puzzle_id))
+            return reserve_revision(doc, writer, time.time()) if doc is not None else 0
+
+    def publish_puzzle_revision(self, puzzle_id: str, writer: str) -> int:
+        with self._lock:
+            doc = self._puzzles.get(ObjectId(puzzle_id))
+            return publish_revision(doc, writer, time.time()) if doc is not None else 0
+
+    def get_puzzle_revision(self, puzzle_id: str) -> int:
+        with self._lock:
+            doc = self._puzzles.get(ObjectId(puzzle_id))
+            return doc.get("revision", 0) if doc else 0
+
+    def delete_puzzle(self, puzzle_id: str) -> bool:
+        with self._lock:
+            return self._puzzles.pop(ObjectId(puzzle_id), None) is not None
+
+    # ─── P I E C E S ──────────────────────────────────────────────────────────
+
+    def create_piece(self, piece_doc: dict) -> dict:
+        with self._lock:
+            pid = piece_doc["puzzleId"]
+            if piece_doc["code"] in self._piece_ids.get(pid, {}):
+                raise ValueError(f"Pieza duplicada: {piece_doc['code']}")  # índice único
+            doc = {**clone(piece_doc), "_id": piece_doc.get("_id") or ObjectId()}
+            self._index_piece(doc)
+            return clone(doc)
+
+    def get_piece_by_id(self, piece_id: str) -> Optional[dict]:
+        with self._lock:
+            doc = self._pieces.get(ObjectId(piece_id))
+            return clone(doc) if doc else None
+
+    def get_piece_by_code(self, puzzle_id: str, code: str) -> Optional[dict]:
+        with self._lock:
+            doc = self._piece(ObjectId(puzzle_id), code)
+            return clone(doc) if doc else None
+
+    def iter_pieces_by_puzzle(
+        self,
+        puzzle_id: str,
+        projection: Optional[Dict[str, Any]] = None,
+        batch_size: int = 10_000
+    ) -> Iterator[dict]:
+        # Se copia por lotes para no retener el lock mientras se consume
+        pid = ObjectId(puzzle_id)
+        with self._lock:
+            ids = list(self._piece_ids.get(pid, {}).values())
+        for start in range(0, len(ids), batch_size):
+            with self._lock:
+                batch = [
+                    project(self._pieces[i], projection)
+                    for i in ids[start:start + batch_size] if i in self._pieces
+                ]
+            yield from batch
+
+    def get_pieces_by_sector(
+        self,
+        puzzle_id: str,
+        sector: str,
+        projection: Optional[Dict[str, Any]] = None
+    ) -> List[dict]:
+        pid = ObjectId(puzzle_id)
+        with self._lock:
+            docs = (self._piece(pid, code) for code in self._sorted_codes.get(pid, []))
+            return [project(d, projection) for d in docs if d.get("sector") == sector]
+
+    def get_pieces_by_codes(
+        self,
+        puzzle_id: str,
+        codes: List[str],
+        projection: Optional[Dict[str, Any]] = None
+    ) -> List[dict]:
+        pid = ObjectId(puzzle_id)
+        with self._lock:
+            docs = (self._piece(pid, code) for code in sorted(set(codes)))
+            return [project(d, projection) for d in docs if d is not None]
+
+    def get_pieces_changed_since(
+        self,
+        puzzle_id: str,
+        revision: int,
+        projection: Optional[Dict[str, Any]] = None
+    ) -> List[dict]:
+        pid = ObjectId(puzzle_id)
+        with self._lock:
+            docs = [
+                self._pieces[piece_id] for piece_id in self._piece_ids.get(pid, {}).values()
+                if self._pieces[piece_id].get("updatedRev", 0) > revision
+            ]
+            docs.sort(key=lambda d: (d.get("updatedRev", 0), d["code"]))
+            return [project(d, projection) for d in docs]
+
+    def count_pieces_by_sector(self, puzzle_id: str) -> Dict[str, int]:
+        pid = ObjectId(puzzle_id)
+        counts: Dict[str, int] = {}
+        with self._lock:
+            for piece_id in self._piece_ids.get(pid, {}).values():
+                sector = self._pieces[piece_id].get("sector")
+                counts[sector] = counts.get(sector, 0) + 1
+        return counts
+
+    def get_sector_links(self, puzzle_id: str) -> List[dict]:
+        pid = ObjectId(puzzle_id)
+        counts: Dict[Tuple[str, str], int] = {}
+        with self._lock:
+            sector_of = {
+                code: self._pieces[piece_id].get("sector")
+                for code, piece_id in self._piece_ids.get(pid, {}).items()
+            }
+            for source, links in self._links_from.get(pid, {}).items():
+                for _, target in links:
+                    if source in sector_of and target in sector_of:
+                        key = (sector_of[source], sector_of[target])
+                        if key[0] != key[1]:
+                            counts[key] = counts.get(key, 0) + 1
+        return [
+            {"fromSector": f, "toSector": t, "count": n}
+            for (f, t), n in sorted(counts.items())
+        ]
+
+    def get_pieces_page(
+        self,
+        puzzle_id: str,
+        after_code: Optional[str] = None,
+        limit: int = 100,
+        projection: Optional[Dict[str, Any]] = None
+    ) -> List[dict]:
+        pid = ObjectId(puzzle_id)
+        with self._lock:
+            codes = self._sorted_codes.get(pid, [])
+            start = bisect_right(codes, after_code) if after_code is not None else 0
+            return [
+                project(self._piece(pid, code), projection)
+                for code in codes[start:start + page_size(limit)]
+            ]
+
+    def update_piece(self, piece_id: str, update_doc: dict) -> Optional[dict]:
+        with self._lock:
+            doc = self._pieces.get(ObjectId(piece_id))
+            if doc is None:
+                return None
+            apply_update(doc, {"$set": update_doc})
+            return clone(doc)
+
+    def upsert_piece(self, puzzle_id: str, code: str, update_doc: dict) -> dict:
+        with self._lock:
+            doc, _ = self._upsert(ObjectId(puzzle_id), code, update_doc)
+            return clone(doc)
+
+    def bulk_upsert_pieces(self, puzzle_id: str, piece_docs: List[dict]) -> Dict[str, int]:
+        counts = {"upserted": 0, "matched": 0, "modified": 0}
+        pid = ObjectId(puzzle_id)
+        with self._lock:
+            for piece in piece_docs:
+                fields = {k: v for k, v in piece.items() if k != "code"}
+                _, outcome = self._upsert(pid, piece["code"], fields)
+                if outcome == "upserted":
+                    counts["upserted"] += 1
+                else:
+                    counts["matched"] += 1
+                    counts["modified"] += outcome == "modified"
+        return counts
+
+    def delete_piece(self, piece_id: str) -> bool:
+        with self._lock:
+            doc = self._pieces.pop(ObjectId(piece_id), None)
+            if doc is None:
+                return False
+            pid, code = doc["puzzleId"], doc["code"]
+            self._piece_ids[pid].pop(code, None)
+            codes = self._sorted_codes[pid]
+            codes.pop(bisect_right(codes, code) - 1)
+            return True
+
+    def _piece(self, pid: ObjectId, code: str) -> Optional[dict]:
+        piece_id = self._piece_ids.get(pid, {}).get(code)
+        return self._pieces.get(piece_id) if piece_id is not None else None
+
+    def _index_piece(self, doc: dict) -> None:
+        pid = doc["puzzleId"]
+        self._pieces[doc["_id"]] = doc
+        self._piece_ids.setdefault(pid, {})[doc["code"]] = doc["_id"]
+        insort(self._sorted_codes.setdefault(pid, []), doc["code"])
+
+    def _upsert(self, pid: ObjectId, code: str, fields: dict) -> Tuple[dict, str]:
+        doc = self._piece(pid, code)
+        if doc is None:
+            doc = {"_id": ObjectId(), "puzzleId": pid, "code": code}
+            apply_update(doc, {"$set": fields})
+            self._index_piece(doc)
+            return doc, "upserted"
+        before = {k: doc.get(k) for k in fields}
+        apply_update(doc, {"$set": fields})
+        return doc, "modified" if before != fields else "matched"
+
+    # ─── P I E C E   L I N K S ────────────────────────────────────────────────
+
+    def replace_piece_links(
+        self, puzzle_id: str, links_by_code: Dict[str, List[dict]], sectors: Dict[str, str]
+    ) -> None:
+        # Los sectores se resuelven al consultar (get_sector_links), con las
+        # piezas vigentes: aquí no hace falta `sectors`
+        pid = ObjectId(puzzle_id)
+        with self._lock:
+            outgoing = self._links_from.setdefault(pid, {})
+            incoming = self._links_to.setdefault(pid, {})
+            for code, neighbors in links_by_code.items():
+                for _, to_code in outgoing.pop(code, ()):
+                    incoming.get(to_code, set()).discard(code)
+                links = neighbor_links(neighbors)
+                if links:
+                    outgoing[code] = links
+                for _, to_code in links:
+                    incoming.setdefault(to_code, set()).add(code)
+
+    def get_links_from(self, puzzle_id: str, code: str) -> List[dict]:
+        with self._lock:
+            links = self._links_from.get(ObjectId(puzzle_id), {}).get(code, ())
+            return [{"fromCode": code, "edgeId": e, "toCode": t} for e, t in links]
+
+    def get_links_to(self, puzzle_id: str, code: str) -> List[dict]:
+        pid = ObjectId(puzzle_id)
+        with self._lock:
+            outgoing = self._links_from.get(pid, {})
+            return [
+                {"fromCode": source, "edgeId": e, "toCode": t}
+                for source in sorted(self._links_to.get(pid, {}).get(code, ()))
+                for e, t in outgoing.get(source, ())
+                if t == code
+            ]
+
+    def get_links_touching(self, puzzle_id: str, codes: List[str]) -> List[dict]:
+        pid = ObjectId(puzzle_id)
+        wanted = set(codes)
+        with self._lock:
+            outgoing = self._links_from.get(pid, {})
+            incoming = self._links_to.get(pid, {})
+            sources = wanted | {s for code in wanted for s in incoming.get(code, ())}
+            return [
+                {"fromCode": source, "edgeId": e, "toCode": t}
+                for source in sorted(sources)
+                for e, t in outgoing.get(source, ())
+                if source in wanted or t in wanted
+            ]
+
+    def delete_piece_links(self, puzzle_id: str) -> int:
+        pid = ObjectId(puzzle_id)
+        with self._lock:
+            self._links_to.pop(pid, None)
+            removed = self._links_from.pop(pid, {})
+            return sum(len(links) for links in removed.values())
+
+    # ─── I N S T R U C T I O N   P L A N S ───────────────────────────────────
+
+    def get_instruction_plan(
+        self, puzzle_id: str, start_code: str, strategy: str, revision: int
+    ) -> Optional[dict]:
+        with self._lock:
+            doc = self._plans.get((ObjectId(puzzle_id), start_code, strategy, revision))
+            return clone(doc) if doc else None
+
+    def get_latest_instruction_plan(
+        self, puzzle_id: str, start_code: str, strategy: str
+    ) -> Optional[dict]:
+        pid = ObjectId(puzzle_id)
+        with self._lock:
+            matches = [
+                key for key in self._plans
+                if key[0] == pid and key[1] == start_code and key[2] == strategy
+            ]
+            return clone(self._plans[max(matches, key=lambda k: k[3])]) if matches else None
+
+    def save_instruction_plan(self, plan_doc: dict) -> None:
+        key = (plan_doc["puzzleId"], plan_doc["startCode"], plan_doc["strategy"], plan_doc["revision"])
+        with self._lock:
+            self._plans[key] = clone(plan_doc)
+
+    def get_instruction_plan_keys(self, puzzle_id: str) -> List[Tuple[str, str]]:
+        pid = ObjectId(puzzle_id)
+        with self._lock:
+            return sorted({(k[1], k[2]) for k in self._plans if k[0] == pid})
+
+    def delete_instruction_plans(self, puzzle_id: str, below_revision: Optional[int] = None) -> int:
+        pid = ObjectId(puzzle_id)
+        with self._lock:
+            doomed = [
+                k for k in self._plans
+                if k[0] == pid and (below_revision is None or k[3] < below_revision)
+            ]
+            for k in doomed:
+                del self._plans[k]
+            return len(doomed)
@@ -0,0 +1,796 @@
+# database/backends/mongo.py
+"""
+Backend MongoDB (el original de la aplicación).
+
+`MongoRepository` usa el cliente síncrono de `database.client` (que asegura
+los índices al conectar) y `AsyncMongoRepository` el `AsyncMongoClient` de
+`database.async_client`, con las mismas operaciones como corrutinas. Los
+filtros, proyecciones, órdenes, pipelines y operaciones de bulk_write se
+construyen en funciones del módulo que comparten los dos: cada clase solo
+hace las llamadas de E/S.
+
+Las reservas y publicaciones de revisiones (ver `database.backends.base`)
+son actualizaciones con pipeline de agregación (MongoDB 4.2+): cada una es
+una sola operación atómica sobre el documento del puzzle.
+
+Cada documento de `piece_links` guarda también el sector de sus dos piezas
+(`fromSector`, `toSector`; None si el vecino aún no está mapeado), para que
+`get_sector_links` agrupe directamente sin un $lookup por enlace. Se
+mantienen al escribir: `replace_piece_links` los pone en los enlaces de las
+piezas que escribe y en los que apuntan a ellas, y `delete_piece` los quita.
+`rebuild_piece_links` los recalcula en los puzzles que aún no tienen
+`linksIndexed` (anteriores al índice o a estos campos).
+"""
+
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from bson import ObjectId
+from pymongo import DeleteMany, ReturnDocument, UpdateMany, UpdateOne
+from database.backends.base import REVISION_LEASE_SECONDS, Repository, neighbor_links, page_size
+
+
+class MongoRepository(Repository):
+    """Repositorio sobre las colecciones de una base de datos de MongoDB."""
+
+    def __init__(self, db):
+        self._db      = db
+        self._puzzles = db.puzzles
+        self._pieces  = db.pieces
+        self._plans   = db.instruction_plans
+        self._links   = db.piece_links
+
+    def ping(self) -> None:
+        self._db.command("ping")
+
+    # ─── P U Z Z L E S ────────────────────────────────────────────────────────
+
+    def create_puzzle(self, puzzle_doc: dict) -> dict:
+        """
+        Inserta un nuevo puzzle y devuelve el documento creado (con _id),
+        sin volver a leerlo de la base de datos.
+        """
+        result = self._puzzles.insert_one(puzzle_doc)
+        return {**puzzle_doc, "_id": result.inserted_id}
+
+    def get_puzzle_by_id(self, puzzle_id: str) -> Optional[dict]:
+        """
+        Obtiene un puzzle por su _id (string).
+        """
+        return self._puzzles.find_one(_by_id(puzzle_id))
+
+    def get_all_puzzles(self) -> List[dict]:
+        """
+        Devuelve todos los puzzles.
+        """
+        return list(self._puzzles.find())
+
+    def get_puzzles_page(
+        self,
+        after_id: Optional[str] = None,
+        limit: int = 50,
+        projection: Optional[Dict[str, Any]] = None,
+        descending: bool = False
+    ) -> List[dict]:
+        """
+        Devuelve una página de puzzles ordenada por _id, paginada por clave
+        (`_id` mayor/menor que `after_id`) en lugar de skip, con proyección opcional.
+        `limit` se acota a MAX_PAGE_SIZE.
+        """
+        query, options = _puzzles_page(after_id, limit, descending)
+        return list(self._puzzles.find(query, projection, **options))
+
+    def update_puzzle(self, puzzle_id: str, update_doc: dict) -> Optional[dict]:
+        """
+        Actualiza campos de un puzzle y devuelve el puzzle actualizado
+        (un solo viaje con find_one_and_update).
+        """
+        return self._puzzles.find_one_and_update(
+            _by_id(puzzle_id), {"$set": update_doc}, return_document=ReturnDocument.AFTER
+        )
+
+    def upsert_puzzle(self, puzzle_id: str, update_doc: dict) -> dict:
+        """
+        Actualiza un puzzle o lo crea con ese _id si no existe, de forma atómica.
+        Devuelve el documento resultante.
+        """
+        return self._puzzles.find_one_and_update(
+            _by_id(puzzle_id), {"$set": update_doc}, upsert=True, return_document=ReturnDocument.AFTER
+        )
+
+    def reserve_puzzle_revision(self, puzzle_id: str, writer: str) -> int:
+        """
+        Reserva atómicamente la siguiente revisión del puzzle para `writer`
+        (una escritura de piezas) y la devuelve.
+        """
+        doc = self._puzzles.find_one_and_update(
+            _by_id(puzzle_id),
+            _reserve_revision_pipeline(writer, time.time()),
+            projection={"reservedRevision": 1},
+            return_document=ReturnDocument.AFTER
+        )
+        return doc.get("reservedRevision", 0) if doc else 0
+
+    def publish_puzzle_revision(self, puzzle_id: str, writer: str) -> int:
+        """
+        Libera la reserva de `writer` y, si no queda ninguna viva, publica la
+        última revisión reservada. Devuelve la revisión publicada.
+        """
+        doc = self._puzzles.find_one_and_update(
+            _by_id(puzzle_id),
+            _publish_revision_pipeline(writer, time.time()),
+            projection={"revision": 1},
+            return_document=ReturnDocument.AFTER
+        )
+        return doc.get("revision", 0) if doc else 0
+
+    def get_puzzle_revision(self, puzzle_id: str) -> int:
+        """Devuelve la revisión publicada del puzzle (0 si nunca se modificaron sus piezas)."""
+        doc = self._puzzles.find_one(_by_id(puzzle_id), {"revision": 1})
+        return doc.get("revision", 0) if doc else 0
+
+    def delete_puzzle(self, puzzle_id: str) -> bool:
+        """
+        Elimina un puzzle. Devuelve True si se borró al menos un documento.
+        """
+        return self._puzzles.delete_one(_by_id(puzzle_id)).deleted_count > 0
+
+    # ─── P I E C E S ──────────────────────────────────────────────────────────
+
+    def create_piece(self, piece_doc: dict) -> dict:
+        """
+        Inserta una nueva pieza y devuelve el documento creado (con _id),
+        sin volver a leerlo de la base de datos.
+        """
+        result = self._pieces.insert_one(piece_doc)
+        return {**piece_doc, "_id": result.inserted_id}
+
+    def get_piece_by_id(self, piece_id: str) -> Optional[dict]:
+        """
+        Obtiene una pieza por su _id (string).
+        """
+        return self._pieces.find_one(_by_id(piece_id))
+
+    def get_piece_by_code(self, puzzle_id: str, code: str) -> Optional[dict]:
+        """
+        Busca una pieza dentro de un puzzle por su código legible (P1, P2…).
+        """
+        return self._pieces.find_one(_in_puzzle(puzzle_id, code=code))
+
+    def get_pieces_by_puzzle(
+        self,
+        puzzle_id: str,
+        projection: Optional[Dict[str, Any]] = None
+    ) -> List[dict]:
+        """
+        Devuelve todas las piezas de un puzzle, con proyección opcional.
+        """
+        return list(self._pieces.find(_in_puzzle(puzzle_id), projection))
+
+    def iter_pieces_by_puzzle(
+        self,
+        puzzle_id: str,
+        projection: Optional[Dict[str, Any]] = None,
+        batch_size: int = 10_000
+    ) -> Iterator[dict]:
+        """
+        Recorre las piezas de un puzzle sin acumularlas en una lista: el cursor
+        trae lotes grandes (`batch_size`) y cada documento se puede descartar
+        en cuanto se consume.
+        """
+        return self._pieces.find(_in_puzzle(puzzle_id), projection, batch_size=batch_size)
+
+    def get_pieces_by_sector(
+        self,
+        puzzle_id: str,
+        sector: str,
+        projection: Optional[Dict[str, Any]] = None
+    ) -> List[dict]:
+        """Piezas de un sector del puzzle (índice puzzleId_sector)."""
+        return list(self._pieces.find(_in_puzzle(puzzle_id, sector=sector), projection))
+
+    def get_pieces_by_codes(
+        self,
+        puzzle_id: str,
+        codes: List[str],
+        projection: Optional[Dict[str, Any]] = None
+    ) -> List[dict]:
+        """Piezas del puzzle con alguno de los códigos indicados."""
+        return list(self._pieces.find(_in_puzzle(puzzle_id, code={"$in": codes}), projection))
+
+    def get_pieces_changed_since(
+        self,
+        puzzle_id: str,
+        revision: int,
+        projection: Optional[Dict[str, Any]] = None
+    ) -> List[dict]:
+        """Piezas escritas después de `revision` (índice puzzleId_updatedRev)."""
+        return list(self._pieces.find(
+            _in_puzzle(puzzle_id, updatedRev={"$gt": revision}), projection, sort=_CHANGED_SORT
+        ))
+
+    def count_pieces_by_sector(self, puzzle_id: str) -> Dict[str, int]:
+        """Número de piezas por sector (cubierta por el índice puzzleId_sector)."""
+        rows = self._pieces.aggregate(_sector_counts_pipeline(puzzle_id))
+        return {r["_id"]: r["count"] for r in rows}
+
+    def get_sector_links(self, puzzle_id: str) -> List[dict]:
+        """
+        Enlaces entre sectores distintos: {fromSector, toSector, count}. Se
+        agregan en el servidor sobre los sectores guardados en cada enlace,
+        así que solo viajan los totales.
+        """
+        return list(self._links.aggregate(_sector_links_pipeline(puzzle_id)))
+
+    def get_pieces_page(
+        self,
+        puzzle_id: str,
+        after_code: Optional[str] = None,
+        limit: int = 100,
+        projection: Optional[Dict[str, Any]] = None
+    ) -> List[dict]:
+        """
+        Devuelve una página de piezas de un puzzle ordenada por código.
+        La paginación es por clave (`code` mayor que `after_code`), resuelta
+        íntegramente por el índice único (puzzleId, code).
+        `limit` se acota a MAX_PAGE_SIZE.
+        """
+        query, options = _pieces_page(puzzle_id, after_code, limit)
+        return list(self._pieces.find(query, projection, **options))
+
+    def update_piece(self, piece_id: str, update_doc: dict) -> Optional[dict]:
+        """
+        Actualiza campos de una pieza y devuelve la pieza actualizada
+        (un solo viaje con find_one_and_update).
+        """
+        return self._pieces.find_one_and_update(
+            _by_id(piece_id), {"$set": update_doc}, return_document=ReturnDocument.AFTER
+        )
+
+    def upsert_piece(self, puzzle_id: str, code: str, update_doc: dict) -> dict:
+        """
+        Actualiza la pieza (puzzleId, code) o la crea si no existe, en una sola
+        operación atómica. Devuelve el documento resultante.
+        """
+        return self._pieces.find_one_and_update(
+            _in_puzzle(puzzle_id, code=code), {"$set": update_doc},
+            upsert=True, return_document=ReturnDocument.AFTER
+        )
+
+    def bulk_upsert_pieces(self, puzzle_id: str, piece_docs: List[dict]) -> Dict[str, int]:
+        """
+        Inserta o actualiza en un solo bulk_write (no ordenado) un lote de piezas
+        identificadas por (puzzleId, code). Cada documento debe traer `code` y los
+        campos a settear. Devuelve los conteos de upserted/matched/modified.
+        """
+        if not piece_docs:
+            return _bulk_counts(None)
+        result = self._pieces.bulk_write(_upsert_pieces_ops(puzzle_id, piece_docs), ordered=False)
+        return _bulk_counts(result)
+
+    def delete_piece(self, piece_id: str) -> bool:
+        """
+        Elimina una pieza. Devuelve True si se borró al menos un documento.
+        Sus enlaces se conservan, pero dejan de contar entre sectores.
+        """
+        deleted = self._pieces.find_one_and_delete(_by_id(piece_id), {"code": 1, "puzzleId": 1})
+        if deleted is None:
+            return False
+        self._links.bulk_write(_forget_sector_ops(deleted["puzzleId"], deleted["code"]), ordered=False)
+        return True
+
+    # ─── P I E C E   L I N K S ────────────────────────────────────────────────
+    # Índice de adyacencia en ambos sentidos: un documento por vecino declarado
+    # {puzzleId, fromCode, edgeId, toCode, fromSector, toSector}, consultable
+    # por origen o por destino.
+
+    def replace_piece_links(
+        self, puzzle_id: str, links_by_code: Dict[str, List[dict]], sectors: Dict[str, str]
+    ) -> None:
+        """
+        Reemplaza los enlaces salientes de las piezas indicadas.
+        `links_by_code` mapea cada código a su lista de neighbors
+        ({edgeId, neighborCode}); los vecinos vacíos se ignoran. `sectors`
+        da el sector de cada una; el de sus vecinos se lee en una consulta.
+        Un único bulk_write no ordenado: upsert de cada (pieza, conexión),
+        borrado solo de las conexiones que ya no tienen vecino (un fallo a
+        medias nunca deja sin enlaces a una pieza) y el sector de destino en
+        los enlaces que apuntan a estas piezas.
+        """
+        if not links_by_code:
+            return
+        wanted = _neighbor_codes(links_by_code, sectors)
+        found = self._pieces.find(
+            _in_puzzle(puzzle_id, code={"$in": wanted}), _SECTOR_FIELDS
+        ) if wanted else []
+        self._links.bulk_write(
+            _replace_links_ops(puzzle_id, links_by_code, sectors, _link_targets(found, sectors)),
+            ordered=False
+        )
+
+    def get_links_from(self, puzzle_id: str, code: str) -> List[dict]:
+        """Enlaces declarados por la pieza `code` (hacia sus vecinos)."""
+        return list(self._links.find(_in_puzzle(puzzle_id, fromCode=code), _LINK_FIELDS))
+
+    def get_links_to(self, puzzle_id: str, code: str) -> List[dict]:
+        """Enlaces de otras piezas que apuntan a `code` (¿quién referencia a P42?)."""
+        return list(self._links.find(_in_puzzle(puzzle_id, toCode=code), _LINK_FIELDS))
+
+    def get_links_touching(self, puzzle_id: str, codes: List[str]) -> List[dict]:
+        """
+        Enlaces que salen de o llegan a alguna de las piezas `codes` (la
+        adyacencia completa de un grupo de piezas). Cada rama del $or usa
+        su índice.
+        """
+        return list(self._links.find(_links_touching_query(puzzle_id, codes), _LINK_FIELDS))
+
+    def delete_piece_links(self, puzzle_id: str) -> int:
+        """Elimina todos los enlaces de un puzzle. Devuelve cuántos se borraron."""
+        return self._links.delete_many(_in_puzzle(puzzle_id)).deleted_count
+
+    # ─── I N S T R U C T I O N   P L A N S ────────────────────────────────────
+
+    def get_instruction_plan(
+        self,
+        puzzle_id: str, start_code: str, strategy: str, revision: int
+    ) -> Optional[dict]:
+        """
+        Obtiene el plan materializado de (puzzle, pieza inicial, estrategia)
+        para una revisión concreta. Una sola lectura por índice único.
+        """
+        return self._plans.find_one(_plan_query(puzzle_id, start_code, strategy, revision))
+
+    def get_latest_instruction_plan(
+        self,
+        puzzle_id: str, start_code: str, strategy: str
+    ) -> Optional[dict]:
+        """
+        Obtiene el plan de la revisión más alta guardada, sin conocer la revisión
+        (útil para pedirlo a la vez que el puzzle y comparar después).
+        """
+        return self._plans.find_one(_plan_query(puzzle_id, start_code, strategy), sort=_LATEST_SORT)
+
+    def save_instruction_plan(self, plan_doc: dict) -> None:
+        """
+        Guarda (o reemplaza) un plan identificado por
+        (puzzleId, startCode, strategy, revision).
+        """
+        self._plans.replace_one(_plan_key(plan_doc), plan_doc, upsert=True)
+
+    def get_instruction_plan_keys(self, puzzle_id: str) -> List[Tuple[str, str]]:
+        """Devuelve los pares (startCode, strategy) con algún plan guardado para el puzzle."""
+        return _plan_keys(self._plans.aggregate(_plan_keys_pipeline(puzzle_id)))
+
+    def delete_instruction_plans(self, puzzle_id: str, below_revision: Optional[int] = None) -> int:
+        """
+        Elimina los planes de un puzzle; si se indica `below_revision`, solo los
+        de revisiones anteriores. Devuelve cuántos se borraron.
+        """
+        return self._plans.delete_many(_plans_below(puzzle_id, below_revision)).deleted_count
+
+
+class AsyncMongoRepository:
+    """Las mismas operaciones que `MongoRepository`, sobre `AsyncMongoClient`."""
+
+    def __init__(self, db):
+        self._puzzles = db.puzzles
+        self._pieces  = db.pieces
+        self._plans   = db.instruction_plans
+        self._links   = db.piece_links
+
+    # ─── P U Z Z L E S ────────────────────────────────────────────────────────
+
+    async def create_puzzle(self, puzzle_doc: dict) -> dict:
+        result = await self._puzzles.insert_one(puzzle_doc)
+        return {**puzzle_doc, "_id": result.inserted_id}
+
+    async def get_puzzle_by_id(self, puzzle_id: str) -> Optional[dict]:
+        return await self._puzzles.find_one(_by_id(puzzle_id))
+
+    async def get_all_puzzles(self) -> List[dict]:
+        return await self._puzzles.find().to_list(None)
+
+    async def get_puzzles_page(
+        self,
+        after_id: Optional[str] = None,
+        limit: int = 50,
+        projection: Optional[Dict[str, Any]] = None,
+        descending: bool = False
+    ) -> List[dict]:
+        query, options = _puzzles_page(after_id, limit, descending)
+        return await self._puzzles.find(query, projection, **options).to_list(None)
+
+    async def update_puzzle(self, puzzle_id: str, update_doc: dict) -> Optional[dict]:
+        return await self._puzzles.find_one_and_update(
+            _by_id(puzzle_id), {"$set": update_doc}, return_document=ReturnDocument.AFTER
+        )
+
+    async def upsert_puzzle(self, puzzle_id: str, update_doc: dict) -> dict:
+        return await self._puzzles.find_one_and_update(
+            _by_id(puzzle_id), {"$set": update_doc}, upsert=True, return_document=ReturnDocument.AFTER
+        )
+
+    async def reserve_puzzle_revision(self, puzzle_id: str, writer: str) -> int:
+        doc = await self._puzzles.find_one_and_update(
+            _by_id(puzzle_id),
+            _reserve_revision_pipeline(writer, time.time()),
+            projection={"reservedRevision": 1},
+            return_document=ReturnDocument.AFTER
+        )
+        return doc.get("reservedRevision", 0) if doc else 0
+
+    async def publish_puzzle_revision(self, puzzle_id: str, writer: str) -> int:
+        doc = await self._puzzles.find_one_and_update(
+            _by_id(puzzle_id),
+            _publish_revision_pipeline(writer, time.time()),
+            projection={"revision": 1},
+            return_document=ReturnDocument.AFTER
+        )
+        return doc.get("revision", 0) if doc else 0
+
+    async def get_puzzle_revision(self, puzzle_id: str) -> int:
+        doc = await self._puzzles.find_one(_by_id(puzzle_id), {"revision": 1})
+        return doc.get("revision", 0) if doc else 0
+
+    async def delete_puzzle(self, puzzle_id: str) -> bool:
+        result = await self._puzzles.delete_one(_by_id(puzzle_id))
+        return result.deleted_count > 0
+
+    # ─── P I E C E S ──────────────────────────────────────────────────────────
+
+    async def create_piece(self, piece_doc: dict) -> dict:
+        result = await self._pieces.insert_one(piece_doc)
+        return {**piece_doc, "_id": result.inserted_id}
+
+    async def get_piece_by_id(self, piece_id: str) -> Optional[dict]:
+        return await self._pieces.find_one(_by_id(piece_id))
+
+    async def get_piece_by_code(self, puzzle_id: str, code: str) -> Optional[dict]:
+        return await self._pieces.find_one(_in_puzzle(puzzle_id, code=code))
+
+    async def get_pieces_by_puzzle(
+        self,
+        puzzle_id: str,
+        projection: Optional[Dict[str, Any]] = None
+    ) -> List[dict]:
+        return await self._pieces.find(_in_puzzle(puzzle_id), projection).to_list(None)
+
+    async def get_pieces_by_sector(
+        self,
+        puzzle_id: str,
+        sector: str,
+        projection: Optional[Dict[str, Any]] = None
+    ) -> List[dict]:
+        return await self._pieces.find(_in_puzzle(puzzle_id, sector=sector), projection).to_list(None)
+
+    async def get_pieces_by_codes(
+        self,
+        puzzle_id: str,
+        codes: List[str],
+        projection: Optional[Dict[str, Any]] = None
+    ) -> List[dict]:
+        return await self._pieces.find(
+            _in_puzzle(puzzle_id, code={"$in": codes}), projection
+        ).to_list(None)
+
+    async def get_pieces_changed_since(
+        self,
+        puzzle_id: str,
+        revision: int,
+        projection: Optional[Dict[str, Any]] = None
+    ) -> List[dict]:
+        return await self._pieces.find(
+            _in_puzzle(puzzle_id, updatedRev={"$gt": revision}), projection, sort=_CHANGED_SORT
+        ).to_list(None)
+
+    async def count_pieces_by_sector(self, puzzle_id: str) -> Dict[str, int]:
+        cursor = await self._pieces.aggregate(_sector_counts_pipeline(puzzle_id))
+        return {r["_id"]: r["count"] async for r in cursor}
+
+    async def get_sector_links(self, puzzle_id: str) -> List[dict]:
+        cursor = await self._links.aggregate(_sector_links_pipeline(puzzle_id))
+        return await cursor.to_list(None)
+
+    async def get_pieces_page(
+        self,
+        puzzle_id: str,
+        after_code: Optional[str] = None,
+        limit: int = 100,
+        projection: Optional[Dict[str, Any]] = None
+    ) -> List[dict]:
+        query, options = _pieces_page(puzzle_id, after_code, limit)
+        return await self._pieces.find(query, projection, **options).to_list(None)
+
+    async def update_piece(self, piece_id: str, update_doc: dict) -> Optional[dict]:
+        return await self._pieces.find_one_and_update(
+            _by_id(piece_id), {"$set": update_doc}, return_document=ReturnDocument.AFTER
+        )
+
+    async def upsert_piece(self, puzzle_id: str, code: str, update_doc: dict) -> dict:
+        return await self._pieces.find_one_and_update(
+            _in_puzzle(puzzle_id, code=code), {"$set": update_doc},
+            upsert=True, return_document=ReturnDocument.AFTER
+        )
+
+    async def bulk_upsert_pieces(self, puzzle_id: str, piece_docs: List[dict]) -> Dict[str, int]:
+        if not piece_docs:
+            return _bulk_counts(None)
+        result = await self._pieces.bulk_write(_upsert_pieces_ops(puzzle_id, piece_docs), ordered=False)
+        return _bulk_counts(result)
+
+    async def delete_piece(self, piece_id: str) -> bool:
+        deleted = await self._pieces.find_one_and_delete(_by_id(piece_id), {"code": 1, "puzzleId": 1})
+        if deleted is None:
+            return False
+        await self._links.bulk_write(_forget_sector_ops(deleted["puzzleId"], deleted["code"]), ordered=False)
+        return True
+
+    # ─── P I E C E   L I N K S ────────────────────────────────────────────────
+
+    async def replace_piece_links(
+        self, puzzle_id: str, links_by_code: Dict[str, List[dict]], sectors: Dict[str, str]
+    ) -> None:
+        if not links_by_code:
+            return
+        wanted = _neighbor_codes(links_by_code, sectors)
+        found = await self._pieces.find(
+            _in_puzzle(puzzle_id, code={"$in": wanted}), _SECTOR_FIELDS
+        ).to_list(None) if wanted else []
+        await self._links.bulk_write(
+            _replace_links_ops(puzzle_id, links_by_code, sectors, _link_targets(found, sectors)),
+            ordered=False
+        )
+
+    async def get_links_from(self, puzzle_id: str, code: str) -> List[dict]:
+        return await self._links.find(_in_puzzle(puzzle_id, fromCode=code), _LINK_FIELDS).to_list(None)
+
+    async def get_links_to(self, puzzle_id: str, code: str) -> List[dict]:
+        return await self._links.find(_in_puzzle(puzzle_id, toCode=code), _LINK_FIELDS).to_list(None)
+
+    async def get_links_touching(self, puzzle_id: str, codes: List[str]) -> List[dict]:
+        return await self._links.find(_links_touching_query(puzzle_id, codes), _LINK_FIELDS).to_list(None)
+
+    async def delete_piece_links(self, puzzle_id: str) -> int:
+        result = await self._links.delete_many(_in_puzzle(puzzle_id))
+        return result.deleted_count
+
+    # ─── I N S T R U C T I O N   P L A N S ────────────────────────────────────
+
+    async def get_instruction_plan(
+        self,
+        puzzle_id: str, start_code: str, strategy: str, revision: int
+    ) -> Optional[dict]:
+        return await self._plans.find_one(_plan_query(puzzle_id, start_code, strategy, revision))
+
+    async def get_latest_instruction_plan(
+        self,
+        puzzle_id: str, start_code: str, strategy: str
+    ) -> Optional[dict]:
+        return await self._plans.find_one(_plan_query(puzzle_id, start_code, strategy), sort=_LATEST_SORT)
+
+    async def save_instruction_plan(self, plan_doc: dict) -> None:
+        await self._plans.replace_one(_plan_key(plan_doc), plan_doc, upsert=True)
+
+    async def get_instruction_plan_keys(self, puzzle_id: str) -> List[Tuple[str, str]]:
+        cursor = await self._plans.aggregate(_plan_keys_pipeline(puzzle_id))
+        return _plan_keys(await cursor.to_list(None))
+
+    async def delete_instruction_plans(self, puzzle_id: str, below_revision: Optional[int] = None) -> int:
+        result = await self._plans.delete_many(_plans_below(puzzle_id, below_revision))
+        return result.deleted_count
+
+
+# ─── C O N S U L T A S ────────────────────────────────────────────────────────
+# Filtros, proyecciones y órdenes compartidos por los dos repositorios.
+
+_SECTOR_FIELDS = {"_id": 0, "code": 1, "sector": 1}
+_LINK_FIELDS   = {"_id": 0, "fromCode": 1, "edgeId": 1, "toCode": 1}
+_CHANGED_SORT  = [("updatedRev", 1), ("code", 1)]
+_LATEST_SORT   = [("revision", -1)]
+_PLAN_KEY      = ("puzzleId", "startCode", "strategy", "revision")
+
+
+def _by_id(doc_id: str) -> dict:
+    return {"_id": ObjectId(doc_id)}
+
+
+def _in_puzzle(puzzle_id: str, **conditions: Any) -> dict:
+    """Filtro de los documentos de un puzzle, con condiciones opcionales por campo."""
+    return {"puzzleId": ObjectId(puzzle_id), **conditions}
+
+
+def _puzzles_page(
+    after_id: Optional[str], limit: int, descending: bool
+) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """(filtro, opciones de find) de una página de puzzles paginada por _id."""
+    query: Dict[str, Any] = {}
+    if after_id:
+        query["_id"] = {"$lt" if descending else "$gt": ObjectId(after_id)}
+    return query, {"sort": [("_id", -1 if descending else 1)], "limit": page_size(limit)}
+
+
+def _pieces_page(
+    puzzle_id: str, after_code: Optional[str], limit: int
+) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """(filtro, opciones de find) de una página de piezas paginada por código."""
+    query = _in_puzzle(puzzle_id)
+    if after_code is not None:
+        query["code"] = {"$gt": after_code}
+    return query, {"sort": [("code", 1)], "limit": page_size(limit)}
+
+
+def _links_touching_query(puzzle_id: str, codes: List[str]) -> dict:
+    oid = ObjectId(puzzle_id)
+    return {"$or": [
+        {"puzzleId": oid, "fromCode": {"$in": codes}},
+        {"puzzleId": oid, "toCode": {"$in": codes}},
+    ]}
+
+
+def _link_targets(found: Iterable[dict], sectors: Dict[str, str]) -> Dict[str, Optional[str]]:
+    """Sector de cada vecino: el leído de la base de datos o el de las piezas que se escriben."""
+    return {**{r["code"]: r.get("sector") for r in found}, **sectors}
+
+
+def _plan_query(
+    puzzle_id: str, start_code: str, strategy: str, revision: Optional[int] = None
+) -> dict:
+    query = _in_puzzle(puzzle_id, startCode=start_code, strategy=strategy)
+    if revision is not None:
+        query["revision"] = revision
+    return query
+
+
+def _plan_key(plan_doc: dict) -> dict:
+    return {k: plan_doc[k] for k in _PLAN_KEY}
+
+
+def _plans_below(puzzle_id: str, below_revision: Optional[int]) -> dict:
+    if below_revision is None:
+        return _in_puzzle(puzzle_id)
+    return _in_puzzle(puzzle_id, revision={"$lt": below_revision})
+
+
+def _plan_keys(rows: Iterable[dict]) -> List[Tuple[str, str]]:
+    return [(r["_id"]["startCode"], r["_id"]["strategy"]) for r in rows]
+
+
+def _bulk_counts(result) -> Dict[str, int]:
+    """Conteos de un bulk_write de piezas (todo a cero si no hubo nada que escribir)."""
+    if result is None:
+        return {"upserted": 0, "matched": 0, "modified": 0}
+    return {
+        "upserted": result.upserted_count,
+        "matched":  result.matched_count,
+        "modified": result.modified_count,
+    }
+
+# ─── O P E R A C I O N E S ────────────────────────────────────────────────────
+
+def _upsert_pieces_ops(puzzle_id: str, piece_docs: List[dict]) -> list:
+    """Operaciones de `bulk_upsert_pieces`: un upsert por (puzzleId, code)."""
+    oid = ObjectId(puzzle_id)
+    return [
+        UpdateOne(
+            {"puzzleId": oid, "code": doc["code"]},
+            {"$set": {k: v for k, v in doc.items() if k != "code"}},
+            upsert=True
+        )
+        for doc in piece_docs
+    ]
+
+
+def _neighbor_codes(links_by_code: Dict[str, List[dict]], sectors: Dict[str, str]) -> List[str]:
+    """Vecinos de las piezas a escribir cuyo sector no se conoce aún."""
+    return sorted({
+        to_code
+        for neighbors in links_by_code.values()
+        for _, to_code in neighbor_links(neighbors)
+        if to_code not in sectors
+    })
+
+
+def _replace_links_ops(
+    puzzle_id: str,
+    links_by_code: Dict[str, List[dict]],
+    sectors: Dict[str, str],
+    targets: Dict[str, Optional[str]]
+) -> list:
+    """
+    Operaciones de `replace_piece_links` (ver `base.neighbor_links`).
+    `targets` da el sector de cada vecino (los que falten no están mapeados).
+    """
+    oid = ObjectId(puzzle_id)
+    ops: list = []
+    for code, neighbors in links_by_code.items():
+        links = neighbor_links(neighbors)
+        sector = sectors.get(code)
+        ops += [
+            UpdateOne(
+                {"puzzleId": oid, "fromCode": code, "edgeId": edge_id},
+                {"$set": {"toCode": to_code, "fromSector": sector, "toSector": targets.get(to_code)}},
+                upsert=True
+            )
+            for edge_id, to_code in links
+        ]
+        ops.append(DeleteMany({
+            "puzzleId": oid, "fromCode": code,
+            "edgeId": {"$nin": [edge_id for edge_id, _ in links]},
+        }))
+        ops.append(UpdateMany({"puzzleId": oid, "toCode": code}, {"$set": {"toSector": sector}}))
+    return ops
+
+
+def _forget_sector_ops(puzzle_oid: ObjectId, code: str) -> list:
+    """Quita el sector de una pieza borrada de los enlaces en que aparece."""
+    return [
+        UpdateMany({"puzzleId": puzzle_oid, "fromCode": code}, {"$set": {"fromSector": None}}),
+        UpdateMany({"puzzleId": puzzle_oid, "toCode": code}, {"$set": {"toSector": None}}),
+    ]
+
+# ─── A G R E G A C I O N E S ──────────────────────────────────────────────────
+
+def _live_writers(now: float, exclude: Optional[str] = None) -> dict:
+    """Expresión: reservas de `writers` sin caducar (y que no son de `exclude`)."""
+    cond: Any = {"$gte": ["$$this.at", now - REVISION_LEASE_SECONDS]}
+    if exclude is not None:
+        cond = {"$and": [cond, {"$ne": ["$$this.id", exclude]}]}
+    return {"$filter": {"input": {"$ifNull": ["$writers", []]}, "cond": cond}}
+
+
+def _reserve_revision_pipeline(writer: str, now: float) -> List[dict]:
+    """Como `base.reserve_revision`: contador + 1 y reserva nueva de `writer`."""
+    return [{"$set": {
+        "reservedRevision": {"$add": [
+            {"$max": [{"$ifNull": ["$reservedRevision", 0]}, {"$ifNull": ["$revision", 0]}]}, 1
+        ]},
+        "writers": {"$concatArrays": [_live_writers(now), [{"id": writer, "at": now}]]},
+    }}]
+
+
+def _publish_revision_pipeline(writer: str, now: float) -> List[dict]:
+    """Como `base.publish_revision`: quita la reserva y publica si no queda ninguna."""
+    return [
+        {"$set": {"writers": _live_writers(now, exclude=writer)}},
+        {"$set": {"revision": {"$cond": [
+            {"$eq": [{"$size": "$writers"}, 0]},
+            {"$max": [{"$ifNull": ["$revision", 0]}, {"$ifNull": ["$reservedRevision", 0]}]},
+            {"$ifNull": ["$revision", 0]},
+        ]}}},
+    ]
+
+
+def _plan_keys_pipeline(puzzle_id: str) -> List[dict]:
+    return [
+        {"$match": {"puzzleId": ObjectId(puzzle_id)}},
+        {"$group": {"_id": {"startCode": "$startCode", "strategy": "$strategy"}}},
+    ]
+
+
+def _sector_counts_pipeline(puzzle_id: str) -> List[dict]:
+    return [
+        {"$match": {"puzzleId": ObjectId(puzzle_id)}},
+        {"$group": {"_id": "$sector", "count": {"$sum": 1}}},
+    ]
+
+
+def _sector_links_pipeline(puzzle_id: str) -> List[dict]:
+    """
+    Cuenta los enlaces de `piece_links` por par de sectores, con los sectores
+    guardados en cada enlace; los enlaces con un extremo sin mapear (sector
+    None) no cuentan.
+    """
+    return [
+        {"$match": {
+            "puzzleId": ObjectId(puzzle_id),
+            "fromSector": {"$ne": None},
+            "toSector": {"$ne": None},
+        }},
+        {"$match": {"$expr": {"$ne": ["$fromSector", "$toSector"]}}},
+        {"$group": {
+            "_id": {"fromSector": "$fromSector", "toSector": "$toSector"},
+            "count": {"$sum": 1},
+        }},
+        {"$project": {
+            "_id": 0, "fromSector": "$_id.fromSector", "toSector": "$_id.toSector", "count": 1,
+        }},
+    ]
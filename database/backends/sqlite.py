@@ -0,0 +1,461 @@
+# database/backends/sqlite.py
+"""
+Backend SQLite embebido (módulo estándar `sqlite3`, sin servidor).
+
+Cada documento se guarda serializado con `bson.json_util` (conserva
+ObjectId y fechas) y los campos por los que se consulta se copian a
+columnas propias, con los mismos índices que declara `database.indexes`
+para MongoDB:
+
+- pieces: UNIQUE(puzzle_id, code), (puzzle_id, sector) y (puzzle_id, updated_rev)
+- piece_links: UNIQUE(puzzle_id, from_code, edge_id) y (puzzle_id, to_code)
+- instruction_plans: PRIMARY KEY(puzzle_id, start_code, strategy, revision)
+
+Una sola conexión compartida entre hilos (modo WAL), con las operaciones
+serializadas por un lock. Las proyecciones se aplican en Python.
+"""
+
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from bson import ObjectId, json_util
+from database.backends.base import (
+    Repository, apply_update, neighbor_links, page_size, project, publish_revision, reserve_revision
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS puzzles (
+    id  TEXT PRIMARY KEY,
+    doc TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS pieces (
+    id        TEXT PRIMARY KEY,
+    puzzle_id TEXT NOT NULL,
+    code      TEXT NOT NULL,
+    sector    TEXT,
+    doc       TEXT NOT NULL,
+    updated_rev INTEGER NOT NULL DEFAULT 0
+);
+CREATE UNIQUE INDEX IF NOT EXISTS pieces_puzzle_code_unique ON pieces (puzzle_id, code);
+CREATE INDEX IF NOT EXISTS pieces_puzzle_sector ON pieces (puzzle_id, sector);
+CREATE TABLE IF NOT EXISTS piece_links (
+    puzzle_id TEXT NOT NULL,
+    from_code TEXT NOT NULL,
+    edge_id   INTEGER NOT NULL,
+    to_code   TEXT NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS piece_links_from_unique
+    ON piece_links (puzzle_id, from_code, edge_id);
+CREATE INDEX IF NOT EXISTS piece_links_to ON piece_links (puzzle_id, to_code);
+CREATE TABLE IF NOT EXISTS instruction_plans (
+    puzzle_id  TEXT NOT NULL,
+    start_code TEXT NOT NULL,
+    strategy   TEXT NOT NULL,
+    revision   INTEGER NOT NULL,
+    doc        TEXT NOT NULL,
+    PRIMARY KEY (puzzle_id, start_code, strategy, revision)
+);
+"""
+
+
+def _dumps(doc: dict) -> str:
+    return json_util.dumps(doc)
+
+
+def _loads(text: str) -> dict:
+    return json_util.loads(text)
+
+
+class SQLiteRepository(Repository):
+    """Repositorio sobre un archivo SQLite (o ":memory:")."""
+
+    def __init__(self, path: str):
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._migrate()
+
+    def _migrate(self) -> None:
+        """Añade a archivos creados con versiones anteriores las columnas nuevas."""
+        columns = {name for _, name, *_ in self._conn.execute("PRAGMA table_info(pieces)")}
+        if "updated_rev" not in columns:
+            self._conn.execute("ALTER TABLE pieces ADD COLUMN updated_rev INTEGER NOT NULL DEFAULT 0")
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS pieces_puzzle_updated_rev ON pieces (puzzle_id, updated_rev)"
+        )
+
+    def ping(self) -> None:
+        self._query("SELECT 1")
+
+    def _query(self, sql: str, params: tuple = ()) -> List[tuple]:
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def _write(self, statements: List[Tuple[str, tuple]]) -> List[int]:
+        """Ejecuta varias sentencias en una transacción; devuelve filas afectadas."""
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                counts = [self._conn.execute(sql, params).rowcount for sql, params in statements]
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+            return counts
+
+    # ─── P U Z Z L E S ────────────────────────────────────────────────────────
+
+    def create_puzzle(self, puzzle_doc: dict) -> dict:
+        doc = {**puzzle_doc, "_id": puzzle_doc.get("_id") or ObjectId()}
+        self._write([("INSERT INTO puzzles (id, doc) VALUES (?, ?)", (str(doc["_id"]), _dumps(doc)))])
+        return doc
+
+    def get_puzzle_by_id(self, puzzle_id: str) -> Optional[dict]:
+        rows = self._query("SELECT doc FROM puzzles WHERE id = ?", (str(puzzle_id),))
+        return _loads(rows[0][0]) if rows else None
+
+    def get_all_puzzles(self) -> List[dict]:
+        return [_loads(d) for d, in self._query("SELECT doc FROM puzzles ORDER BY id")]
+
+    def get_puzzles_page(
+        self,
+        after_id: Optional[str] = None,
+        limit: int = 50,
+        projection: Optional[Dict[str, Any]] = None,
+        descending: bool = False
+    ) -> List[dict]:
+        # Los ObjectId en hexadecimal ordenan igual como texto
+        sql, params = "SELECT doc FROM puzzles", []
+        if after_id:
+            sql += " WHERE id < ?" if descending else " WHERE id > ?"
+            params.append(str(after_id))
+        sql += f" ORDER BY id {'DESC' if descending else 'ASC'} LIMIT ?"
+        params.append(page_size(limit))
+        return [project(_loads(d), projection) for d, in self._query(sql, tuple(params))]
+
+    def update_puzzle(self, puzzle_id: str, update_doc: dict) -> Optional[dict]:
+        return self._update_puzzle(puzzle_id, {"$set": update_doc}, upsert=False)
+
+    def upsert_puzzle(self, puzzle_id: str, update_doc: dict) -> dict:
+        return self._update_puzzle(puzzle_id, {"$set": update_doc}, upsert=True)
+
+    def reserve_puzzle_revision(self, puzzle_id: str, writer: str) -> int:
+        doc = self._modify_puzzle(puzzle_id, lambda d: reserve_revision(d, writer, time.time()), upsert=False)
+        return doc["reservedRevision"] if doc else 0
+
+    def publish_puzzle_revision(self, puzzle_id: str, writer: str) -> int:
+        doc = self._modify_puzzle(puzzle_id, lambda d: publish_revision(d, writer, time.time()), upsert=False)
+        return doc.get("revision", 0) if doc else 0
+
+    def get_puzzle_revision(self, puzzle_id: str) -> int:
+        doc = self.get_puzzle_by_id(puzzle_id)
+        return doc.get("revision", 0) if doc else 0
+
+    def delete_puzzle(self, puzzle_id: str) -> bool:
+        return self._write([("DELETE FROM puzzles WHERE id = ?", (str(puzzle_id),))])[0] > 0
+
+    def _update_puzzle(self, puzzle_id: str, update: dict, upsert: bool) -> Optional[dict]:
+        return self._modify_puzzle(puzzle_id, lambda doc: apply_update(doc, update), upsert)
+
+    def _modify_puzzle(self, puzzle_id: str, modify: Callable[[dict], Any], upsert: bool) -> Optional[dict]:
+        """Lee el puzzle, lo modifica en el sitio con `modify` y lo guarda."""
+        with self._lock:
+            doc = self.get_puzzle_by_id(puzzle_id)
+            if doc is None:
+                if not upsert:
+                    return None
+                doc = {"_id": ObjectId(puzzle_id)}
+            modify(doc)
+            self._write([(
+                "INSERT OR REPLACE INTO puzzles (id, doc) VALUES (?, ?)",
+                (str(doc["_id"]), _dumps(doc))
+            )])
+            return doc
+
+    # ─── P I E C E S ──────────────────────────────────────────────────────────
+
+    def create_piece(self, piece_doc: dict) -> dict:
+        doc = {**piece_doc, "_id": piece_doc.get("_id") or ObjectId()}
+        self._write([self._piece_insert(doc, replace=False)])
+        return doc
+
+    def get_piece_by_id(self, piece_id: str) -> Optional[dict]:
+        rows = self._query("SELECT doc FROM pieces WHERE id = ?", (str(piece_id),))
+        return _loads(rows[0][0]) if rows else None
+
+    def get_piece_by_code(self, puzzle_id: str, code: str) -> Optional[dict]:
+        rows = self._query(
+            "SELECT doc FROM pieces WHERE puzzle_id = ? AND code = ?", (str(puzzle_id), code)
+        )
+        return _loads(rows[0][0]) if rows else None
+
+    def iter_pieces_by_puzzle(
+        self,
+        puzzle_id: str,
+        projection: Optional[Dict[str, Any]] = None,
+        batch_size: int = 10_000
+    ) -> Iterator[dict]:
+        # Por lotes ordenados por código, para no retener el lock mientras se consume
+        after = None
+        while True:
+            batch = self._pieces_after(str(puzzle_id), after, batch_size)
+            for text in batch:
+                yield project(_loads(text), projection)
+            if len(batch) < batch_size:
+                return
+            after = _loads(batch[-1])["code"]
+
+    def get_pieces_by_sector(
+        self,
+        puzzle_id: str,
+        sector: str,
+        projection: Optional[Dict[str, Any]] = None
+    ) -> List[dict]:
+        rows = self._query(
+            "SELECT doc FROM pieces WHERE puzzle_id = ? AND sector = ? ORDER BY code",
+            (str(puzzle_id), sector)
+        )
+        return [project(_loads(text), projection) for text, in rows]
+
+    def get_pieces_by_codes(
+        self,
+        puzzle_id: str,
+        codes: List[str],
+        projection: Optional[Dict[str, Any]] = None
+    ) -> List[dict]:
+        docs = []
+        unique = sorted(set(codes))
+        # Por tandas, para no superar el límite de parámetros de SQLite
+        for i in range(0, len(unique), 800):
+            chunk = unique[i:i + 800]
+            rows = self._query(
+                f"SELECT doc FROM pieces WHERE puzzle_id = ? AND code IN ({', '.join('?' * len(chunk))}) "
+                "ORDER BY code",
+                (str(puzzle_id), *chunk)
+            )
+            docs.extend(project(_loads(text), projection) for text, in rows)
+        return docs
+
+    def get_pieces_changed_since(
+        self,
+        puzzle_id: str,
+        revision: int,
+        projection: Optional[Dict[str, Any]] = None
+    ) -> List[dict]:
+        rows = self._query(
+            "SELECT doc FROM pieces WHERE puzzle_id = ? AND updated_rev > ? ORDER BY updated_rev, code",
+            (str(puzzle_id), revision)
+        )
+        return [project(_loads(text), projection) for text, in rows]
+
+    def count_pieces_by_sector(self, puzzle_id: str) -> Dict[str, int]:
+        rows = self._query(
+            "SELECT sector, COUNT(*) FROM pieces WHERE puzzle_id = ? GROUP BY sector",
+            (str(puzzle_id),)
+        )
+        return dict(rows)
+
+    def get_sector_links(self, puzzle_id: str) -> List[dict]:
+        rows = self._query(
+            "SELECT a.sector, b.sector, COUNT(*) FROM piece_links l "
+            "JOIN pieces a ON a.puzzle_id = l.puzzle_id AND a.code = l.from_code "
+            "JOIN pieces b ON b.puzzle_id = l.puzzle_id AND b.code = l.to_code "
+            "WHERE l.puzzle_id = ? AND a.sector <> b.sector "
+            "GROUP BY a.sector, b.sector ORDER BY a.sector, b.sector",
+            (str(puzzle_id),)
+        )
+        return [{"fromSector": f, "toSector": t, "count": n} for f, t, n in rows]
+
+    def get_pieces_page(
+        self,
+        puzzle_id: str,
+        after_code: Optional[str] = None,
+        limit: int = 100,
+        projection: Optional[Dict[str, Any]] = None
+    ) -> List[dict]:
+        batch = self._pieces_after(str(puzzle_id), after_code, page_size(limit))
+        return [project(_loads(text), projection) for text in batch]
+
+    def update_piece(self, piece_id: str, update_doc: dict) -> Optional[dict]:
+        with self._lock:
+            doc = self.get_piece_by_id(piece_id)
+            if doc is None:
+                return None
+            apply_update(doc, {"$set": update_doc})
+            self._write([self._piece_insert(doc, replace=True)])
+            return doc
+
+    def upsert_piece(self, puzzle_id: str, code: str, update_doc: dict) -> dict:
+        with self._lock:
+            doc, _ = self._merge_piece(ObjectId(puzzle_id), code, update_doc)
+            self._write([self._piece_insert(doc, replace=True)])
+            return doc
+
+    def bulk_upsert_pieces(self, puzzle_id: str, piece_docs: List[dict]) -> Dict[str, int]:
+        counts = {"upserted": 0, "matched": 0, "modified": 0}
+        oid = ObjectId(puzzle_id)
+        with self._lock:
+            statements = []
+            for piece in piece_docs:
+                fields = {k: v for k, v in piece.items() if k != "code"}
+                doc, outcome = self._merge_piece(oid, piece["code"], fields)
+                statements.append(self._piece_insert(doc, replace=True))
+                if outcome == "upserted":
+                    counts["upserted"] += 1
+                else:
+                    counts["matched"] += 1
+                    counts["modified"] += outcome == "modified"
+            if statements:
+                self._write(statements)
+        return counts
+
+    def delete_piece(self, piece_id: str) -> bool:
+        return self._write([("DELETE FROM pieces WHERE id = ?", (str(piece_id),))])[0] > 0
+
+    def _pieces_after(self, puzzle_id: str, after_code: Optional[str], limit: int) -> List[str]:
+        if after_code is None:
+            rows = self._query(
+                "SELECT doc FROM pieces WHERE puzzle_id = ? ORDER BY code LIMIT ?",
+                (puzzle_id, limit)
+            )
+        else:
+            rows = self._query(
+                "SELECT doc FROM pieces WHERE puzzle_id = ? AND code > ? ORDER BY code LIMIT ?",
+                (puzzle_id, after_code, limit)
+            )
+        return [d for d, in rows]
+
+    def _merge_piece(self, oid: ObjectId, code: str, fields: dict) -> Tuple[dict, str]:
+        doc = self.get_piece_by_code(str(oid), code)
+        if doc is None:
+            doc = {"_id": ObjectId(), "puzzleId": oid, "code": code}
+            apply_update(doc, {"$set": fields})
+            return doc, "upserted"
+        before = {k: doc.get(k) for k in fields}
+        apply_update(doc, {"$set": fields})
+        return doc, "modified" if before != fields else "matched"
+
+    @staticmethod
+    def _piece_insert(doc: dict, replace: bool) -> Tuple[str, tuple]:
+        verb = "INSERT OR REPLACE" if replace else "INSERT"
+        return (
+            f"{verb} INTO pieces (id, puzzle_id, code, sector, doc, updated_rev) VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                str(doc["_id"]), str(doc["puzzleId"]), doc["code"], doc.get("sector"), _dumps(doc),
+                doc.get("updatedRev", 0)
+            )
+        )
+
+    # ─── P I E C E   L I N K S ────────────────────────────────────────────────
+
+    def replace_piece_links(
+        self, puzzle_id: str, links_by_code: Dict[str, List[dict]], sectors: Dict[str, str]
+    ) -> None:
+        # `sectors` no se guarda: get_sector_links une con `pieces` por índice,
+        # en el propio proceso
+        if not links_by_code:
+            return
+        # Upsert por (pieza, conexión) y borrado solo de las conexiones que ya
+        # no tienen vecino: nunca se pierden los enlaces que se mantienen
+        pid = str(puzzle_id)
+        statements = []
+        for code, neighbors in links_by_code.items():
+            links = neighbor_links(neighbors)
+            statements += [
+                ("INSERT INTO piece_links (puzzle_id, from_code, edge_id, to_code) VALUES (?, ?, ?, ?) "
+                 "ON CONFLICT (puzzle_id, from_code, edge_id) DO UPDATE SET to_code = excluded.to_code",
+                 (pid, code, edge_id, to_code))
+                for edge_id, to_code in links
+            ]
+            kept = [edge_id for edge_id, _ in links]
+            statements.append((
+                "DELETE FROM piece_links WHERE puzzle_id = ? AND from_code = ? "
+                f"AND edge_id NOT IN ({', '.join('?' * len(kept))})",
+                (pid, code, *kept)
+            ))
+        self._write(statements)
+
+    def get_links_from(self, puzzle_id: str, code: str) -> List[dict]:
+        rows = self._query(
+            "SELECT from_code, edge_id, to_code FROM piece_links "
+            "WHERE puzzle_id = ? AND from_code = ? ORDER BY edge_id",
+            (str(puzzle_id), code)
+        )
+        return [{"fromCode": f, "edgeId": e, "toCode": t} for f, e, t in rows]
+
+    def get_links_to(self, puzzle_id: str, code: str) -> List[dict]:
+        rows = self._query(
+            "SELECT from_code, edge_id, to_code FROM piece_links "
+            "WHERE puzzle_id = ? AND to_code = ?",
+            (str(puzzle_id), code)
+        )
+        return [{"fromCode": f, "edgeId": e, "toCode": t} for f, e, t in rows]
+
+    def get_links_touching(self, puzzle_id: str, codes: List[str]) -> List[dict]:
+        links = {}
+        # Por tandas, para no superar el límite de parámetros de SQLite
+        for i in range(0, len(codes), 400):
+            chunk = codes[i:i + 400]
+            marks = ", ".join("?" * len(chunk))
+            rows = self._query(
+                "SELECT from_code, edge_id, to_code FROM piece_links WHERE puzzle_id = ? "
+                f"AND (from_code IN ({marks}) OR to_code IN ({marks}))",
+                (str(puzzle_id), *chunk, *chunk)
+            )
+            for f, e, t in rows:
+                links[(f, e)] = {"fromCode": f, "edgeId": e, "toCode": t}
+        return list(links.values())
+
+    def delete_piece_links(self, puzzle_id: str) -> int:
+        return self._write([("DELETE FROM piece_links WHERE puzzle_id = ?", (str(puzzle_id),))])[0]
+
+    # ─── I N S T R U C T I O N   P L A N S ───────────────────────────────────
+
+    def get_instruction_plan(
+        self, puzzle_id: str, start_code: str, strategy: str, revision: int
+    ) -> Optional[dict]:
+        rows = self._query(
+            "SELECT doc FROM instruction_plans "
+            "WHERE puzzle_id = ? AND start_code = ? AND strategy = ? AND revision = ?",
+            (str(puzzle_id), start_code, strategy, revision)
+        )
+        return _loads(rows[0][0]) if rows else None
+
+    def get_latest_instruction_plan(
+        self, puzzle_id: str, start_code: str, strategy: str
+    ) -> Optional[dict]:
+        rows = self._query(
+            "SELECT doc FROM instruction_plans "
+            "WHERE puzzle_id = ? AND start_code = ? AND strategy = ? "
+            "ORDER BY revision DESC LIMIT 1",
+            (str(puzzle_id), start_code, strategy)
+        )
+        return _loads(rows[0][0]) if rows else None
+
+    def save_instruction_plan(self, plan_doc: dict) -> None:
+        self._write([(
+            "INSERT OR REPLACE INTO instruction_plans "
+            "(puzzle_id, start_code, strategy, revision, doc) VALUES (?, ?, ?, ?, ?)",
+            (str(plan_doc["puzzleId"]), plan_doc["startCode"], plan_doc["strategy"],
+             plan_doc["revision"], _dumps(plan_doc))
+        )])
+
+    def get_instruction_plan_keys(self, puzzle_id: str) -> List[Tuple[str, str]]:
+        rows = self._query(
+            "SELECT DISTINCT start_code, strategy FROM instruction_plans WHERE puzzle_id = ?",
+            (str(puzzle_id),)
+        )
+        return [(s, k) for s, k in rows]
+
+    def delete_instruction_plans(self, puzzle_id: str, below_revision: Optional[int] = None) -> int:
+        if below_revision is None:
+            statement = ("DELETE FROM instruction_plans WHERE puzzle_id = ?", (str(puzzle_id),))
+        else:
+            statement = (
+                "DELETE FROM instruction_plans WHERE puzzle_id = ? AND revision < ?",
+                (str(puzzle_id), below_revision)
+            )
+        return self._write([statement])[0]
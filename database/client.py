@@ -3,13 +3,35 @@
 Módulo de conexión a MongoDB.
 
 Expone la función `get_db()` que retorna una instancia única de la base de datos,
-evitando múltiples conexiones con MongoClient.
+evitando múltiples conexiones con MongoClient. El cliente se crea en la
+primera llamada (no al importar), de modo que arrancar la aplicación o
+recargar un script de Streamlit no espera a la red (el calentamiento lo
+hace `database.backends.warm_up`).
+
+Las opciones del cliente (`CLIENT_OPTIONS`: pool, tiempo de selección de
+servidor y compresión) salen de la configuración y se comparten con
+`async_client`. En la primera conexión (de este cliente o del asíncrono) se
+aseguran los índices declarados en `database.indexes`.
 """
 
-from pymongo import MongoClient
-from configs.config import MONGO_URI, DB_NAME
+import threading
+from configs.config import (
+    MONGO_URI, DB_NAME, MONGO_MAX_POOL_SIZE, MONGO_MIN_POOL_SIZE, MONGO_MAX_IDLE_TIME_MS,
+    MONGO_SERVER_SELECTION_TIMEOUT_MS, MONGO_COMPRESSORS, require_mongo_settings
+)
+
+# Opciones de MongoClient, comunes a los clientes síncrono y asíncrono
+CLIENT_OPTIONS = {
+    "maxPoolSize": MONGO_MAX_POOL_SIZE,
+    "minPoolSize": MONGO_MIN_POOL_SIZE,
+    "maxIdleTimeMS": MONGO_MAX_IDLE_TIME_MS,
+    "serverSelectionTimeoutMS": MONGO_SERVER_SELECTION_TIMEOUT_MS,
+}
+if MONGO_COMPRESSORS:
+    CLIENT_OPTIONS["compressors"] = MONGO_COMPRESSORS
 
 _client = None
+_client_lock = threading.Lock()
 
 def get_db():
     """
@@ -18,5 +40,13 @@ def get_db():
     """
     global _client
     if _client is None:
-        _client = MongoClient(MONGO_URI)
+        with _client_lock:
+            if _client is None:
+                require_mongo_settings()
+                # pymongo se importa aquí: solo lo paga quien usa MongoDB
+                from pymongo import MongoClient
+                from database.indexes import ensure_indexes, ensure_indexes_once
+                client = MongoClient(MONGO_URI, **CLIENT_OPTIONS)
+                ensure_indexes_once(lambda: ensure_indexes(client[DB_NAME]))
+                _client = client
     return _client[DB_NAME]
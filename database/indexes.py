@@ -0,0 +1,155 @@
+# database/indexes.py
+"""
+Índices gestionados de MongoDB.
+
+Declara los índices que necesitan las consultas de `repositories.py` y los
+crea de forma idempotente (`ensure_indexes`, o `ensure_indexes_async` con el
+cliente asíncrono) al abrir la primera conexión, sea del cliente que sea:
+`ensure_indexes_once` lo hace una sola vez por proceso. Si no se puede crear
+un índice único (p. ej. hay códigos duplicados) se lanza `UniqueIndexError`:
+sin él se podrían escribir duplicados sin que nadie se entere.
+
+`index_report` compara lo declarado con lo existente y usa `$indexStats`
+para señalar índices faltantes, no declarados o sin uso; `log_index_report`
+lo registra al arrancar (ver `database.backends.warm_up`).
+"""
+
+import threading
+from typing import Callable, Dict, List
+from pymongo import ASCENDING, IndexModel
+from pymongo.database import Database
+from pymongo.errors import OperationFailure
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Índices requeridos por colección
+INDEXES: Dict[str, List[IndexModel]] = {
+    "pieces": [
+        # get_piece_by_code / upsert_piece; su prefijo cubre get_pieces_by_puzzle.
+        # Único: garantiza un solo documento por código dentro de un puzzle.
+        IndexModel(
+            [("puzzleId", ASCENDING), ("code", ASCENDING)],
+            name="puzzleId_code_unique", unique=True
+        ),
+        # get_pieces_by_sector / count_pieces_by_sector
+        IndexModel(
+            [("puzzleId", ASCENDING), ("sector", ASCENDING)],
+            name="puzzleId_sector"
+        ),
+        # get_pieces_changed_since (sincronización por revisión)
+        IndexModel(
+            [("puzzleId", ASCENDING), ("updatedRev", ASCENDING)],
+            name="puzzleId_updatedRev"
+        ),
+    ],
+    "puzzles": [
+        IndexModel([("createdAt", ASCENDING)], name="createdAt"),
+    ],
+    "piece_links": [
+        # replace_piece_links / get_links_from
+        IndexModel(
+            [("puzzleId", ASCENDING), ("fromCode", ASCENDING), ("edgeId", ASCENDING)],
+            name="puzzleId_fromCode_edgeId_unique", unique=True
+        ),
+        # get_links_to: quién apunta a una pieza
+        IndexModel(
+            [("puzzleId", ASCENDING), ("toCode", ASCENDING)],
+            name="puzzleId_toCode"
+        ),
+    ],
+    "instruction_plans": [
+        # get_instruction_plan: un plan por (puzzle, inicio, estrategia, revisión)
+        IndexModel(
+            [("puzzleId", ASCENDING), ("startCode", ASCENDING),
+             ("strategy", ASCENDING), ("revision", ASCENDING)],
+            name="puzzleId_startCode_strategy_revision_unique", unique=True
+        ),
+    ],
+}
+
+_ensured = False
+_ensure_lock = threading.Lock()
+
+class UniqueIndexError(RuntimeError):
+    """No se pudo crear un índice único (los datos ya lo incumplen)."""
+
+def ensure_indexes_once(ensure: Callable[[], None]) -> None:
+    """
+    Ejecuta `ensure` (la creación de índices de un cliente) solo la primera
+    vez en el proceso; si falla, la próxima conexión lo vuelve a intentar.
+    """
+    global _ensured
+    with _ensure_lock:
+        if not _ensured:
+            ensure()
+            _ensured = True
+
+def ensure_indexes(db: Database) -> None:
+    """
+    Crea los índices declarados. create_indexes es idempotente, así que puede
+    llamarse en cada arranque. Se crean de uno en uno: un índice normal que
+    falla se registra y no impide los demás; uno único lanza `UniqueIndexError`.
+    """
+    for collection, models in INDEXES.items():
+        for model in models:
+            try:
+                db[collection].create_indexes([model])
+            except OperationFailure as e:
+                _index_failed(collection, model, e)
+
+async def ensure_indexes_async(db) -> None:
+    """Como `ensure_indexes`, sobre una base de datos de `AsyncMongoClient`."""
+    for collection, models in INDEXES.items():
+        for model in models:
+            try:
+                await db[collection].create_indexes([model])
+            except OperationFailure as e:
+                _index_failed(collection, model, e)
+
+def _index_failed(collection: str, model: IndexModel, error: OperationFailure) -> None:
+    name = model.document["name"]
+    if model.document.get("unique"):
+        logger.error("No se pudo crear el índice único '%s' de '%s': %s", name, collection, error)
+        raise UniqueIndexError(
+            f"No se pudo crear el índice único '{name}' de '{collection}' "
+            f"(¿hay documentos duplicados?): {error}"
+        ) from error
+    logger.warning("No se pudo crear el índice '%s' de '%s': %s", name, collection, error)
+
+def index_report(db: Database) -> Dict[str, Dict[str, List[str]]]:
+    """
+    Devuelve, por colección, los índices:
+    - missing: declarados pero inexistentes
+    - undeclared: existentes pero no declarados aquí
+    - unused: sin operaciones registradas desde el último reinicio del servidor
+    """
+    report = {}
+    for collection, models in INDEXES.items():
+        declared = {m.document["name"] for m in models}
+        existing = set(db[collection].index_information()) - {"_id_"}
+        try:
+            stats = db[collection].aggregate([{"$indexStats": {}}])
+            unused = sorted(
+                s["name"] for s in stats
+                if s["name"] != "_id_" and s["accesses"]["ops"] == 0
+            )
+        except OperationFailure as e:
+            logger.warning("$indexStats no disponible para '%s': %s", collection, e)
+            unused = []
+        report[collection] = {
+            "missing": sorted(declared - existing),
+            "undeclared": sorted(existing - declared),
+            "unused": unused,
+        }
+    return report
+
+def log_index_report(db: Database) -> None:
+    """Registra los índices faltantes, no declarados o sin uso de `index_report`."""
+    for collection, report in index_report(db).items():
+        if report["missing"]:
+            logger.warning("Índices faltantes en '%s': %s", collection, ", ".join(report["missing"]))
+        if report["undeclared"]:
+            logger.info("Índices no declarados en '%s': %s", collection, ", ".join(report["undeclared"]))
+        if report["unused"]:
+            logger.info("Índices sin uso en '%s': %s", collection, ", ".join(report["unused"]))
@@ -1,95 +1,326 @@
 # database/repositories.py
+"""
+Acceso a datos de puzzles, piezas, enlaces y planes de instrucciones.
 
-from typing import List, Optional
-from bson import ObjectId
-from database.client import get_db
+Cada función delega en el repositorio del backend configurado
+(`STORAGE_BACKEND`, ver `database.backends`), así que los servicios no
+dependen de MongoDB. Los documentos tienen siempre la forma de MongoDB
+(`_id` y `puzzleId` como ObjectId) sea cual sea el backend; las notas sobre
+consultas de los docstrings describen la implementación de MongoDB.
+Cada llamada se mide con `utils.metrics` (capa "repository").
+"""
 
-# Obtener las colecciones
-db = get_db()
-_puzzles = db.puzzles
-_pieces  = db.pieces
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from database.backends import get_repository as _repo
+from database.backends.base import MAX_PAGE_SIZE
+from utils.metrics import timed
 
 # ─── P U Z Z L E S ────────────────────────────────────────────────────────────
 
+@timed("repository")
 def create_puzzle(puzzle_doc: dict) -> dict:
     """
-    Inserta un nuevo puzzle y devuelve el documento creado (con _id).
+    Inserta un nuevo puzzle y devuelve el documento creado (con _id),
+    sin volver a leerlo de la base de datos.
     """
-    result = _puzzles.insert_one(puzzle_doc)
-    return _puzzles.find_one({"_id": result.inserted_id})
+    return _repo().create_puzzle(puzzle_doc)
 
+@timed("repository")
 def get_puzzle_by_id(puzzle_id: str) -> Optional[dict]:
     """
     Obtiene un puzzle por su _id (string).
     """
-    return _puzzles.find_one({"_id": ObjectId(puzzle_id)})
+    return _repo().get_puzzle_by_id(puzzle_id)
 
+@timed("repository")
 def get_all_puzzles() -> List[dict]:
     """
     Devuelve todos los puzzles.
     """
-    return list(_puzzles.find())
+    return _repo().get_all_puzzles()
 
+@timed("repository")
+def get_puzzles_page(
+    after_id: Optional[str] = None,
+    limit: int = 50,
+    projection: Optional[Dict[str, Any]] = None,
+    descending: bool = False
+) -> List[dict]:
+    """
+    Devuelve una página de puzzles ordenada por _id, paginada por clave
+    (`_id` mayor/menor que `after_id`) en lugar de skip, con proyección opcional.
+    `limit` se acota a MAX_PAGE_SIZE.
+    """
+    return _repo().get_puzzles_page(after_id, limit, projection, descending)
+
+@timed("repository")
 def update_puzzle(puzzle_id: str, update_doc: dict) -> Optional[dict]:
     """
-    Actualiza campos de un puzzle y devuelve el puzzle actualizado.
+    Actualiza campos de un puzzle y devuelve el puzzle actualizado
+    (un solo viaje con find_one_and_update).
+    """
+    return _repo().update_puzzle(puzzle_id, update_doc)
+
+@timed("repository")
+def upsert_puzzle(puzzle_id: str, update_doc: dict) -> dict:
+    """
+    Actualiza un puzzle o lo crea con ese _id si no existe, de forma atómica.
+    Devuelve el documento resultante.
+    """
+    return _repo().upsert_puzzle(puzzle_id, update_doc)
+
+@timed("repository")
+def reserve_puzzle_revision(puzzle_id: str, writer: str) -> int:
+    """
+    Reserva atómicamente la siguiente revisión del puzzle para una escritura
+    de piezas (`writer` la identifica) y la devuelve. No se publica hasta
+    `publish_puzzle_revision`.
+    """
+    return _repo().reserve_puzzle_revision(puzzle_id, writer)
+
+@timed("repository")
+def publish_puzzle_revision(puzzle_id: str, writer: str) -> int:
+    """
+    Libera la reserva de `writer` y, si no queda ninguna viva, publica la
+    última revisión reservada. Devuelve la revisión publicada.
     """
-    _puzzles.update_one(
-        {"_id": ObjectId(puzzle_id)},
-        {"$set": update_doc}
-    )
-    return get_puzzle_by_id(puzzle_id)
+    return _repo().publish_puzzle_revision(puzzle_id, writer)
 
+@timed("repository")
+def get_puzzle_revision(puzzle_id: str) -> int:
+    """Devuelve la revisión publicada del puzzle (0 si nunca se modificaron sus piezas)."""
+    return _repo().get_puzzle_revision(puzzle_id)
+
+@timed("repository")
 def delete_puzzle(puzzle_id: str) -> bool:
     """
     Elimina un puzzle. Devuelve True si se borró al menos un documento.
     """
-    result = _puzzles.delete_one({"_id": ObjectId(puzzle_id)})
-    return result.deleted_count > 0
+    return _repo().delete_puzzle(puzzle_id)
 
 # ─── P I E C E S ───────────────────────────────────────────────────────────────
 
+@timed("repository")
 def create_piece(piece_doc: dict) -> dict:
     """
-    Inserta una nueva pieza y devuelve el documento creado (con _id).
+    Inserta una nueva pieza y devuelve el documento creado (con _id),
+    sin volver a leerlo de la base de datos.
     """
-    result = _pieces.insert_one(piece_doc)
-    return _pieces.find_one({"_id": result.inserted_id})
+    return _repo().create_piece(piece_doc)
 
+@timed("repository")
 def get_piece_by_id(piece_id: str) -> Optional[dict]:
     """
     Obtiene una pieza por su _id (string).
     """
-    return _pieces.find_one({"_id": ObjectId(piece_id)})
+    return _repo().get_piece_by_id(piece_id)
 
+@timed("repository")
 def get_piece_by_code(puzzle_id: str, code: str) -> Optional[dict]:
     """
     Busca una pieza dentro de un puzzle por su código legible (P1, P2…).
     """
-    return _pieces.find_one({
-        "puzzleId": ObjectId(puzzle_id),
-        "code": code
-    })
+    return _repo().get_piece_by_code(puzzle_id, code)
+
+@timed("repository")
+def get_pieces_by_puzzle(
+    puzzle_id: str,
+    projection: Optional[Dict[str, Any]] = None
+) -> List[dict]:
+    """
+    Devuelve todas las piezas de un puzzle, con proyección opcional.
+    """
+    return _repo().get_pieces_by_puzzle(puzzle_id, projection)
+
+@timed("repository")
+def iter_pieces_by_puzzle(
+    puzzle_id: str,
+    projection: Optional[Dict[str, Any]] = None,
+    batch_size: int = 10_000
+) -> Iterator[dict]:
+    """
+    Recorre las piezas de un puzzle sin acumularlas en una lista: el cursor
+    trae lotes grandes (`batch_size`) y cada documento se puede descartar
+    en cuanto se consume.
+    """
+    return _repo().iter_pieces_by_puzzle(puzzle_id, projection, batch_size)
+
+@timed("repository")
+def get_pieces_page(
+    puzzle_id: str,
+    after_code: Optional[str] = None,
+    limit: int = 100,
+    projection: Optional[Dict[str, Any]] = None
+) -> List[dict]:
+    """
+    Devuelve una página de piezas de un puzzle ordenada por código.
+    La paginación es por clave (`code` mayor que `after_code`), resuelta
+    íntegramente por el índice único (puzzleId, code).
+    `limit` se acota a MAX_PAGE_SIZE.
+    """
+    return _repo().get_pieces_page(puzzle_id, after_code, limit, projection)
+
+@timed("repository")
+def get_pieces_by_sector(
+    puzzle_id: str,
+    sector: str,
+    projection: Optional[Dict[str, Any]] = None
+) -> List[dict]:
+    """
+    Devuelve las piezas de un sector del puzzle, resuelto por el índice
+    (puzzleId, sector): permite trabajar con un sector sin cargar el resto.
+    """
+    return _repo().get_pieces_by_sector(puzzle_id, sector, projection)
+
+@timed("repository")
+def get_pieces_by_codes(
+    puzzle_id: str,
+    codes: List[str],
+    projection: Optional[Dict[str, Any]] = None
+) -> List[dict]:
+    """
+    Devuelve las piezas del puzzle cuyos códigos estén en `codes` (las que no
+    existan se omiten), en una sola consulta por el índice (puzzleId, code).
+    """
+    return _repo().get_pieces_by_codes(puzzle_id, codes, projection)
+
+@timed("repository")
+def get_pieces_changed_since(
+    puzzle_id: str,
+    revision: int,
+    projection: Optional[Dict[str, Any]] = None
+) -> List[dict]:
+    """
+    Devuelve las piezas escritas después de la revisión `revision` del
+    puzzle (campo `updatedRev`), resuelto por el índice (puzzleId, updatedRev):
+    el coste es proporcional a los cambios, no al tamaño del puzzle.
+    """
+    return _repo().get_pieces_changed_since(puzzle_id, revision, projection)
 
-def get_pieces_by_puzzle(puzzle_id: str) -> List[dict]:
+@timed("repository")
+def count_pieces_by_sector(puzzle_id: str) -> Dict[str, int]:
     """
-    Devuelve todas las piezas de un puzzle.
+    Devuelve el número de piezas de cada sector, agregado en la base de datos.
     """
-    return list(_pieces.find({"puzzleId": ObjectId(puzzle_id)}))
+    return _repo().count_pieces_by_sector(puzzle_id)
 
+@timed("repository")
+def get_sector_links(puzzle_id: str) -> List[dict]:
+    """
+    Devuelve cuántos enlaces de `piece_links` unen cada par de sectores
+    distintos ({fromSector, toSector, count}), agregado en la base de datos.
+    """
+    return _repo().get_sector_links(puzzle_id)
+
+@timed("repository")
 def update_piece(piece_id: str, update_doc: dict) -> Optional[dict]:
     """
-    Actualiza campos de una pieza y devuelve la pieza actualizada.
+    Actualiza campos de una pieza y devuelve la pieza actualizada
+    (un solo viaje con find_one_and_update).
+    """
+    return _repo().update_piece(piece_id, update_doc)
+
+@timed("repository")
+def upsert_piece(puzzle_id: str, code: str, update_doc: dict) -> dict:
+    """
+    Actualiza la pieza (puzzleId, code) o la crea si no existe, en una sola
+    operación atómica. Devuelve el documento resultante.
+    """
+    return _repo().upsert_piece(puzzle_id, code, update_doc)
+
+@timed("repository")
+def bulk_upsert_pieces(puzzle_id: str, piece_docs: List[dict]) -> Dict[str, int]:
+    """
+    Inserta o actualiza en un solo bulk_write (no ordenado) un lote de piezas
+    identificadas por (puzzleId, code). Cada documento debe traer `code` y los
+    campos a settear. Devuelve los conteos de upserted/matched/modified.
     """
-    _pieces.update_one(
-        {"_id": ObjectId(piece_id)},
-        {"$set": update_doc}
-    )
-    return get_piece_by_id(piece_id)
+    return _repo().bulk_upsert_pieces(puzzle_id, piece_docs)
 
+@timed("repository")
 def delete_piece(piece_id: str) -> bool:
     """
     Elimina una pieza. Devuelve True si se borró al menos un documento.
     """
-    result = _pieces.delete_one({"_id": ObjectId(piece_id)})
-    return result.deleted_count > 0
+    return _repo().delete_piece(piece_id)
+
+# ─── P I E C E   L I N K S ────────────────────────────────────────────────────
+# Índice de adyacencia en ambos sentidos: un documento por vecino declarado
+# {puzzleId, fromCode, edgeId, toCode}, consultable por origen o por destino.
+
+@timed("repository")
+def replace_piece_links(
+    puzzle_id: str, links_by_code: Dict[str, List[dict]], sectors: Dict[str, str]
+) -> None:
+    """
+    Reemplaza los enlaces salientes de las piezas indicadas.
+    `links_by_code` mapea cada código a su lista de neighbors
+    ({edgeId, neighborCode}); los vecinos vacíos se ignoran. `sectors` da
+    el sector de cada una de esas piezas (MongoDB lo guarda en los enlaces).
+    Se conservan los enlaces que no cambian y se borran solo los que ya no
+    tienen vecino.
+    """
+    return _repo().replace_piece_links(puzzle_id, links_by_code, sectors)
+
+@timed("repository")
+def get_links_from(puzzle_id: str, code: str) -> List[dict]:
+    """Enlaces declarados por la pieza `code` (hacia sus vecinos)."""
+    return _repo().get_links_from(puzzle_id, code)
+
+@timed("repository")
+def get_links_to(puzzle_id: str, code: str) -> List[dict]:
+    """Enlaces de otras piezas que apuntan a `code` (¿quién referencia a P42?)."""
+    return _repo().get_links_to(puzzle_id, code)
+
+@timed("repository")
+def get_links_touching(puzzle_id: str, codes: List[str]) -> List[dict]:
+    """Enlaces que salen de o llegan a alguna de las piezas `codes`."""
+    return _repo().get_links_touching(puzzle_id, codes)
+
+@timed("repository")
+def delete_piece_links(puzzle_id: str) -> int:
+    """Elimina todos los enlaces de un puzzle. Devuelve cuántos se borraron."""
+    return _repo().delete_piece_links(puzzle_id)
+
+# ─── I N S T R U C T I O N   P L A N S ───────────────────────────────────────
+
+@timed("repository")
+def get_instruction_plan(
+    puzzle_id: str, start_code: str, strategy: str, revision: int
+) -> Optional[dict]:
+    """
+    Obtiene el plan materializado de (puzzle, pieza inicial, estrategia)
+    para una revisión concreta. Una sola lectura por índice único.
+    """
+    return _repo().get_instruction_plan(puzzle_id, start_code, strategy, revision)
+
+@timed("repository")
+def get_latest_instruction_plan(
+    puzzle_id: str, start_code: str, strategy: str
+) -> Optional[dict]:
+    """
+    Obtiene el plan de la revisión más alta guardada, sin conocer la revisión
+    (útil para pedirlo a la vez que el puzzle y comparar después).
+    """
+    return _repo().get_latest_instruction_plan(puzzle_id, start_code, strategy)
+
+@timed("repository")
+def save_instruction_plan(plan_doc: dict) -> None:
+    """
+    Guarda (o reemplaza) un plan identificado por
+    (puzzleId, startCode, strategy, revision).
+    """
+    return _repo().save_instruction_plan(plan_doc)
+
+@timed("repository")
+def get_instruction_plan_keys(puzzle_id: str) -> List[Tuple[str, str]]:
+    """Devuelve los pares (startCode, strategy) con algún plan guardado para el puzzle."""
+    return _repo().get_instruction_plan_keys(puzzle_id)
+
+@timed("repository")
+def delete_instruction_plans(puzzle_id: str, below_revision: Optional[int] = None) -> int:
+    """
+    Elimina los planes de un puzzle; si se indica `below_revision`, solo los
+    de revisiones anteriores. Devuelve cuántos se borraron.
+    """
+    return _repo().delete_instruction_plans(puzzle_id, below_revision)
@@ -0,0 +1,25 @@
+# models/import_report.py
+"""
+Modelo de datos para el resultado de una importación masiva de piezas.
+
+Acumula los conteos escritos en la base de datos y los errores de
+validación por fila, para mostrarlos en la interfaz.
+"""
+
+from pydantic import BaseModel
+from typing import List, Optional
+
+class RowError(BaseModel):
+    row: int                     # número de fila/línea en el archivo (desde 1)
+    code: Optional[str] = None   # código de la pieza, si se pudo leer
+    message: str
+
+class ImportReport(BaseModel):
+    processed: int = 0
+    upserted: int = 0
+    modified: int = 0
+    errors: List[RowError] = []
+
+    @property
+    def valid(self) -> int:
+        return self.processed - len(self.errors)
@@ -3,10 +3,14 @@
 Modelo de datos para una Pieza del rompecabezas.
 
 Incluye validación de campos como código, sector, tipo de bordes y conexiones vecinas.
+`PieceSummary` es la versión ligera usada en listados.
+
+`PieceRecord` es la lectura rápida de piezas escritas por la propia
+aplicación: mismos atributos que `Piece`, sin validación por campo.
 """
 
 from pydantic import BaseModel, Field, field_validator
-from typing import List, Optional
+from typing import Any, Dict, List, NamedTuple, Optional
 from bson import ObjectId
 
 class Edge(BaseModel):
@@ -31,5 +35,75 @@ class Piece(BaseModel):
             return str(v)
         return v
 
+    @field_validator("neighbors")
+    def one_neighbor_per_edge(cls, v):
+        # El índice de enlaces guarda un vecino por (pieza, conexión)
+        seen = set()
+        for nb in v:
+            if nb.edgeId in seen:
+                raise ValueError(f"La conexión {nb.edgeId} tiene más de un vecino.")
+            seen.add(nb.edgeId)
+        return v
+
+    class Config:
+        allow_population_by_field_name = True
+
+class PieceSummary(BaseModel):
+    id: str = Field(default=None, alias="_id")
+    code: str
+    sector: str
+
+    @field_validator("id", mode="before")
+    def objectid_to_str(cls, v):
+        if isinstance(v, ObjectId):
+            return str(v)
+        return v
+
     class Config:
         allow_population_by_field_name = True
+
+# ─── L E C T U R A   R Á P I D A ──────────────────────────────────────────────
+
+class EdgeRef(NamedTuple):
+    edgeId: int
+    type: str
+
+class NeighborRef(NamedTuple):
+    edgeId: int
+    neighborCode: Optional[str]
+
+class PieceRecord:
+    """
+    Pieza de solo lectura construida desde un documento de confianza (escrito
+    por la aplicación, ya validado al guardarse). No pasa por Pydantic: las
+    conexiones son tuplas con nombre y los ObjectId se convierten a texto
+    solo cuando se leen `id` o `puzzleId`.
+    """
+
+    __slots__ = ("_id", "_puzzle_id", "code", "sector", "edges", "neighbors")
+
+    def __init__(self, doc: Dict[str, Any]):
+        self._id = doc.get("_id")
+        self._puzzle_id = doc.get("puzzleId")
+        self.code: str = doc["code"]
+        self.sector: str = doc.get("sector", "")
+        self.edges = [EdgeRef(e["edgeId"], e.get("type")) for e in doc.get("edges") or ()]
+        self.neighbors = [
+            NeighborRef(nb["edgeId"], nb.get("neighborCode")) for nb in doc.get("neighbors") or ()
+        ]
+
+    @property
+    def id(self) -> Optional[str]:
+        return str(self._id) if self._id is not None else None
+
+    @property
+    def puzzleId(self) -> Optional[str]:
+        return str(self._puzzle_id) if self._puzzle_id is not None else None
+
+    def to_model(self) -> Piece:
+        """Convierte el registro en un `Piece` validado (p. ej. para editarlo)."""
+        return Piece(
+            _id=self.id, puzzleId=self.puzzleId, code=self.code, sector=self.sector,
+            edges=[e._asdict() for e in self.edges],
+            neighbors=[nb._asdict() for nb in self.neighbors],
+        )
@@ -3,7 +3,12 @@
 Modelo de datos para un Puzzle.
 
 Incluye campos como nombre, total de piezas, sectores definidos y fecha de creación.
+`revision` es la revisión publicada: crece con cada escritura de piezas
+terminada (ver `touch_puzzle`). `linksIndexed` indica que el índice de
+enlaces del puzzle está completo; los puzzles anteriores a él lo completan
+la primera vez que se necesita (ver `rebuild_piece_links`).
 Convierte ObjectId a string para compatibilidad con Streamlit.
+`PuzzleSummary` es la versión ligera usada en listados y selectores.
 """
 
 from pydantic import BaseModel, Field, field_validator
@@ -17,6 +22,8 @@ class Puzzle(BaseModel):
     totalPieces: int
     sectors: List[str]
     createdAt: datetime
+    revision: int = 0
+    linksIndexed: bool = False
 
     @field_validator("id", mode="before")
     def objectid_to_str(cls, v):
@@ -27,3 +34,17 @@ class Puzzle(BaseModel):
     class Config:
         allow_population_by_field_name = True
         json_encoders = { ObjectId: lambda oid: str(oid) }
+
+class PuzzleSummary(BaseModel):
+    id: str = Field(default=None, alias="_id")
+    name: str
+    totalPieces: int
+
+    @field_validator("id", mode="before")
+    def objectid_to_str(cls, v):
+        if isinstance(v, ObjectId):
+            return str(v)
+        return v
+
+    class Config:
+        allow_population_by_field_name = True
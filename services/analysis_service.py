@@ -0,0 +1,42 @@
+# services/analysis_service.py
+"""
+Análisis estructural del grafo de piezas de un puzzle.
+
+Recomienda por qué pieza empezar cada isla (grupo de piezas conectadas entre
+sí pero no con el resto): su centro (ver `utils.center`). Las islas en sí
+las detecta `utils.graph.connected_components`, que usa el plan de armado
+para cubrirlas todas.
+"""
+from typing import List, NamedTuple
+from services.instruction_cache import current_revision
+from services.puzzle_service import load_graph
+from services.read_cache import cached
+from utils.center import island_centers
+from utils.metrics import timed
+
+
+class StartRecommendation(NamedTuple):
+    """Pieza recomendada para empezar a armar una isla."""
+    code: str
+    sector: str
+    island_size: int
+    depth: int    # excentricidad: uniones hasta la pieza más lejana de su isla
+    exact: bool   # False si el centro es aproximado (se agotaron los barridos)
+
+@timed("service")
+def recommend_start_pieces(puzzle_id: str, limit: int = 3) -> List[StartRecommendation]:
+    """
+    Devuelve la pieza de inicio recomendada (el centro) de las `limit` islas
+    más grandes, empezando por la mayor. Se cachea por revisión del puzzle.
+    """
+    def load() -> List[StartRecommendation]:
+        graph = load_graph(puzzle_id)
+        return [
+            StartRecommendation(
+                graph.codes[c.center], graph.sector_of(c.center), c.size, c.eccentricity, c.exact
+            )
+            for c in island_centers(graph)
+        ]
+
+    key = ("start_pieces", puzzle_id, current_revision(puzzle_id))
+    return cached(key, load)[:limit]
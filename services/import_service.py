@@ -0,0 +1,248 @@
+# services/import_service.py
+"""
+Importación masiva de piezas desde archivos CSV o JSON.
+
+El archivo se lee por bloques (`chunk_size` filas), cada fila se valida y
+cada bloque válido se escribe con un único `bulk_upsert_pieces` (más un
+bulk_write del índice de enlaces), de modo que importar miles de piezas
+cuesta unos pocos viajes a la base de datos.
+
+Formatos aceptados:
+- CSV con columnas `code,sector,edges,neighbors`, donde `edges` son los tipos
+  de conexión separados por `|` (la posición es el edgeId, desde 1) y
+  `neighbors` los códigos vecinos en el mismo orden (vacío = sin vecino).
+  Ejemplo: `P1,A,macho|hembra|macho,P2||P7`
+- JSON: un arreglo de objetos o JSON Lines (un objeto por línea) con la misma
+  forma que los documentos de piezas: code, sector, edges, neighbors.
+
+`import_piece_documents` hace lo mismo con documentos ya leídos (p. ej. las
+piezas de un snapshot, ver `services.snapshot_service`).
+"""
+import csv
+import io
+import json
+from typing import Any, Callable, Dict, IO, Iterable, Iterator, List, Optional, Tuple, Union
+
+from pydantic import ValidationError
+
+from database.repositories import (
+    bulk_upsert_pieces  as repo_bulk_upsert_pieces,
+    replace_piece_links as repo_replace_links,
+)
+from models.import_report import ImportReport, RowError
+from models.piece import Piece
+from services.puzzle_service import get_puzzle, next_revision, touch_puzzle
+from utils.metrics import timed
+
+EDGE_TYPE_VALUES = ("hembra", "macho")
+DEFAULT_CHUNK_SIZE = 500
+
+# (número de fila, fila cruda)
+_Row = Tuple[int, Dict[str, Any]]
+
+
+@timed("service")
+def import_pieces(
+    puzzle_id: str,
+    stream: Union[IO[str], IO[bytes]],
+    fmt: str = "csv",
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    on_progress: Optional[Callable[[ImportReport], None]] = None
+) -> ImportReport:
+    """
+    Importa piezas a un puzzle desde un stream CSV o JSON.
+    - fmt: "csv" o "json" (arreglo o JSON Lines)
+    - on_progress: se llama con el reporte parcial tras escribir cada bloque
+    Las filas inválidas se reportan en `errors` y no detienen la importación.
+    """
+    if fmt not in ("csv", "json"):
+        raise ValueError(f"Formato de importación desconocido: '{fmt}'.")
+    text = _as_text(stream)
+    rows = _read_csv(text) if fmt == "csv" else _read_json(text)
+    return _import_rows(puzzle_id, rows, chunk_size, on_progress)
+
+
+@timed("service")
+def import_piece_documents(
+    puzzle_id: str,
+    docs: Iterable[Dict[str, Any]],
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    on_progress: Optional[Callable[[ImportReport], None]] = None
+) -> ImportReport:
+    """
+    Importa piezas desde documentos con la forma {code, sector, edges,
+    neighbors}, con la misma validación y escritura por bloques que
+    `import_pieces` (la "fila" de cada error es la posición del documento).
+    """
+    return _import_rows(puzzle_id, enumerate(docs, start=1), chunk_size, on_progress)
+
+
+def _import_rows(
+    puzzle_id: str,
+    rows: Iterator[_Row],
+    chunk_size: int,
+    on_progress: Optional[Callable[[ImportReport], None]]
+) -> ImportReport:
+    puzzle = get_puzzle(puzzle_id)
+    if puzzle is None:
+        raise ValueError(f"Puzzle '{puzzle_id}' no encontrado.")
+    if chunk_size < 1:
+        raise ValueError("chunk_size debe ser mayor que cero.")
+
+    sectors = set(puzzle.sectors)
+    report = ImportReport()
+    for chunk in _chunks(rows, chunk_size):
+        # Dentro de un bloque, la última aparición de un código prevalece
+        docs: Dict[str, dict] = {}
+        for row_number, raw in chunk:
+            report.processed += 1
+            try:
+                doc = _validate_row(puzzle_id, raw, sectors)
+            except ValueError as e:
+                report.errors.append(RowError(row=row_number, code=_raw_code(raw), message=str(e)))
+                continue
+            docs[doc["code"]] = doc
+
+        if docs:
+            # Todo el bloque se escribe con una misma revisión
+            lease = next_revision(puzzle_id)
+            try:
+                for doc in docs.values():
+                    doc["updatedRev"] = lease.revision
+                counts = repo_bulk_upsert_pieces(puzzle_id, list(docs.values()))
+                repo_replace_links(
+                    puzzle_id,
+                    {code: doc["neighbors"] for code, doc in docs.items()},
+                    {code: doc["sector"] for code, doc in docs.items()},
+                )
+            finally:
+                touch_puzzle(puzzle_id, lease=lease)
+            report.upserted += counts["upserted"]
+            report.modified += counts["modified"]
+
+        if on_progress:
+            on_progress(report)
+
+    return report
+
+# ─── L E C T U R A ────────────────────────────────────────────────────────────
+
+def _as_text(stream: Union[IO[str], IO[bytes]]) -> IO[str]:
+    # Los archivos subidos en Streamlit son binarios; csv/json necesitan texto
+    if isinstance(stream, io.TextIOBase):
+        return stream
+    return io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+
+
+def _read_csv(text: IO[str]) -> Iterator[_Row]:
+    reader = csv.DictReader(text)
+    missing = {"code", "sector", "edges"} - set(reader.fieldnames or ())
+    if missing:
+        raise ValueError(f"Faltan columnas en el CSV: {', '.join(sorted(missing))}.")
+
+    for row_number, row in enumerate(reader, start=2):  # la fila 1 es el encabezado
+        types = [t.strip() for t in (row.get("edges") or "").split("|")]
+        codes = [c.strip() for c in (row.get("neighbors") or "").split("|")]
+        yield row_number, {
+            "code": (row.get("code") or "").strip(),
+            "sector": (row.get("sector") or "").strip(),
+            "edges": [
+                {"edgeId": eid, "type": t}
+                for eid, t in enumerate(types, start=1)
+            ],
+            "neighbors": [
+                {"edgeId": eid, "neighborCode": c or None}
+                for eid, c in enumerate(codes, start=1)
+                if eid <= len(types)
+            ],
+        }
+
+
+def _read_json(text: IO[str]) -> Iterator[_Row]:
+    first = text.read(1)
+    while first and first.isspace():
+        first = text.read(1)
+
+    if first == "[":
+        # Un arreglo JSON no se puede leer por partes con la librería estándar
+        items = json.loads(first + text.read())
+        for row_number, item in enumerate(items, start=1):
+            yield row_number, item
+        return
+
+    # JSON Lines: se procesa línea a línea
+    for row_number, line in enumerate(_prepend(first, text), start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield row_number, json.loads(line)
+        except json.JSONDecodeError as e:
+            yield row_number, {"__error__": f"JSON inválido: {e.msg}"}
+
+
+def _prepend(first: str, text: IO[str]) -> Iterator[str]:
+    head = text.readline()
+    yield first + head
+    yield from text
+
+
+def _chunks(rows: Iterator[_Row], size: int) -> Iterator[List[_Row]]:
+    chunk: List[_Row] = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+# ─── V A L I D A C I Ó N ──────────────────────────────────────────────────────
+
+def _validate_row(puzzle_id: str, raw: Any, sectors: set) -> dict:
+    """Valida una fila y devuelve el documento a escribir (sin puzzleId)."""
+    if not isinstance(raw, dict):
+        raise ValueError("Cada pieza debe ser un objeto.")
+    if "__error__" in raw:
+        raise ValueError(raw["__error__"])
+
+    try:
+        piece = Piece(
+            puzzleId=puzzle_id,
+            code=raw.get("code"),
+            sector=raw.get("sector"),
+            edges=raw.get("edges") or [],
+            neighbors=raw.get("neighbors") or [],
+        )
+    except ValidationError as e:
+        first = e.errors()[0]
+        location = ".".join(str(part) for part in first["loc"])
+        raise ValueError(f"{location}: {first['msg']}") from None
+
+    if not piece.code:
+        raise ValueError("La pieza no tiene código.")
+    if piece.sector not in sectors:
+        raise ValueError(f"Sector '{piece.sector}' no definido en el puzzle.")
+    if not piece.edges:
+        raise ValueError("La pieza debe tener al menos una conexión.")
+
+    edge_ids = set()
+    for edge in piece.edges:
+        if edge.type not in EDGE_TYPE_VALUES:
+            raise ValueError(f"Tipo de conexión inválido: '{edge.type}'.")
+        edge_ids.add(edge.edgeId)
+    for nb in piece.neighbors:
+        if nb.edgeId not in edge_ids:
+            raise ValueError(f"El vecino usa la conexión {nb.edgeId}, que no existe en la pieza.")
+
+    return {
+        "code": piece.code,
+        "sector": piece.sector,
+        "edges": [e.model_dump() for e in piece.edges],
+        "neighbors": [nb.model_dump() for nb in piece.neighbors],
+    }
+
+
+def _raw_code(raw: Any) -> Optional[str]:
+    code = raw.get("code") if isinstance(raw, dict) else None
+    return code if isinstance(code, str) and code else None
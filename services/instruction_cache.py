@@ -0,0 +1,127 @@
+# services/instruction_cache.py
+"""
+Caché de instrucciones generadas, versionada por revisión de puzzle.
+
+Cada puzzle guarda en la base de datos una revisión que se incrementa con
+cualquier escritura de sus piezas. Este módulo recuerda la última revisión
+conocida por el proceso durante REVISION_TTL_SECONDS (pasado ese tiempo se
+vuelve a leer de la base de datos, para ver las escrituras de otros procesos)
+y guarda las instrucciones con clave (puzzle_id, start_code, strategy,
+revisión), de modo que una escritura deja inaccesibles las entradas antiguas
+al instante. Otros módulos pueden suscribirse a las invalidaciones con
+`add_invalidation_listener` (p. ej. para reconstruir planes en segundo plano);
+si la escritura cambió una sola pieza, reciben también el cambio
+(`PieceChange`) para poder actualizar lo suyo de forma incremental.
+"""
+
+import sys
+import threading
+import time
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from configs.config import INSTRUCTION_CACHE_MAX_BYTES, REVISION_TTL_SECONDS
+from database.repositories import get_puzzle_revision as repo_get_puzzle_revision
+from utils.cache import LRUCache
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class PieceChange(NamedTuple):
+    """Escritura de una sola pieza: su código y los enlaces (edgeId, vecino) que declaraba antes."""
+    code: str
+    old_links: List[Tuple[int, str]]
+
+
+# Funciones llamadas con (puzzle_id, nueva revisión o None, cambio o None) tras cada invalidación
+Listener = Callable[[str, Optional[int], Optional[PieceChange]], None]
+
+# puzzle_id -> (revisión, instante en que se supo, de time.monotonic)
+_revisions: Dict[str, Tuple[int, float]] = {}
+_revisions_lock = threading.Lock()
+
+_listeners: List[Listener] = []
+
+
+def _instructions_size(instructions: List[str]) -> int:
+    return sys.getsizeof(instructions) + sum(sys.getsizeof(s) for s in instructions)
+
+
+_cache = LRUCache(max_bytes=INSTRUCTION_CACHE_MAX_BYTES, sizeof=_instructions_size)
+
+
+def current_revision(puzzle_id: str) -> int:
+    """
+    Revisión vigente de un puzzle: la conocida localmente si se supo hace
+    menos de REVISION_TTL_SECONDS y, si no, la de la base de datos.
+    """
+    entry = _revisions.get(puzzle_id)
+    if entry is not None and time.monotonic() - entry[1] < REVISION_TTL_SECONDS:
+        return entry[0]
+    return remember_revision(puzzle_id, repo_get_puzzle_revision(puzzle_id))
+
+
+def remember_revision(puzzle_id: str, revision: int) -> int:
+    """
+    Registra una revisión recién leída de la base de datos por otra vía y
+    devuelve la vigente (nunca retrocede si ya se conocía una posterior).
+    """
+    with _revisions_lock:
+        entry = _revisions.get(puzzle_id)
+        revision = max(entry[0], revision) if entry is not None else revision
+        _revisions[puzzle_id] = (revision, time.monotonic())
+    return revision
+
+
+def get_cached(
+    puzzle_id: str, start_code: str, strategy: str, revision: int
+) -> Optional[List[str]]:
+    """Devuelve las instrucciones cacheadas para esa revisión, o None."""
+    cached = _cache.get((puzzle_id, start_code, strategy, revision))
+    return list(cached) if cached is not None else None
+
+
+def get_cached_window(
+    puzzle_id: str, start_code: str, strategy: str, revision: int, offset: int, limit: int
+) -> Optional[List[str]]:
+    """Como get_cached, pero copia solo la ventana [offset, offset+limit)."""
+    cached = _cache.get((puzzle_id, start_code, strategy, revision))
+    return cached[offset:offset + limit] if cached is not None else None
+
+
+def store(
+    puzzle_id: str, start_code: str, strategy: str, revision: int, instructions: List[str]
+) -> None:
+    """Guarda instrucciones generadas a partir de la revisión indicada."""
+    if revision != current_revision(puzzle_id):
+        return  # hubo una escritura mientras se generaban: ya son obsoletas
+    _cache.put((puzzle_id, start_code, strategy, revision), list(instructions))
+
+
+def invalidate_puzzle(
+    puzzle_id: str, revision: Optional[int] = None, change: Optional[PieceChange] = None
+) -> None:
+    """
+    Registra la nueva revisión de un puzzle tras una escritura y descarta sus
+    instrucciones cacheadas. Sin `revision` (p. ej. al borrar el puzzle) se
+    olvida la revisión local y se volverá a leer de la base de datos.
+    `change` describe la escritura si solo tocó una pieza.
+    """
+    if revision is None:
+        with _revisions_lock:
+            _revisions.pop(puzzle_id, None)
+    else:
+        remember_revision(puzzle_id, revision)
+    _cache.invalidate(lambda key: key[0] == puzzle_id)
+
+    for listener in _listeners:
+        try:
+            listener(puzzle_id, revision, change)
+        except Exception:
+            logger.exception("Error en un listener de invalidación del puzzle %s", puzzle_id)
+
+
+def add_invalidation_listener(listener: Listener) -> None:
+    """Suscribe una función a las invalidaciones de puzzles."""
+    if listener not in _listeners:
+        _listeners.append(listener)
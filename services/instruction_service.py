@@ -3,54 +3,776 @@
 Generación de instrucciones de armado de puzzles.
 
 Requiere un puzzle y una pieza inicial para recorrer el grafo de vecinos
-y generar pasos secuenciales de ensamblaje.
+y generar pasos secuenciales de ensamblaje. Los pasos se producen de forma
+perezosa (`iter_instructions`), por lo que la interfaz puede pedir solo la
+ventana de pasos que va a mostrar.
+
+Si el puzzle tiene varias islas, el plan las cubre todas: primero la que
+contiene la pieza inicial y después cada una de las demás, armada aparte.
+Con muchas islas grandes, sus recorridos se calculan en varios procesos.
+
+El recorrido calculado se materializa como plan (orden compacto de aristas)
+en la colección `instruction_plans`, por revisión del puzzle: los lectores lo
+obtienen con una sola lectura y, cuando el puzzle cambia, los planes
+existentes se actualizan en segundo plano. Si la escritura tocó una sola
+pieza, el plan de la revisión anterior se repara de forma incremental (ver
+`utils.plan_patch`), leyendo solo los enlaces de las piezas afectadas; el
+recálculo completo queda como último recurso.
+
+Las lecturas independientes (revisión del puzzle, piezas, plan guardado) se
+piden a la vez con la variante asíncrona de los repositorios.
+
+Para armar en equipo, `generate_team_plan` divide el puzzle en regiones
+conexas y equilibradas (ver `utils.partition`), calcula el plan de cada
+región en paralelo y añade una etapa final para unir las regiones.
+
+El armado por sectores es jerárquico: `generate_sector_order` ordena los
+sectores a partir de dos agregaciones (piezas por sector y enlaces entre
+sectores) y `generate_sector_instructions` genera los pasos de un solo
+sector leyendo únicamente sus piezas, así que un puzzle enorme se puede
+armar sector a sector sin cargarlo entero.
 """
-from typing import List, Set
-from services.puzzle_service import list_pieces
-from models.piece import Piece
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Set, Tuple
+from bson import ObjectId
+from database import async_repositories as async_repo
+from database.async_client import run_concurrently
+from database.repositories import (
+    get_instruction_plan      as repo_get_plan,
+    get_instruction_plan_keys as repo_plan_keys,
+    get_links_touching        as repo_links_touching,
+    get_pieces_by_codes       as repo_pieces_by_codes,
+    iter_pieces_by_puzzle     as repo_iter_pieces,
+    save_instruction_plan     as repo_save_plan,
+    delete_instruction_plans  as repo_delete_plans,
+)
+from services.puzzle_service import (
+    get_piece, links_indexed, load_graph, load_sector_graph, rebuild_piece_links
+)
+from services.read_cache import cached
+from services.instruction_cache import (
+    PieceChange, add_invalidation_listener, current_revision, get_cached, get_cached_window,
+    remember_revision, store
+)
+from utils.graph import GRAPH_FIELDS, PuzzleGraph, connected_components
+from utils.logger import get_logger
+from utils.metrics import timed, timer
+from utils.parallel import traverse_roots, traverse_subgraphs
+from utils.partition import partition_regions, region_joins
+from utils.plan_patch import patch_plan
+from utils.traversal import iter_traverse
+
+logger = get_logger(__name__)
+
+# Paso de armado: (código de la pieza que se coloca, texto de la instrucción)
+Step = Tuple[str, str]
+# Arista del plan: (pieza que se coloca, conexión, pieza a la que se une).
+# La primera pieza de cada isla aparece como (pieza, None, None).
+PlanEdge = Tuple[str, Optional[int], Optional[str]]
 
-def generate_instructions(puzzle_id: str, start_code: str) -> List[str]:
+
+class RevisionPlan(NamedTuple):
+    """Plan de armado y revisión del puzzle a la que corresponde."""
+    revision: int
+    plan: List[PlanEdge]
+
+
+class RegionPlan(NamedTuple):
+    """Plan de una región de trabajo (un armador)."""
+    region: int
+    sector: str           # sector de la pieza semilla
+    pieces: int
+    plan: List[PlanEdge]
+
+
+class TeamPlan(NamedTuple):
     """
-    Genera instrucciones atómicas para armar el puzzle:
-    1) Explica cómo numerar las uniones de la pieza base.
-    2) Recorre el grafo de vecinos y emite 'Une la pieza X a la Conexión k de Y.'
+    Plan para armar en equipo: un plan por región y, al final, las uniones
+    entre regiones como (región base, región que se une, arista).
     """
+    regions: List[RegionPlan]
+    joins: List[Tuple[int, int, PlanEdge]]
 
-    pieces = list_pieces(puzzle_id)
-    code_map = {p.code: p for p in pieces}
+class SectorStage(NamedTuple):
+    """Etapa del armado por sectores: un sector completo."""
+    sector: str
+    pieces: int
+    joins_to: Optional[str]  # sector ya armado con más conexiones (None: se arma aparte)
+    links: int               # conexiones con los sectores ya armados
 
-    if start_code not in code_map:
-        raise ValueError(f"Pieza de inicio '{start_code}' no encontrada en el puzzle.")
+# Planes más largos no se persisten (el documento superaría el límite de 16 MB)
+MAX_PERSISTED_STEPS = 200_000
+
+# Si el cambio de una pieza afecta a más de esta fracción del plan, se
+# recalcula entero: leer los enlaces de tantas piezas ya no compensa
+INCREMENTAL_MAX_FRACTION = 0.5
+
+# Un único hilo: las reconstrucciones se serializan y no compiten con la UI
+_rebuilder = ThreadPoolExecutor(max_workers=1, thread_name_prefix="plan-rebuild")
+
+# ─── P L A N E S ──────────────────────────────────────────────────────────────
+
+def iter_plan(
+    puzzle_id: str,
+    start_code: str,
+    strategy: str = "dfs"
+) -> Iterator[PlanEdge]:
+    """
+    Calcula el plan de forma perezosa: recorre cada isla del grafo de vecinos,
+    empezando por la de `start_code`, y produce (pieza, conexión, pieza base)
+    por cada pieza nueva que se alcanza.
+    `strategy` selecciona el recorrido ("dfs", "bfs" o "sector").
+    """
+    return iter_graph_plan(load_graph(puzzle_id), start_code, strategy)
+
+def iter_graph_plan(
+    graph: PuzzleGraph,
+    start_code: str,
+    strategy: str = "dfs"
+) -> Iterator[PlanEdge]:
+    """
+    Como `iter_plan`, sobre un grafo ya cargado (p. ej. el de un snapshot,
+    sin base de datos).
+    """
+    roots = _island_roots(graph, start_code)
+    codes = graph.codes
+
+    def edges() -> Iterator[PlanEdge]:
+        for root in roots:
+            yield codes[root], None, None
+            for parent, child, k in iter_traverse(graph, root, strategy):
+                yield codes[child], k, codes[parent]
+
+    return edges()
+
+@timed("instructions")
+def generate_island_plans(
+    puzzle_id: str,
+    start_code: str,
+    strategy: str = "dfs"
+) -> List[List[PlanEdge]]:
+    """
+    Calcula un plan por isla (el primero es el de la isla de `start_code`).
+    Con muchas islas en un puzzle grande, los recorridos se reparten entre
+    varios procesos.
+    """
+    graph, roots = _load_graph(puzzle_id, start_code)
+    codes = graph.codes
+    trees = traverse_roots(graph, roots, strategy)
+    return [
+        [(codes[root], None, None)]
+        + [(codes[child], k, codes[parent]) for parent, child, k in tree]
+        for root, tree in zip(roots, trees)
+    ]
 
-    instructions: List[str] = []
-    visited: Set[str] = set()
+def _load_graph(puzzle_id: str, start_code: str) -> Tuple[PuzzleGraph, List[int]]:
+    """Carga el grafo del puzzle y elige una raíz por isla (ver `_island_roots`)."""
+    graph = load_graph(puzzle_id)
+    return graph, _island_roots(graph, start_code)
 
-    # Instrucción inicial sin numerar
-    instructions.append(
-        "Coloca la pieza **{0}** sobre la mesa con la etiqueta en la parte superior, orientada hacia el norte.".format(start_code)
+def _island_plans(
+    graph: PuzzleGraph, start_code: str, strategy: str
+) -> List[PlanEdge]:
+    """Plan completo (todas las islas) sobre un grafo ya cargado."""
+    roots = _island_roots(graph, start_code)
+    codes = graph.codes
+    trees = traverse_roots(graph, roots, strategy)
+    return [
+        edge
+        for root, tree in zip(roots, trees)
+        for edge in [(codes[root], None, None)]
+        + [(codes[child], k, codes[parent]) for parent, child, k in tree]
+    ]
+
+def _island_roots(graph: PuzzleGraph, start_code: str) -> List[int]:
+    """
+    Una raíz por isla: la pieza inicial para su isla y, para las demás
+    (de mayor a menor), su primera pieza.
+    """
+    start = graph.id_of(start_code)
+    if start is None:
+        raise ValueError(f"Pieza de inicio '{start_code}' no encontrada en el puzzle.")
+
+    labels, count = connected_components(graph)
+    first = [-1] * count
+    sizes = [0] * count
+    for i in range(len(graph)):
+        label = labels[i]
+        sizes[label] += 1
+        if first[label] < 0:
+            first[label] = i
+    others = sorted(
+        (label for label in range(count) if label != labels[start]),
+        key=lambda label: -sizes[label]
     )
-    instructions.append(
-        "Imagina que recorres el contorno de la pieza en el sentido de las agujas del reloj; numera cada punto de unión que encuentres: "
-        "la primera será **Conexión 1**, la siguiente **Conexión 2**, y así sucesivamente."
+    return [start] + [first[label] for label in others]
+
+@timed("instructions")
+def get_plan(
+    puzzle_id: str,
+    start_code: str,
+    strategy: str = "dfs"
+) -> RevisionPlan:
+    """
+    Devuelve el plan de la revisión vigente junto con esa revisión: lo lee
+    de `instruction_plans` si ya existe y, si no, lo calcula y lo persiste.
+    La revisión se pide siempre a la base de datos, a la vez que el último
+    plan guardado, así que se ven también las escrituras de otros procesos.
+    """
+    db_revision, stored = run_concurrently(
+        async_repo.get_puzzle_revision(puzzle_id),
+        async_repo.get_latest_instruction_plan(puzzle_id, start_code, strategy),
     )
+    revision = remember_revision(puzzle_id, db_revision)
+    if stored is not None and stored["revision"] != revision:
+        stored = None
+    if stored is not None:
+        return RevisionPlan(revision, [tuple(edge) for edge in stored["order"]])
+
+    islands = generate_island_plans(puzzle_id, start_code, strategy)
+    plan = [edge for island in islands for edge in island]
+    _persist_plan(puzzle_id, start_code, strategy, revision, plan)
+    return RevisionPlan(revision, plan)
+
+def _persist_plan(
+    puzzle_id: str, start_code: str, strategy: str, revision: int, plan: List[PlanEdge],
+    require_current: bool = True
+) -> None:
+    if len(plan) > MAX_PERSISTED_STEPS:
+        logger.info("Plan de %d pasos demasiado grande para persistir (%s)", len(plan), puzzle_id)
+        return
+    if require_current and revision != current_revision(puzzle_id):
+        return  # el puzzle cambió durante el cálculo
+    repo_save_plan({
+        "puzzleId": ObjectId(puzzle_id),
+        "startCode": start_code,
+        "strategy": strategy,
+        "revision": revision,
+        "createdAt": datetime.now(),
+        "steps": len(plan),
+        "order": [list(edge) for edge in plan],
+    })
+
+@timed("instructions")
+def _patch_plans(puzzle_id: str, revision: int, change: PieceChange) -> List[Tuple[str, str]]:
+    """
+    Repara los planes de la revisión anterior tras el cambio de una pieza y
+    los guarda para `revision`. Devuelve las claves (start_code, strategy)
+    que no se pudieron reparar y hay que recalcular.
+    """
+    pending = []
+    for start_code, strategy in repo_plan_keys(puzzle_id):
+        stored = repo_get_plan(puzzle_id, start_code, strategy, revision - 1)
+        plan = None
+        if stored is not None:
+            previous = [tuple(edge) for edge in stored["order"]]
+            plan = patch_plan(
+                previous, change.code, change.old_links,
+                lambda codes: repo_links_touching(puzzle_id, codes),
+                max_affected=int(len(previous) * INCREMENTAL_MAX_FRACTION),
+            )
+        if plan is None:
+            pending.append((start_code, strategy))
+            continue
+        # El plan reparado es el de `revision` aunque ya haya otra más nueva:
+        # la siguiente reparación parte de él
+        _persist_plan(puzzle_id, start_code, strategy, revision, plan, require_current=False)
+    return pending
+
+@timed("instructions")
+def _rebuild_plans(puzzle_id: str, revision: int, change: Optional[PieceChange] = None) -> None:
+    """
+    Actualiza los planes ya existentes de un puzzle para una nueva revisión:
+    de forma incremental si se conoce el cambio y, si no, recalculándolos.
+    """
+    if not links_indexed(puzzle_id):
+        # Puzzle anterior al índice de enlaces: se completa (eso publica otra
+        # revisión, que recalcula los planes) y el cambio no se puede reparar
+        rebuild_piece_links(puzzle_id)
+        change = None
+    keys = None
+    if change is not None:
+        keys = _patch_plans(puzzle_id, revision, change)
+        if not keys:
+            repo_delete_plans(puzzle_id, below_revision=revision)
+            return
+    if revision != current_revision(puzzle_id):
+        return  # llegó otra escritura; la reconstrucción de esa revisión se encargará
+    # Claves de los planes y piezas a la vez; el grafo se construye una sola vez
+    if keys is None:
+        keys, pieces = run_concurrently(
+            async_repo.get_instruction_plan_keys(puzzle_id),
+            async_repo.get_pieces_by_puzzle(puzzle_id, GRAPH_FIELDS),
+        )
+    else:
+        pieces = repo_iter_pieces(puzzle_id, GRAPH_FIELDS)
+    if keys:
+        graph = PuzzleGraph.from_documents(pieces)
+    for start_code, strategy in keys:
+        try:
+            plan = _island_plans(graph, start_code, strategy)
+        except ValueError:
+            continue  # la pieza inicial ya no existe
+        _persist_plan(puzzle_id, start_code, strategy, revision, plan)
+    repo_delete_plans(puzzle_id, below_revision=revision)
+
+def _on_puzzle_invalidated(
+    puzzle_id: str, revision: Optional[int], change: Optional[PieceChange]
+) -> None:
+    if revision is None:
+        return
+    try:
+        _rebuilder.submit(_safe_rebuild, puzzle_id, revision, change)
+    except RuntimeError:
+        # El proceso está saliendo (p. ej. al escribir la cola de guardado
+        # diferido): los planes de la revisión nueva se calcularán al pedirlos
+        logger.debug("Reconstrucción de planes omitida al salir (%s)", puzzle_id)
+
+def _safe_rebuild(puzzle_id: str, revision: int, change: Optional[PieceChange]) -> None:
+    try:
+        _rebuild_plans(puzzle_id, revision, change)
+    except Exception:
+        logger.exception("Error reconstruyendo los planes del puzzle %s", puzzle_id)
+
+def _schedule_links_backfill(puzzle_id: str) -> None:
+    """Completa en segundo plano el índice de enlaces de un puzzle anterior a él."""
+    try:
+        _rebuilder.submit(_safe_backfill, puzzle_id)
+    except RuntimeError:
+        logger.debug("Regeneración de enlaces omitida al salir (%s)", puzzle_id)
+
+def _safe_backfill(puzzle_id: str) -> None:
+    try:
+        if not links_indexed(puzzle_id):
+            rebuild_piece_links(puzzle_id)
+    except Exception:
+        logger.exception("Error regenerando los enlaces del puzzle %s", puzzle_id)
+
+add_invalidation_listener(_on_puzzle_invalidated)
+
+# ─── P L A N E S   E N   E Q U I P O ──────────────────────────────────────────
+
+@timed("instructions")
+def generate_team_plan(
+    puzzle_id: str,
+    workers: int,
+    start_code: Optional[str] = None,
+    strategy: str = "dfs"
+) -> TeamPlan:
+    """
+    Divide el puzzle en hasta `workers` regiones conexas y equilibradas, con
+    semillas repartidas por sector, y calcula el plan de cada región (en
+    varios procesos si el puzzle es grande). Si se indica `start_code`, la
+    región 1 empieza por esa pieza. Se cachea por revisión del puzzle.
+    """
+    key = ("team_plan", puzzle_id, current_revision(puzzle_id), workers, start_code, strategy)
+    return cached(key, lambda: _team_plan(load_graph(puzzle_id), workers, start_code, strategy))
+
+def _team_plan(
+    graph: PuzzleGraph, workers: int, start_code: Optional[str], strategy: str
+) -> TeamPlan:
+    start = None
+    if start_code is not None:
+        start = graph.id_of(start_code)
+        if start is None:
+            raise ValueError(f"Pieza de inicio '{start_code}' no encontrada en el puzzle.")
 
-    def dfs(current_code: str):
-        visited.add(current_code)
-        current_piece: Piece = code_map[current_code]
+    partition = partition_regions(graph, workers, start)
+    members: List[List[int]] = [[] for _ in range(partition.count)]
+    for i in range(len(graph)):
+        members[partition.labels[i]].append(i)
 
-        for nb in current_piece.neighbors:
-            k = nb.edgeId
-            neighbor = nb.neighborCode
-            if not neighbor or neighbor in visited:
-                continue
+    # Cada región se recorre sobre su subgrafo, con ids locales
+    subgraphs = [graph.subgraph(m) for m in members]
+    roots = [
+        _island_roots(sub, graph.codes[seed])
+        for sub, seed in zip(subgraphs, partition.seeds)
+    ]
+    trees = traverse_subgraphs(list(zip(subgraphs, roots)), strategy)
 
-            instructions.append(
-                "Une la pieza **{0}** a la Conexión **{1}** de **{2}**. "
-                "Para ello, coloca {0} junto a {2}, orientando su propia Conexión {1} de modo que encaje perfectamente.".format(
-                    neighbor, k, current_code
+    regions = []
+    for r, (sub, sub_roots, sub_trees) in enumerate(zip(subgraphs, roots, trees)):
+        codes = sub.codes
+        plan = [
+            edge
+            for root, tree in zip(sub_roots, sub_trees)
+            for edge in [(codes[root], None, None)]
+            + [(codes[child], k, codes[parent]) for parent, child, k in tree]
+        ]
+        regions.append(RegionPlan(r, graph.sector_of(partition.seeds[r]), len(sub), plan))
+
+    codes = graph.codes
+    joins = [
+        (base, joined, (codes[v], k, codes[u]))
+        for base, joined, u, v, k in region_joins(graph, partition)
+    ]
+    return TeamPlan(regions, joins)
+
+@timed("instructions")
+def generate_team_instructions(
+    puzzle_id: str,
+    workers: int,
+    start_code: Optional[str] = None,
+    strategy: str = "dfs"
+) -> Tuple[List[List[str]], List[str]]:
+    """
+    Instrucciones para armar en equipo: una lista de pasos por región (cada
+    una se arma por separado) y los pasos de la etapa final de unión.
+    """
+    team = generate_team_plan(puzzle_id, workers, start_code, strategy)
+    with timer("instructions", "render_team_steps"):
+        regions = [[text for _, text in render_steps(region.plan)] for region in team.regions]
+        joins = [
+            "Une la región **{0}** a la región **{1}**: {2}".format(
+                joined + 1, base + 1, _edge_text(*edge)
+            )
+            for base, joined, edge in team.joins
+        ]
+    return regions, joins
+
+# ─── P L A N   P O R   S E C T O R E S ────────────────────────────────────────
+
+@timed("instructions")
+def generate_sector_order(puzzle_id: str, start_code: Optional[str] = None) -> List[SectorStage]:
+    """
+    Orden de armado de los sectores. Empieza por el sector de `start_code`
+    (o por el más grande) y en cada etapa elige el sector con más conexiones
+    hacia los ya armados; si no queda ninguno conectado, el más grande de los
+    restantes. Solo lee dos agregaciones, nunca las piezas (salvo en un
+    puzzle anterior al índice de enlaces, hasta que se complete). Se cachea
+    por revisión del puzzle.
+    """
+    def load() -> List[SectorStage]:
+        if links_indexed(puzzle_id):
+            counts, sector_links = run_concurrently(
+                async_repo.count_pieces_by_sector(puzzle_id),
+                async_repo.get_sector_links(puzzle_id),
+            )
+        else:
+            _schedule_links_backfill(puzzle_id)
+            sector_of, links = _declared_links(puzzle_id)
+            counts, sector_links = _sector_totals(sector_of, links)
+        start_sector = None
+        if start_code is not None:
+            piece = get_piece(puzzle_id, start_code)
+            if piece is None:
+                raise ValueError(f"Pieza de inicio '{start_code}' no encontrada en el puzzle.")
+            start_sector = piece.sector
+        return _sector_order(counts, sector_links, start_sector)
+
+    key = ("sector_order", puzzle_id, current_revision(puzzle_id), start_code)
+    return cached(key, load)
+
+def _sector_order(
+    counts: Dict[str, int], sector_links: List[dict], start_sector: Optional[str]
+) -> List[SectorStage]:
+    # Conexiones entre cada par de sectores, en ambos sentidos
+    between: Dict[str, Dict[str, int]] = {}
+    for link in sector_links:
+        a, b, n = link["fromSector"], link["toSector"], link["count"]
+        for x, y in ((a, b), (b, a)):
+            row = between.setdefault(x, {})
+            row[y] = row.get(y, 0) + n
+
+    remaining = set(counts)
+    placed: List[str] = []
+    stages: List[SectorStage] = []
+    while remaining:
+        if not placed and start_sector in remaining:
+            best = start_sector
+        else:
+            best = min(remaining, key=lambda s: (
+                -sum(between.get(s, {}).get(p, 0) for p in placed), -counts[s], s
+            ))
+        neighbors = {p: between.get(best, {}).get(p, 0) for p in placed}
+        links = sum(neighbors.values())
+        joins_to = max(placed, key=lambda p: (neighbors[p], -placed.index(p))) if links else None
+        stages.append(SectorStage(best, counts[best], joins_to, links))
+        placed.append(best)
+        remaining.discard(best)
+    return stages
+
+def _declared_links(puzzle_id: str) -> Tuple[Dict[str, str], List[dict]]:
+    """
+    Sector de cada pieza y enlaces que declaran, leídos de las propias piezas:
+    sustituyen al índice de enlaces mientras no esté completo.
+    """
+    sector_of: Dict[str, str] = {}
+    links: List[dict] = []
+    for doc in repo_iter_pieces(puzzle_id, {"_id": 0, "code": 1, "sector": 1, "neighbors": 1}):
+        code = doc["code"]
+        sector_of[code] = doc.get("sector", "")
+        # Uno por conexión: si se repite, prevalece la última (como en el índice)
+        declared = {nb["edgeId"]: nb["neighborCode"] for nb in doc.get("neighbors") or () if nb.get("neighborCode")}
+        links.extend({"fromCode": code, "edgeId": k, "toCode": t} for k, t in declared.items())
+    return sector_of, links
+
+def _sector_totals(
+    sector_of: Dict[str, str], links: List[dict]
+) -> Tuple[Dict[str, int], List[dict]]:
+    """Piezas por sector y enlaces entre sectores, como las dos agregaciones."""
+    counts: Dict[str, int] = {}
+    for sector in sector_of.values():
+        counts[sector] = counts.get(sector, 0) + 1
+    between: Dict[Tuple[str, str], int] = {}
+    for link in links:
+        key = (sector_of.get(link["fromCode"]), sector_of.get(link["toCode"]))
+        if None not in key and key[0] != key[1]:
+            between[key] = between.get(key, 0) + 1
+    sector_links = [{"fromSector": f, "toSector": t, "count": n} for (f, t), n in sorted(between.items())]
+    return counts, sector_links
+
+@timed("instructions")
+def generate_sector_plan(
+    puzzle_id: str,
+    sector: str,
+    start_code: Optional[str] = None,
+    strategy: str = "dfs"
+) -> List[PlanEdge]:
+    """
+    Plan de un solo sector, leyendo solo sus piezas. Cada isla del sector
+    empieza uniéndose a un sector ya armado (según `generate_sector_order`)
+    si tiene alguna conexión con ellos: su primera arista es esa unión. Las
+    islas sin esa conexión se arman aparte; en la primera etapa, la de
+    `start_code` empieza por esa pieza.
+    """
+    def load() -> List[PlanEdge]:
+        stages = generate_sector_order(puzzle_id, start_code)
+        position = next((i for i, s in enumerate(stages) if s.sector == sector), None)
+        if position is None:
+            raise ValueError(f"El sector '{sector}' no tiene piezas en el puzzle.")
+        graph = load_sector_graph(puzzle_id, sector)
+        stage = stages[position]
+        placed = [s.sector for s in stages[:position]]
+        joins = _sector_joins(puzzle_id, graph, placed, stage.joins_to) if placed else {}
+        return _sector_plan(graph, joins, start_code if position == 0 else None, strategy)
+
+    key = ("sector_plan", puzzle_id, current_revision(puzzle_id), sector, start_code, strategy)
+    return cached(key, load)
+
+def _sector_joins(
+    puzzle_id: str, graph: PuzzleGraph, placed: List[str], preferred: Optional[str]
+) -> Dict[int, PlanEdge]:
+    """
+    Por cada pieza del sector con alguna conexión hacia un sector ya armado,
+    la arista (pieza, conexión, pieza de fuera) con la que se une, prefiriendo
+    el sector `preferred`. Lee los enlaces del sector y solo el sector de las
+    piezas de fuera que aparecen en ellos.
+    """
+    if links_indexed(puzzle_id):
+        links = repo_links_touching(puzzle_id, graph.codes)
+        outside = sorted({
+            code for link in links for code in (link["fromCode"], link["toCode"])
+            if graph.id_of(code) is None
+        })
+        if not outside:
+            return {}
+        docs = repo_pieces_by_codes(puzzle_id, outside, {"_id": 0, "code": 1, "sector": 1})
+        sector_of = {d["code"]: d.get("sector", "") for d in docs}
+    else:
+        _schedule_links_backfill(puzzle_id)
+        sector_of, links = _declared_links(puzzle_id)
+    rank = {s: i for i, s in enumerate(placed)}
+
+    # (pieza del sector, pieza de fuera) -> edgeId con el convenio de PuzzleGraph
+    # (positivo si lo declara la pieza de fuera, -k si solo lo declara la del sector)
+    edges: Dict[Tuple[int, str], int] = {}
+    for link in links:
+        f, t, k = link["fromCode"], link["toCode"], link["edgeId"]
+        if graph.id_of(f) is not None and sector_of.get(t) in rank:
+            edges.setdefault((graph.id_of(f), t), -k)
+        elif graph.id_of(t) is not None and sector_of.get(f) in rank:
+            edges[(graph.id_of(t), f)] = k
+
+    joins: Dict[int, PlanEdge] = {}
+    best: Dict[int, Tuple[bool, int, str]] = {}
+    for (i, parent), k in edges.items():
+        score = (sector_of[parent] != preferred, rank[sector_of[parent]], parent)
+        if i not in best or score < best[i]:
+            best[i] = score
+            joins[i] = (graph.codes[i], k, parent)
+    return joins
+
+def _sector_plan(
+    graph: PuzzleGraph, joins: Dict[int, PlanEdge], start_code: Optional[str], strategy: str
+) -> List[PlanEdge]:
+    """Plan del sector: primero las islas que se unen a lo ya armado y luego el resto."""
+    labels, count = connected_components(graph)
+    roots: List[Optional[int]] = [None] * count
+    for i in sorted(joins, key=lambda i: graph.codes[i]):
+        if roots[labels[i]] is None:
+            roots[labels[i]] = i
+    joined: Set[int] = {labels[r] for r in roots if r is not None}
+    start = graph.id_of(start_code) if start_code is not None else None
+    if start is not None and labels[start] not in joined:
+        roots[labels[start]] = start
+    for i in range(len(graph)):
+        if roots[labels[i]] is None:
+            roots[labels[i]] = i
+
+    sizes = [0] * count
+    for i in range(len(graph)):
+        sizes[labels[i]] += 1
+    order = sorted(range(count), key=lambda c: (
+        c not in joined, roots[c] != start, -sizes[c], graph.codes[roots[c]]
+    ))
+    ordered_roots = [roots[c] for c in order]
+    codes = graph.codes
+    trees = traverse_roots(graph, ordered_roots, strategy)
+    return [
+        edge
+        for root, tree in zip(ordered_roots, trees)
+        for edge in [joins.get(root, (codes[root], None, None))]
+        + [(codes[child], k, codes[parent]) for parent, child, k in tree]
+    ]
+
+@timed("instructions")
+def generate_sector_instructions(
+    puzzle_id: str,
+    sector: str,
+    start_code: Optional[str] = None,
+    strategy: str = "dfs"
+) -> List[str]:
+    """
+    Pasos para armar un sector sobre los ya armados. Las uniones con otros
+    sectores son pasos normales ('Une la pieza X a la Conexión k de Y', con Y
+    de un sector anterior).
+    """
+    plan = generate_sector_plan(puzzle_id, sector, start_code, strategy)
+    with timer("instructions", "render_sector_steps"):
+        return [text for _, text in render_steps(plan)]
+
+# ─── I N S T R U C C I O N E S ────────────────────────────────────────────────
+
+def render_steps(plan: Iterable[PlanEdge]) -> Iterator[Step]:
+    """
+    Convierte un plan en pasos de armado, junto con la pieza que coloca cada paso:
+    1) Explica cómo numerar las uniones de la pieza base.
+    2) Emite 'Une la pieza X a la Conexión k de Y.' por cada arista del plan.
+    3) Al empezar cada isla adicional, indica que se arma por separado.
+    """
+    island = 0
+    for child, k, parent in plan:
+        if parent is not None:
+            yield child, _edge_text(child, k, parent)
+            continue
+
+        island += 1
+        if island == 1:
+            # Instrucción inicial sin numerar
+            yield child, (
+                "Coloca la pieza **{0}** sobre la mesa con la etiqueta en la parte superior, orientada hacia el norte.".format(child)
+            )
+            yield child, (
+                "Imagina que recorres el contorno de la pieza en el sentido de las agujas del reloj; numera cada punto de unión que encuentres: "
+                "la primera será **Conexión 1**, la siguiente **Conexión 2**, y así sucesivamente."
+            )
+        else:
+            yield child, (
+                "Arma ahora por separado la isla **{0}**, que no se une con lo armado hasta aquí: "
+                "coloca la pieza **{1}** sobre la mesa con la etiqueta en la parte superior, orientada hacia el norte.".format(
+                    island, child
                 )
             )
-            dfs(neighbor)
 
-    dfs(start_code)
+def _edge_text(child: str, k: int, parent: str) -> str:
+    """Texto del paso que une `child` a `parent` por la conexión `k`."""
+    if k < 0:
+        # Enlace declarado solo por la pieza que se coloca: su Conexión -k
+        return (
+            "Une la pieza **{0}** a **{2}** usando la Conexión **{1}** de {0}. "
+            "Para ello, coloca {0} junto a {2}, de modo que su Conexión {1} encaje perfectamente con {2}.".format(
+                child, -k, parent
+            )
+        )
+    return (
+        "Une la pieza **{0}** a la Conexión **{1}** de **{2}**. "
+        "Para ello, coloca {0} junto a {2}, orientando su propia Conexión {1} de modo que encaje perfectamente.".format(
+            child, k, parent
+        )
+    )
+
+def iter_steps(
+    puzzle_id: str,
+    start_code: str,
+    strategy: str = "dfs"
+) -> Iterator[Step]:
+    """Produce los pasos de armado uno a uno, calculando el recorrido bajo demanda."""
+    return render_steps(iter_plan(puzzle_id, start_code, strategy))
+
+def iter_instructions(
+    puzzle_id: str,
+    start_code: str,
+    strategy: str = "dfs"
+) -> Iterator[str]:
+    """Produce el texto de cada instrucción de forma perezosa."""
+    return (text for _, text in iter_steps(puzzle_id, start_code, strategy))
+
+@timed("instructions")
+def generate_instructions(
+    puzzle_id: str,
+    start_code: str,
+    strategy: str = "dfs"
+) -> List[str]:
+    """
+    Genera la lista completa de instrucciones atómicas para armar el puzzle.
+    Se sirve, por orden, de la caché en memoria, del plan persistido o de
+    un recorrido nuevo; el resultado se cachea por revisión del puzzle.
+    """
+    revision = current_revision(puzzle_id)
+    cached = get_cached(puzzle_id, start_code, strategy, revision)
+    if cached is not None:
+        return cached
+
+    # Se guarda con la revisión del plan, no con la leída arriba: si entre
+    # medias hubo una escritura, el plan ya es de la revisión nueva
+    revision, plan = get_plan(puzzle_id, start_code, strategy)
+    with timer("instructions", "render_steps"):
+        instructions = [text for _, text in render_steps(plan)]
+    store(puzzle_id, start_code, strategy, revision, instructions)
     return instructions
+
+@timed("instructions")
+def get_instruction_window(
+    puzzle_id: str,
+    start_code: str,
+    offset: int,
+    limit: int,
+    strategy: str = "dfs"
+) -> List[str]:
+    """
+    Devuelve las instrucciones [offset, offset+limit). Usa la caché en memoria
+    o el plan persistido si existen; si no, el recorrido se detiene en cuanto
+    se completa la ventana.
+    """
+    revision = current_revision(puzzle_id)
+    cached = get_cached_window(puzzle_id, start_code, strategy, revision, offset, limit)
+    if cached is not None:
+        return cached
+
+    stored = repo_get_plan(puzzle_id, start_code, strategy, revision)
+    if stored is not None:
+        plan = [tuple(edge) for edge in stored["order"]]
+        instructions = [text for _, text in render_steps(plan)]
+        store(puzzle_id, start_code, strategy, revision, instructions)
+        return instructions[offset:offset + limit]
+
+    return list(islice(iter_instructions(puzzle_id, start_code, strategy), offset, offset + limit))
+
+@timed("instructions")
+def find_piece_step(
+    puzzle_id: str,
+    start_code: str,
+    code: str,
+    strategy: str = "dfs"
+) -> Optional[int]:
+    """
+    Índice (desde 0) del paso en que se coloca la pieza `code`,
+    o None si la pieza no se alcanza desde la pieza de inicio.
+    """
+    for i, (placed, _) in enumerate(iter_steps(puzzle_id, start_code, strategy)):
+        if placed == code:
+            return i
+    return None
@@ -4,8 +4,22 @@ Servicios relacionados con los puzzles y piezas.
 
 Funciones de alto nivel que gestionan los datos del puzzle,
 abstrayendo la lógica de acceso a la base de datos.
+Las lecturas independientes que necesita una misma vista se piden a la vez
+con la variante asíncrona de los repositorios (`get_puzzle_overview`).
+
+Las lecturas pasan por la caché de `services.read_cache` (con caducidad) y
+cada escritura invalida explícitamente lo que cambia.
+
+Cada escritura de piezas reserva primero una revisión nueva del puzzle
+(`next_revision`), la guarda en las piezas que escribe (`updatedRev`) y al
+terminar la libera (`touch_puzzle`). La revisión del puzzle que ven los
+lectores es la publicada: no avanza mientras quede una escritura en curso,
+así que todo lo escrito hasta ella ya está guardado. `list_piece_changes`
+devuelve lo escrito desde una revisión publicada, para que los listados ya
+cargados se actualicen con los cambios en lugar de volver a descargarse.
 """
-from typing import List, Optional, Dict, Any
+from typing import List, NamedTuple, Optional, Dict, Any, Tuple
+from uuid import uuid4
 from bson import ObjectId
 from datetime import datetime
 
@@ -13,18 +27,54 @@ from database.repositories import (
     create_puzzle       as repo_create_puzzle,
     get_puzzle_by_id    as repo_get_puzzle,
     get_all_puzzles     as repo_list_puzzles,
+    get_puzzles_page    as repo_puzzles_page,
     update_puzzle       as repo_update_puzzle,
     delete_puzzle       as repo_delete_puzzle,
-    create_piece        as repo_create_piece,
+    reserve_puzzle_revision as repo_reserve_revision,
+    publish_puzzle_revision as repo_publish_revision,
+    get_puzzle_revision as repo_get_revision,
+    delete_instruction_plans as repo_delete_plans,
     get_piece_by_code   as repo_get_piece_by_code,
+    get_piece_by_id     as repo_get_piece_by_id,
     get_pieces_by_puzzle as repo_list_pieces,
+    iter_pieces_by_puzzle as repo_iter_pieces,
+    get_pieces_page     as repo_pieces_page,
+    get_pieces_by_sector as repo_pieces_by_sector,
+    count_pieces_by_sector as repo_count_by_sector,
+    get_pieces_changed_since as repo_changed_since,
     update_piece        as repo_update_piece,
+    replace_piece_links as repo_replace_links,
+    delete_piece_links  as repo_delete_links,
+    MAX_PAGE_SIZE,
 )
-from models.puzzle import Puzzle
-from models.piece import Piece
+from database import async_repositories as async_repo
+from database.async_client import run_concurrently
+from models.puzzle import Puzzle, PuzzleSummary
+from models.piece import Piece, PieceRecord, PieceSummary
+from services.instruction_cache import PieceChange, invalidate_puzzle
+from services.read_cache import cached, invalidate_puzzle_list, invalidate_puzzle_reads
+from utils.graph import GRAPH_FIELDS, PuzzleGraph
+from utils.metrics import timed
+
+# Tamaño de página por defecto de los listados
+DEFAULT_PAGE_SIZE = 50
+
+_PUZZLE_SUMMARY_FIELDS = {"name": 1, "totalPieces": 1}
+_PIECE_SUMMARY_FIELDS  = {"code": 1, "sector": 1}
+
+class PieceDelta(NamedTuple):
+    """Piezas escritas desde una revisión y revisión publicada hasta la que llegan."""
+    revision: int
+    pieces: List[PieceSummary]
+
+class RevisionLease(NamedTuple):
+    """Revisión reservada por una escritura de piezas y quién la reservó."""
+    revision: int
+    writer: str
 
 # ─── P U Z Z L E S ────────────────────────────────────────────────────────────
 
+@timed("service")
 def add_puzzle(
     name: str, totalPieces: int, sectors: List[str]
 ) -> Puzzle:
@@ -33,32 +83,116 @@ def add_puzzle(
         "name": name,
         "totalPieces": totalPieces,
         "sectors": sectors,
-        "createdAt": datetime.now()  # Usamos la fecha actual
+        "createdAt": datetime.now(),  # Usamos la fecha actual
+        "linksIndexed": True          # sin piezas, el índice de enlaces ya está completo
     }
     created = repo_create_puzzle(doc)
+    invalidate_puzzle_list()
     return Puzzle(**created)
 
+@timed("service")
 def get_puzzle(puzzle_id: str) -> Optional[Puzzle]:
     """Recupera un puzzle por su ID."""
-    raw = repo_get_puzzle(puzzle_id)
-    return Puzzle(**raw) if raw else None
+    def load() -> Optional[Puzzle]:
+        raw = repo_get_puzzle(puzzle_id)
+        return Puzzle(**raw) if raw else None
+    return cached(("puzzle", puzzle_id), load)
 
+@timed("service")
 def list_puzzles() -> List[Puzzle]:
     """Lista todos los puzzles."""
-    raws = repo_list_puzzles()
-    return [Puzzle(**_prepare_document(r)) for r in raws]
+    def load() -> List[Puzzle]:
+        raws = repo_list_puzzles()
+        return [Puzzle(**_prepare_document(r)) for r in raws]
+    return cached(("puzzles",), load)
+
+@timed("service")
+def list_puzzle_summaries(
+    after_id: Optional[str] = None,
+    limit: int = DEFAULT_PAGE_SIZE
+) -> Tuple[List[PuzzleSummary], Optional[str]]:
+    """
+    Lista una página de puzzles (solo id, nombre y total de piezas), del más
+    reciente al más antiguo. Devuelve (página, cursor); el cursor es None
+    cuando no hay más páginas.
+    """
+    def load() -> Tuple[List[PuzzleSummary], Optional[str]]:
+        raws = repo_puzzles_page(after_id, limit, _PUZZLE_SUMMARY_FIELDS, descending=True)
+        items = [PuzzleSummary(**r) for r in raws]
+        return items, _next_cursor(items, limit, lambda p: p.id)
+    return cached(("puzzle_page", after_id, limit), load)
+
+@timed("service")
+def get_puzzle_overview(
+    puzzle_id: str,
+    limit: int = DEFAULT_PAGE_SIZE
+) -> Tuple[Optional[Puzzle], List[PieceSummary], Optional[str]]:
+    """
+    Recupera a la vez el puzzle y la primera página de resúmenes de sus
+    piezas: (puzzle, página, cursor). Las dos consultas van en paralelo,
+    así que la espera es la de la más lenta.
+    """
+    def load() -> Tuple[Optional[Puzzle], List[PieceSummary], Optional[str]]:
+        raw, pieces = run_concurrently(
+            async_repo.get_puzzle_by_id(puzzle_id),
+            async_repo.get_pieces_page(puzzle_id, None, limit, _PIECE_SUMMARY_FIELDS),
+        )
+        if not raw:
+            return None, [], None
+        items = [PieceSummary(**r) for r in pieces]
+        return Puzzle(**raw), items, _next_cursor(items, limit, lambda p: p.code)
+    return cached(("overview", puzzle_id, limit), load)
 
+@timed("service")
 def update_puzzle_info(puzzle_id: str, update_data: dict) -> Optional[Puzzle]:
     """Actualiza campos de un puzzle."""
     updated = repo_update_puzzle(puzzle_id, update_data)
+    invalidate_puzzle_list()
+    invalidate_puzzle_reads(puzzle_id)
     return Puzzle(**_prepare_document(updated)) if updated else None
 
+@timed("service")
 def remove_puzzle(puzzle_id: str) -> bool:
     """Elimina un puzzle."""
-    return repo_delete_puzzle(puzzle_id)
+    deleted = repo_delete_puzzle(puzzle_id)
+    repo_delete_plans(puzzle_id)
+    repo_delete_links(puzzle_id)
+    invalidate_puzzle(puzzle_id)
+    invalidate_puzzle_list()
+    invalidate_puzzle_reads(puzzle_id)
+    return deleted
+
+@timed("service")
+def next_revision(puzzle_id: str) -> RevisionLease:
+    """
+    Reserva la revisión de una escritura de piezas (atómicamente en la base
+    de datos), para guardarla en `updatedRev` de las piezas escritas. Al
+    terminar, haya ido bien o no, hay que liberarla con `touch_puzzle`.
+    """
+    writer = uuid4().hex
+    return RevisionLease(repo_reserve_revision(puzzle_id, writer), writer)
+
+@timed("service")
+def touch_puzzle(
+    puzzle_id: str, change: Optional[PieceChange] = None, lease: Optional[RevisionLease] = None
+) -> int:
+    """
+    Libera la revisión reservada con `next_revision` (sin `lease`, reserva
+    y libera una ahora) e invalida lo que dependa de la revisión anterior.
+    Si solo cambió una pieza, `change` permite actualizar los planes de
+    forma incremental; solo se usa si la revisión publicada es justo la de
+    este cambio. Devuelve la revisión publicada.
+    """
+    if lease is None:
+        lease = next_revision(puzzle_id)
+    revision = repo_publish_revision(puzzle_id, lease.writer)
+    invalidate_puzzle_reads(puzzle_id)
+    invalidate_puzzle(puzzle_id, revision, change if revision == lease.revision else None)
+    return revision
 
 # ─── P I E C E S ───────────────────────────────────────────────────────────────
 
+@timed("service")
 def add_or_update_piece(
     puzzle_id: str,
     code: str,
@@ -68,55 +202,212 @@ def add_or_update_piece(
 ) -> Piece:
     """
     Si la pieza (puzzleId+code) existe, la actualiza con los nuevos fields.
-    Si no existe, la crea.
+    Si no existe, la crea. Es un único upsert atómico, por lo que dos
+    mapeadores guardando el mismo código no generan piezas duplicadas.
+    También actualiza el índice de enlaces en ambos sentidos; los enlaces
+    anteriores (leídos a la vez que se reserva la revisión) permiten
+    actualizar los planes guardados de forma incremental. La pieza se valida
+    antes de escribir nada (p. ej. una conexión con dos vecinos).
     """
-    # 1) Preparamos el documento _parcial_ de actualización/creación
-    doc = {
-        "puzzleId": ObjectId(puzzle_id),
-        "code": code,
-        "sector": sector,
-        "edges": edges,
-        "neighbors": neighbors
-    }
-
-    # 2) ¿Ya existe esa pieza?
-    existing = repo_get_piece_by_code(puzzle_id, code)
-    if existing:
-        # update_piece espera id como str y un dict con los campos a settear
-        updated = repo_update_piece(str(existing["_id"]), {
-            "sector": sector,
-            "edges": edges,
-            "neighbors": neighbors
-        })
-        return Piece(**updated)
-
-    # 3) No existe → la creamos
-    created = repo_create_piece(doc)
-    return Piece(**created)
+    Piece(puzzleId=puzzle_id, code=code, sector=sector, edges=edges, neighbors=neighbors)
+    writer = uuid4().hex
+    revision, old_links = run_concurrently(
+        async_repo.reserve_puzzle_revision(puzzle_id, writer),
+        async_repo.get_links_from(puzzle_id, code),
+    )
+    change = None
+    try:
+        saved, _ = run_concurrently(
+            async_repo.upsert_piece(puzzle_id, code, {
+                "sector": sector,
+                "edges": edges,
+                "neighbors": neighbors,
+                "updatedRev": revision,
+            }),
+            async_repo.replace_piece_links(puzzle_id, {code: neighbors}, {code: sector}),
+        )
+        change = PieceChange(code, [(l["edgeId"], l["toCode"]) for l in old_links])
+    finally:
+        touch_puzzle(puzzle_id, change, RevisionLease(revision, writer))
+    return Piece(**saved)
 
+@timed("service")
 def get_piece(
     puzzle_id: str,
     code: str
 ) -> Optional[Piece]:
     """Recupera una pieza por su código dentro de un puzzle."""
-    raw = repo_get_piece_by_code(puzzle_id, code)
-    return Piece(**_prepare_document(raw)) if raw else None
+    def load() -> Optional[Piece]:
+        raw = repo_get_piece_by_code(puzzle_id, code)
+        return Piece(**_prepare_document(raw)) if raw else None
+    return cached(("piece", puzzle_id, code), load)
+
+@timed("service")
+def list_pieces(puzzle_id: str) -> List[PieceRecord]:
+    """
+    Lista todas las piezas de un puzzle por el camino rápido: registros de
+    solo lectura sin validación Pydantic ni copias del documento (las piezas
+    se validaron al guardarse). Para editar una, `PieceRecord.to_model()`.
+    """
+    return cached(
+        ("pieces", puzzle_id),
+        lambda: [PieceRecord(r) for r in repo_iter_pieces(puzzle_id)]
+    )
+
+@timed("service")
+def load_graph(puzzle_id: str) -> PuzzleGraph:
+    """
+    Construye el grafo de vecinos de un puzzle leyendo solo los campos que
+    necesita, directamente del cursor (sin modelos ni lista intermedia).
+    """
+    return PuzzleGraph.from_documents(repo_iter_pieces(puzzle_id, GRAPH_FIELDS))
+
+@timed("service")
+def list_piece_summaries(
+    puzzle_id: str,
+    after_code: Optional[str] = None,
+    limit: int = DEFAULT_PAGE_SIZE
+) -> Tuple[List[PieceSummary], Optional[str]]:
+    """
+    Lista una página de piezas (solo id, código y sector) ordenadas por código.
+    Devuelve (página, cursor); el cursor es None cuando no hay más páginas.
+    """
+    def load() -> Tuple[List[PieceSummary], Optional[str]]:
+        raws = repo_pieces_page(puzzle_id, after_code, limit, _PIECE_SUMMARY_FIELDS)
+        items = [PieceSummary(**r) for r in raws]
+        return items, _next_cursor(items, limit, lambda p: p.code)
+    return cached(("piece_page", puzzle_id, after_code, limit), load)
+
+@timed("service")
+def list_sector_piece_summaries(puzzle_id: str, sector: str) -> List[PieceSummary]:
+    """
+    Lista las piezas de un solo sector (id, código y sector), ordenadas por
+    código. La consulta usa el índice (puzzleId, sector): no se lee el resto
+    del puzzle.
+    """
+    def load() -> List[PieceSummary]:
+        raws = repo_pieces_by_sector(puzzle_id, sector, _PIECE_SUMMARY_FIELDS)
+        return sorted((PieceSummary(**r) for r in raws), key=lambda p: p.code)
+    return cached(("sector_pieces", puzzle_id, sector), load)
+
+@timed("service")
+def count_sector_pieces(puzzle_id: str) -> Dict[str, int]:
+    """Número de piezas mapeadas de cada sector, contado en la base de datos."""
+    return cached(("sector_counts", puzzle_id), lambda: repo_count_by_sector(puzzle_id))
+
+@timed("service")
+def load_sector_graph(puzzle_id: str, sector: str) -> PuzzleGraph:
+    """
+    Grafo de vecinos de un solo sector: solo se leen sus piezas y solo se
+    conservan las conexiones entre ellas.
+    """
+    return PuzzleGraph.from_documents(repo_pieces_by_sector(puzzle_id, sector, GRAPH_FIELDS))
 
-def list_pieces(puzzle_id: str) -> List[Piece]:
-    """Lista todas las piezas de un puzzle."""
-    raws = repo_list_pieces(puzzle_id)
-    return [Piece(**_prepare_document(r)) for r in raws]
+@timed("service")
+def list_piece_changes(puzzle_id: str, since: int) -> PieceDelta:
+    """
+    Resúmenes de las piezas escritas después de la revisión publicada
+    `since`, por el índice (puzzleId, updatedRev). La revisión devuelta,
+    desde la que pedir la próxima vez, es la publicada, leída antes que las
+    piezas: todo lo escrito hasta ella ya está en la respuesta. Las piezas de
+    escrituras aún en curso pueden llegar ya y volver a llegar la próxima vez.
+
+    La revisión publicada se lee siempre (no pasa por la caché de lecturas,
+    para ver al momento lo que escriben otros procesos); solo la consulta de
+    piezas se cachea, con esa revisión en la clave, y si no avanzó desde
+    `since` ni se hace.
+    """
+    revision = repo_get_revision(puzzle_id)
+    if revision <= since:
+        return PieceDelta(since, [])
+
+    def load() -> PieceDelta:
+        raws = repo_changed_since(puzzle_id, since, _PIECE_SUMMARY_FIELDS)
+        return PieceDelta(revision, [PieceSummary(**r) for r in raws])
+    return cached(("piece_changes", puzzle_id, since, revision), load)
 
+@timed("service")
+def list_piece_codes(puzzle_id: str) -> List[str]:
+    """Lista solo los códigos de las piezas de un puzzle."""
+    def load() -> List[str]:
+        raws = repo_list_pieces(puzzle_id, {"_id": 0, "code": 1})
+        return [r["code"] for r in raws]
+    return cached(("piece_codes", puzzle_id), load)
+
+@timed("service")
 def update_piece_info(
     piece_id: str,
     update_data: dict
 ) -> Optional[Piece]:
     """Actualiza campos de una pieza."""
-    updated = repo_update_piece(piece_id, update_data)
-    return Piece(**_prepare_document(updated)) if updated else None
+    current = repo_get_piece_by_id(piece_id)
+    if not current:
+        return None
+    # Se valida el resultado antes de escribir nada
+    Piece(**_prepare_document({**current, **update_data}))
+    puzzle_id = str(current["puzzleId"])
+    lease = next_revision(puzzle_id)
+    try:
+        updated = repo_update_piece(piece_id, {**update_data, "updatedRev": lease.revision})
+        if not updated:
+            return None
+        piece = Piece(**_prepare_document(updated))
+        # Los enlaces guardan también el sector de la pieza
+        if "neighbors" in update_data or "sector" in update_data:
+            repo_replace_links(
+                piece.puzzleId, {piece.code: updated.get("neighbors") or []}, {piece.code: piece.sector}
+            )
+    finally:
+        touch_puzzle(puzzle_id, lease=lease)
+    return piece
+
+def links_indexed(puzzle_id: str) -> bool:
+    """
+    Indica si el índice de enlaces del puzzle está completo. Los puzzles
+    anteriores a él tienen piezas sin enlaces hasta que `rebuild_piece_links`
+    los regenera; mientras, quien los lea debe calcular desde las piezas.
+    """
+    puzzle = get_puzzle(puzzle_id)
+    return puzzle is None or puzzle.linksIndexed
+
+@timed("service")
+def rebuild_piece_links(puzzle_id: str, chunk_size: int = 1000) -> int:
+    """
+    Regenera el índice de enlaces de un puzzle a partir de sus piezas
+    (p. ej. para datos anteriores a este índice o a los sectores que guarda
+    en cada enlace). Devuelve cuántas piezas procesó.
+
+    Se hace con su propia revisión reservada, y el puzzle solo queda marcado
+    como indexado si ninguna otra escritura de piezas se solapó con ella: una
+    pieza guardada a la vez podría haber quedado con los enlaces que se
+    leyeron antes. Si no, se volverá a regenerar la próxima vez.
+    """
+    lease = next_revision(puzzle_id)
+    try:
+        overlapped = repo_get_revision(puzzle_id) != lease.revision - 1
+        raws = repo_list_pieces(puzzle_id, {"_id": 0, "code": 1, "sector": 1, "neighbors": 1})
+        repo_delete_links(puzzle_id)
+        for i in range(0, len(raws), chunk_size):
+            chunk = raws[i:i + chunk_size]
+            repo_replace_links(
+                puzzle_id,
+                {r["code"]: r.get("neighbors") or [] for r in chunk},
+                {r["code"]: r.get("sector") for r in chunk},
+            )
+    finally:
+        published = touch_puzzle(puzzle_id, lease=lease)
+    if not overlapped and published == lease.revision:
+        repo_update_puzzle(puzzle_id, {"linksIndexed": True})
+        invalidate_puzzle_reads(puzzle_id)
+    return len(raws)
 
 # ─── U T I L I T I E S ────────────────────────────────────────────────────────
 
+def _next_cursor(items: list, limit: int, key) -> Optional[str]:
+    """Cursor de la página siguiente, o None si esta página fue la última."""
+    full = len(items) >= min(limit, MAX_PAGE_SIZE)
+    return key(items[-1]) if items and full else None
+
 def _prepare_document(doc: Dict[str, Any]) -> Dict[str, Any]:
     """
     Prepara un documento de MongoDB para ser convertido a un modelo Pydantic.
@@ -0,0 +1,85 @@
+# services/read_cache.py
+"""
+Caché de lecturas de puzzles y piezas, compartida por todas las sesiones.
+
+Streamlit vuelve a ejecutar la página entera con cada interacción, así que
+sin caché cada rerun repetiría las mismas consultas a MongoDB. Las lecturas
+de `puzzle_service` pasan por `cached()`; las entradas caducan tras
+READ_CACHE_TTL_SECONDS (por si otro proceso escribe) y la caché se acota a
+READ_CACHE_MAX_ITEMS elementos (una lista de N modelos cuenta como N).
+
+Las escrituras de este proceso invalidan explícitamente lo que afectan:
+`invalidate_puzzle_list` (altas, bajas y cambios de puzzles) e
+`invalidate_puzzle_reads` (el puzzle y todas sus piezas).
+
+Los modelos cacheados se comparten entre sesiones: no deben modificarse.
+"""
+
+import threading
+from typing import Any, Callable, Hashable, Tuple, TypeVar
+
+from configs.config import READ_CACHE_MAX_ITEMS, READ_CACHE_TTL_SECONDS
+from utils.cache import LRUCache
+
+T = TypeVar("T")
+
+# Claves: ("puzzles", ...) para listados de puzzles y
+# (tipo, puzzle_id, ...) para lecturas de un puzzle concreto
+PUZZLE_LIST_KINDS = frozenset({"puzzles", "puzzle_page"})
+
+
+def _items(value: Any) -> int:
+    """Peso de una entrada: número de elementos de las listas que contiene."""
+    if isinstance(value, list):
+        return max(len(value), 1)
+    if isinstance(value, tuple):
+        return sum(_items(v) for v in value) or 1
+    return 1
+
+
+_cache = LRUCache(max_items=READ_CACHE_MAX_ITEMS, count=_items, ttl=READ_CACHE_TTL_SECONDS)
+
+# Se incrementa con cada invalidación: una lectura que empezó antes no se guarda
+_generation = 0
+_generation_lock = threading.Lock()
+
+
+def cached(key: Tuple[Hashable, ...], loader: Callable[[], T]) -> T:
+    """
+    Devuelve el valor cacheado para `key` o lo carga con `loader()`.
+    Si durante la carga hubo una escritura, el resultado se devuelve pero
+    no se guarda, para no cachear datos anteriores a esa escritura.
+    """
+    missing = object()
+    value = _cache.get(key, missing)
+    if value is not missing:
+        return value
+    generation = _generation
+    value = loader()
+    if generation == _generation:
+        _cache.put(key, value)
+    return value
+
+
+def invalidate_puzzle_list() -> None:
+    """Descarta los listados de puzzles (tras crear, modificar o borrar uno)."""
+    _bump()
+    _cache.invalidate(lambda key: key[0] in PUZZLE_LIST_KINDS)
+
+
+def invalidate_puzzle_reads(puzzle_id: str) -> None:
+    """Descarta el puzzle y todas las lecturas de sus piezas."""
+    _bump()
+    _cache.invalidate(lambda key: key[0] not in PUZZLE_LIST_KINDS and key[1] == puzzle_id)
+
+
+def clear() -> None:
+    """Vacía la caché completa."""
+    _bump()
+    _cache.clear()
+
+
+def _bump() -> None:
+    global _generation
+    with _generation_lock:
+        _generation += 1
@@ -0,0 +1,121 @@
+# services/snapshot_service.py
+"""
+Exportación e importación de puzzles completos como snapshot binario (ver
+`utils.snapshot`).
+
+Exportar lee las piezas una sola vez, directamente del cursor y solo con
+los campos del grafo, y escribe el archivo de una pasada. Un snapshot
+abierto no necesita la base de datos: los kioscos sin conexión y los
+trabajos de análisis generan las instrucciones sobre los arreglos mapeados.
+Importar un snapshot crea un puzzle nuevo con sus piezas.
+"""
+import os
+from datetime import datetime
+from typing import IO, Callable, Iterator, NamedTuple, Optional, Tuple, Union
+
+from database.repositories import (
+    get_puzzle_by_id      as repo_get_puzzle,
+    iter_pieces_by_puzzle as repo_iter_pieces,
+)
+from models.import_report import ImportReport
+from models.puzzle import Puzzle
+from services.import_service import DEFAULT_CHUNK_SIZE, import_piece_documents
+from services.instruction_service import iter_graph_plan, render_steps
+from services.puzzle_service import add_puzzle
+from utils.graph import GRAPH_FIELDS
+from utils.metrics import timed
+from utils.snapshot import Snapshot, open_snapshot, write_snapshot
+
+# Extensión propuesta para los archivos de snapshot
+SNAPSHOT_EXTENSION = ".pzsnap"
+
+
+class SnapshotInfo(NamedTuple):
+    """Resultado de una exportación."""
+    pieces: int
+    revision: int
+    bytes: int
+
+
+@timed("service")
+def export_snapshot(puzzle_id: str, out: IO[bytes]) -> SnapshotInfo:
+    """
+    Escribe en `out` el snapshot del puzzle. La revisión se lee antes que
+    las piezas: el snapshot contiene al menos los cambios de esa revisión.
+    """
+    raw = repo_get_puzzle(puzzle_id)
+    if raw is None:
+        raise ValueError(f"Puzzle '{puzzle_id}' no encontrado.")
+    meta = {
+        "puzzleId": str(raw["_id"]),
+        "name": raw["name"],
+        "totalPieces": raw["totalPieces"],
+        "sectors": raw["sectors"],
+        "revision": raw.get("revision", 0),
+        "exportedAt": datetime.now().isoformat(timespec="seconds"),
+    }
+    pieces = 0
+
+    def counted(docs):
+        nonlocal pieces
+        for d in docs:
+            pieces += 1
+            yield d
+
+    size = write_snapshot(counted(repo_iter_pieces(puzzle_id, GRAPH_FIELDS)), meta, out)
+    return SnapshotInfo(pieces, meta["revision"], size)
+
+
+@timed("service")
+def export_snapshot_file(puzzle_id: str, path: str) -> SnapshotInfo:
+    """
+    Exporta el snapshot a `path`. Se escribe en un archivo temporal que
+    después se renombra: quien tenga mapeado el snapshot anterior no ve
+    nunca un archivo a medio escribir.
+    """
+    partial = path + ".part"
+    try:
+        with open(partial, "wb") as out:
+            info = export_snapshot(puzzle_id, out)
+        os.replace(partial, path)
+    finally:
+        if os.path.exists(partial):
+            os.remove(partial)
+    return info
+
+
+@timed("service")
+def load_snapshot(source: Union[str, bytes]) -> Snapshot:
+    """Abre un snapshot (ruta, que se mapea en memoria, o bytes ya leídos)."""
+    return open_snapshot(source)
+
+
+def iter_snapshot_instructions(
+    snapshot: Snapshot,
+    start_code: str,
+    strategy: str = "dfs"
+) -> Iterator[str]:
+    """
+    Instrucciones de armado recorriendo directamente el grafo del snapshot,
+    de forma perezosa y sin base de datos.
+    """
+    plan = iter_graph_plan(snapshot.graph, start_code, strategy)
+    return (text for _, text in render_steps(plan))
+
+
+@timed("service")
+def import_snapshot(
+    source: Union[str, bytes],
+    name: Optional[str] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    on_progress: Optional[Callable[[ImportReport], None]] = None
+) -> Tuple[Puzzle, ImportReport]:
+    """
+    Crea un puzzle nuevo (con el nombre del snapshot o `name`) e importa sus
+    piezas por bloques, con la misma validación que la importación CSV/JSON.
+    """
+    snapshot = open_snapshot(source)
+    meta = snapshot.meta
+    puzzle = add_puzzle(name or meta["name"], meta["totalPieces"], meta["sectors"])
+    report = import_piece_documents(puzzle.id, snapshot.piece_documents(), chunk_size, on_progress)
+    return puzzle, report
@@ -0,0 +1,375 @@
+# services/write_behind.py
+"""
+Guardado diferido de piezas (write-behind), opcional con WRITE_BEHIND_ENABLED.
+
+Guardar una pieza de forma síncrona cuesta varios viajes a la base de datos
+(reservar la revisión, escribir la pieza y sus enlaces). Con el guardado
+diferido, `save_piece` valida la pieza, la deja en una cola del proceso y
+vuelve al instante; un hilo de fondo escribe la cola cuando reúne
+WRITE_BEHIND_BATCH_SIZE piezas o cuando la más antigua lleva
+WRITE_BEHIND_FLUSH_SECONDS esperando:
+
+- Las piezas de un mismo puzzle se escriben con una sola revisión, un
+  `bulk_upsert_pieces` y un bulk_write de enlaces (como un bloque de la
+  importación masiva). Si el lote de un puzzle tiene una sola pieza se leen
+  antes sus enlaces, para que los planes guardados se sigan actualizando de
+  forma incremental (`PieceChange`).
+- El hilo usa los repositorios síncronos, no `run_concurrently`: al salir
+  (atexit) los ejecutores de hilos de `concurrent.futures` ya están cerrados.
+- Dos guardados del mismo código antes de escribirse se reducen al último.
+- Si el lote falla, sus piezas se reintentan una a una y las que vuelvan a
+  fallar se registran como `WriteError` para la sesión que las guardó
+  (`take_errors`). Los errores que nadie recoge caducan a las
+  ERRORS_TTL_SECONDS y solo se guardan los de las MAX_ERROR_SESSIONS
+  sesiones con errores más recientes.
+
+Hasta que se escriben, la sesión que guardó las piezas las ve en sus
+propias lecturas: `pending_summaries` (el listado), `get_piece` (una pieza
+por código) y `get_piece_neighbors` (sus conexiones en ambos sentidos). Las
+demás sesiones, y el resto de lecturas de `puzzle_service`, solo ven lo ya
+escrito. Al terminar el proceso (atexit) la cola se escribe antes de salir;
+`flush()` la escribe a demanda.
+"""
+
+import atexit
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Deque, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from configs.config import WRITE_BEHIND_BATCH_SIZE, WRITE_BEHIND_ENABLED, WRITE_BEHIND_FLUSH_SECONDS
+from database.repositories import (
+    bulk_upsert_pieces  as repo_bulk_upsert_pieces,
+    get_links_from      as repo_links_from,
+    get_links_to        as repo_links_to,
+    replace_piece_links as repo_replace_links,
+)
+from models.piece import Piece, PieceSummary
+from services.instruction_cache import PieceChange
+from services.puzzle_service import (
+    add_or_update_piece, get_piece as get_saved_piece, links_indexed, list_pieces, next_revision,
+    touch_puzzle
+)
+from utils.logger import get_logger
+from utils.metrics import timed
+
+logger = get_logger(__name__)
+
+# Errores que se conservan hasta que los recoja `take_errors`: por sesión,
+# sesiones distintas y segundos desde el último error de la sesión
+MAX_ERRORS_PER_SESSION = 100
+MAX_ERROR_SESSIONS = 1000
+ERRORS_TTL_SECONDS = 3600
+
+# (puzzle_id, code)
+_Key = Tuple[str, str]
+
+
+class PendingWrite(NamedTuple):
+    """Pieza encolada: los campos a escribir y la sesión que la guardó."""
+    puzzle_id: str
+    code: str
+    sector: str
+    edges: List[dict]
+    neighbors: List[dict]
+    session: Optional[str]
+
+
+class PieceNeighbors(NamedTuple):
+    """Conexiones de una pieza: las que declara y las que otras declaran hacia ella."""
+    outgoing: List[Tuple[int, str]]   # (conexión de la pieza, vecino)
+    incoming: List[Tuple[str, int]]   # (pieza que la declara, conexión de esa pieza)
+
+
+class WriteError(NamedTuple):
+    """Pieza que no se pudo escribir."""
+    puzzle_id: str
+    code: str
+    message: str
+
+
+class WriteBehindQueue:
+    """
+    Cola de piezas pendientes y el hilo que la escribe por lotes. El hilo se
+    arranca con la primera pieza encolada.
+    """
+
+    def __init__(
+        self,
+        batch_size: int = WRITE_BEHIND_BATCH_SIZE,
+        flush_seconds: float = WRITE_BEHIND_FLUSH_SECONDS
+    ):
+        if batch_size < 1:
+            raise ValueError("batch_size debe ser mayor que cero.")
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self._cond = threading.Condition()
+        # Encoladas y en escritura; un código está en las dos si se volvió a
+        # guardar mientras se escribía (prevalece la encolada)
+        self._pending: Dict[_Key, PendingWrite] = {}
+        self._in_flight: Dict[_Key, PendingWrite] = {}
+        self._oldest = 0.0
+        self._flush_requested = False
+        self._closed = False
+        # sesión -> (instante del último error, errores); la más antigua primero
+        self._errors: "OrderedDict[Optional[str], Tuple[float, Deque[WriteError]]]" = OrderedDict()
+        self._thread: Optional[threading.Thread] = None
+
+    def put(self, write: PendingWrite) -> None:
+        """Encola una pieza (sustituye a la que hubiera pendiente con su código)."""
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("La cola de guardado diferido está cerrada.")
+            if not self._pending:
+                self._oldest = time.monotonic()
+            key = (write.puzzle_id, write.code)
+            self._pending.pop(key, None)
+            self._pending[key] = write
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+                self._thread.start()
+            self._cond.notify_all()
+
+    def pending(self, puzzle_id: str, session: Optional[str] = None) -> List[PendingWrite]:
+        """Piezas del puzzle aún sin escribir (de `session`, o de todas si es None)."""
+        with self._cond:
+            writes = {**self._in_flight, **self._pending}
+        return [
+            w for w in writes.values()
+            if w.puzzle_id == puzzle_id and (session is None or w.session == session)
+        ]
+
+    def lookup(self, puzzle_id: str, code: str, session: Optional[str]) -> Optional[PendingWrite]:
+        """
+        Versión pendiente de una pieza si la última que se guardó es de
+        `session`; None si no hay ninguna o es de otra sesión.
+        """
+        key = (puzzle_id, code)
+        with self._cond:
+            write = self._pending.get(key) or self._in_flight.get(key)
+        return write if write is not None and write.session == session else None
+
+    def take_errors(self, session: Optional[str]) -> List[WriteError]:
+        """Devuelve y olvida los errores de escritura de una sesión."""
+        with self._cond:
+            self._prune_errors()
+            _, errors = self._errors.pop(session, (0.0, ()))
+        return list(errors)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Escribe ya lo pendiente y espera a que termine. Devuelve False si se
+        agotó `timeout` antes.
+        """
+        with self._cond:
+            if self._pending:
+                self._flush_requested = True
+                self._cond.notify_all()
+            return self._cond.wait_for(lambda: not self._pending and not self._in_flight, timeout)
+
+    def close(self, timeout: Optional[float] = None) -> None:
+        """Escribe lo pendiente y detiene el hilo; después no se admiten piezas."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+            thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+
+    # ─── H I L O   D E   E S C R I T U R A ──────────────────────────────────
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._due():
+                    if self._closed:
+                        return
+                    self._cond.wait(self._wait_time())
+                batch = list(self._pending.values())
+                self._in_flight, self._pending = self._pending, {}
+                self._flush_requested = False
+            try:
+                self._write(batch)
+            finally:
+                with self._cond:
+                    self._in_flight = {}
+                    self._cond.notify_all()
+
+    def _due(self) -> bool:
+        if not self._pending:
+            return False
+        return (
+            self._closed
+            or self._flush_requested
+            or len(self._pending) >= self.batch_size
+            or time.monotonic() - self._oldest >= self.flush_seconds
+        )
+
+    def _wait_time(self) -> Optional[float]:
+        if not self._pending:
+            return None
+        return max(0.0, self._oldest + self.flush_seconds - time.monotonic())
+
+    def _write(self, batch: List[PendingWrite]) -> None:
+        by_puzzle: Dict[str, List[PendingWrite]] = {}
+        for write in batch:
+            by_puzzle.setdefault(write.puzzle_id, []).append(write)
+        for puzzle_id, writes in by_puzzle.items():
+            try:
+                _write_puzzle_batch(puzzle_id, writes)
+            except Exception:
+                logger.warning(
+                    "Falló el lote diferido de %d piezas del puzzle %s; se reintentan una a una",
+                    len(writes), puzzle_id, exc_info=True
+                )
+                for write in writes:
+                    try:
+                        _write_puzzle_batch(puzzle_id, [write])
+                    except Exception as e:
+                        self._fail(write, e)
+
+    def _fail(self, write: PendingWrite, error: Exception) -> None:
+        logger.error("No se pudo guardar la pieza %s del puzzle %s: %s", write.code, write.puzzle_id, error)
+        with self._cond:
+            _, errors = self._errors.pop(write.session, (0.0, deque(maxlen=MAX_ERRORS_PER_SESSION)))
+            errors.append(WriteError(write.puzzle_id, write.code, str(error)))
+            self._errors[write.session] = (time.monotonic(), errors)
+            self._prune_errors()
+
+    def _prune_errors(self) -> None:
+        # Olvida las sesiones que no recogieron sus errores a tiempo (se
+        # llama con el lock tomado)
+        expired = time.monotonic() - ERRORS_TTL_SECONDS
+        while self._errors:
+            session, (at, _) = next(iter(self._errors.items()))
+            if at > expired and len(self._errors) <= MAX_ERROR_SESSIONS:
+                break
+            del self._errors[session]
+
+
+def _write_puzzle_batch(puzzle_id: str, writes: List[PendingWrite]) -> None:
+    """Escribe las piezas de un puzzle con una sola revisión."""
+    single = None
+    if len(writes) == 1:
+        code = writes[0].code
+        single = PieceChange(code, [(l["edgeId"], l["toCode"]) for l in repo_links_from(puzzle_id, code)])
+    lease = next_revision(puzzle_id)
+    change = None
+    try:
+        repo_bulk_upsert_pieces(puzzle_id, [
+            {"code": w.code, "sector": w.sector, "edges": w.edges,
+             "neighbors": w.neighbors, "updatedRev": lease.revision}
+            for w in writes
+        ])
+        repo_replace_links(
+            puzzle_id, {w.code: w.neighbors for w in writes}, {w.code: w.sector for w in writes}
+        )
+        change = single
+    finally:
+        touch_puzzle(puzzle_id, change, lease)
+
+# ─── C O L A   D E L   P R O C E S O ──────────────────────────────────────────
+
+_queue: Optional[WriteBehindQueue] = None
+_queue_lock = threading.Lock()
+
+
+def get_queue() -> WriteBehindQueue:
+    """Cola única del proceso, creada en la primera llamada; se vacía al salir."""
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = WriteBehindQueue()
+            atexit.register(_queue.close)
+    return _queue
+
+
+@timed("service")
+def save_piece(
+    puzzle_id: str,
+    code: str,
+    sector: str,
+    edges: List[dict],
+    neighbors: List[dict],
+    session: Optional[str] = None
+) -> Piece:
+    """
+    Guarda una pieza: con WRITE_BEHIND_ENABLED la valida y la encola (la
+    devuelve sin id, aún no escrita); si no, es `add_or_update_piece`.
+    `session` identifica a quien guarda, para sus lecturas y sus errores.
+    """
+    if not WRITE_BEHIND_ENABLED:
+        return add_or_update_piece(puzzle_id, code, sector, edges, neighbors)
+    piece = Piece(puzzleId=puzzle_id, code=code, sector=sector, edges=edges, neighbors=neighbors)
+    get_queue().put(PendingWrite(puzzle_id, code, sector, edges, neighbors, session))
+    return piece
+
+
+def pending_summaries(puzzle_id: str, session: Optional[str] = None) -> List[PieceSummary]:
+    """Resúmenes de las piezas del puzzle aún sin escribir, ordenados por código."""
+    if _queue is None:
+        return []
+    writes = sorted(_queue.pending(puzzle_id, session), key=lambda w: w.code)
+    return [PieceSummary(code=w.code, sector=w.sector) for w in writes]
+
+
+@timed("service")
+def get_piece(puzzle_id: str, code: str, session: Optional[str] = None) -> Optional[Piece]:
+    """
+    Pieza por código; si `session` tiene una versión pendiente de escribir,
+    esa (sin id, como la devolvió `save_piece`).
+    """
+    write = _queue.lookup(puzzle_id, code, session) if _queue is not None else None
+    if write is None:
+        return get_saved_piece(puzzle_id, code)
+    return Piece(
+        puzzleId=puzzle_id, code=code, sector=write.sector,
+        edges=write.edges, neighbors=write.neighbors
+    )
+
+
+@timed("service")
+def get_piece_neighbors(puzzle_id: str, code: str, session: Optional[str] = None) -> PieceNeighbors:
+    """
+    Conexiones de una pieza en ambos sentidos, con las piezas pendientes de
+    `session` en lugar de su versión escrita. Las entrantes salen del índice
+    de enlaces o, en un puzzle que aún no lo tiene completo, de las piezas.
+    """
+    writes = _queue.pending(puzzle_id, session) if _queue is not None else []
+    pending = {w.code: w for w in writes if w.session == session}
+    piece = get_piece(puzzle_id, code, session)
+    outgoing = _declared((nb.edgeId, nb.neighborCode) for nb in piece.neighbors) if piece else []
+
+    if links_indexed(puzzle_id):
+        saved = [(l["fromCode"], l["edgeId"]) for l in repo_links_to(puzzle_id, code)]
+    else:
+        saved = [
+            (p.code, edge_id) for p in list_pieces(puzzle_id)
+            for edge_id, to_code in _declared((nb.edgeId, nb.neighborCode) for nb in p.neighbors)
+            if to_code == code
+        ]
+    # Las piezas pendientes sustituyen a su versión escrita
+    incoming = {link for link in saved if link[0] not in pending}
+    incoming.update(
+        (w.code, edge_id) for w in pending.values()
+        for edge_id, to_code in _declared((nb["edgeId"], nb.get("neighborCode")) for nb in w.neighbors)
+        if to_code == code
+    )
+    return PieceNeighbors(sorted(outgoing), sorted(incoming))
+
+
+def _declared(pairs: Iterable[Tuple[int, Optional[str]]]) -> List[Tuple[int, str]]:
+    # (conexión, vecino) como en el índice de enlaces: uno por conexión
+    # (prevalece el último) y sin vecinos vacíos
+    return list({edge_id: to_code for edge_id, to_code in pairs if to_code}.items())
+
+
+def take_errors(session: Optional[str]) -> List[WriteError]:
+    """Errores de escritura pendientes de mostrar a una sesión."""
+    return _queue.take_errors(session) if _queue is not None else []
+
+
+@timed("service")
+def flush(timeout: Optional[float] = None) -> bool:
+    """Escribe ya las piezas encoladas. False si se agotó `timeout`."""
+    return _queue.flush(timeout) if _queue is not None else True
@@ -0,0 +1,119 @@
+# ui/components.py
+"""
+Componentes Streamlit compartidos entre las páginas.
+
+Los listados se cargan por páginas (paginación por cursor) y se conservan en
+`st.session_state`, de modo que un rerun no vuelve a consultar la base de
+datos ni descarga más de lo que el usuario pidió ver. Si se sembraron con una
+revisión, `sync_pages` les mezcla solo lo que cambió desde entonces.
+"""
+
+from bisect import bisect_left
+from typing import Any, Callable, List, Optional, Tuple
+from uuid import uuid4
+import streamlit as st
+from services.puzzle_service import list_puzzle_summaries
+from models.puzzle import PuzzleSummary
+
+# Función que recibe un cursor (o None) y devuelve (página, siguiente cursor)
+PageFetcher = Callable[[Optional[str]], Tuple[list, Optional[str]]]
+# Función que recibe una revisión y devuelve (revisión alcanzada, elementos cambiados)
+ChangeFetcher = Callable[[int], Tuple[int, list]]
+
+PUZZLES_KEY = "pages:puzzles"
+
+def pieces_key(puzzle_id: str) -> str:
+    """Clave de session_state de las páginas de piezas de un puzzle."""
+    return f"pages:pieces:{puzzle_id}"
+
+def paged_items(key: str, fetch: PageFetcher, more_label: str = "Cargar más") -> List:
+    """
+    Devuelve los elementos cargados hasta ahora para `key`, cargando la primera
+    página si hace falta, y muestra un botón para pedir la siguiente.
+    """
+    state = st.session_state.get(key)
+    if state is None:
+        items, cursor = fetch(None)
+        state = st.session_state[key] = {"items": items, "cursor": cursor, "revision": None}
+
+    if state["cursor"] is not None and st.button(more_label, key=f"{key}:more"):
+        items, cursor = fetch(state["cursor"])
+        state["items"] = state["items"] + items
+        state["cursor"] = cursor
+
+    return state["items"]
+
+def pages_cursor(key: str) -> Optional[str]:
+    """Cursor de la siguiente página de `key` (None si ya está todo cargado)."""
+    state = st.session_state.get(key)
+    return state["cursor"] if state else None
+
+def has_pages(key: str) -> bool:
+    """Indica si ya hay páginas cargadas para `key`."""
+    return key in st.session_state
+
+def seed_pages(key: str, items: list, cursor: Optional[str], revision: Optional[int] = None) -> None:
+    """
+    Guarda una primera página obtenida por otra vía (p. ej. junto con el
+    puzzle). Con `revision`, las páginas se pueden sincronizar con `sync_pages`.
+    """
+    st.session_state[key] = {"items": items, "cursor": cursor, "revision": revision}
+
+def sync_pages(key: str, fetch_changes: ChangeFetcher, key_of: Callable[[Any], str]) -> None:
+    """
+    Mezcla en las páginas cargadas de `key` los elementos cambiados desde su
+    revisión: sustituye los que ya están e inserta, en orden, los nuevos que
+    caen dentro del rango cargado (los posteriores llegarán con su página).
+    """
+    state = st.session_state.get(key)
+    if state is None or state.get("revision") is None:
+        return
+    revision, changed = fetch_changes(state["revision"])
+    if changed:
+        state["items"] = merge_items(state["items"], changed, key_of, state["cursor"])
+    state["revision"] = revision
+
+def merge_items(
+    items: list, changed: list, key_of: Callable[[Any], str], cursor: Optional[str] = None
+) -> list:
+    """
+    Copia de `items` (ordenados por `key_of`) con `changed` mezclados: sustituye
+    los que ya están e inserta en orden los nuevos hasta `cursor` (None = todos).
+    """
+    if not changed:
+        return items
+    items = list(items)
+    keys = [key_of(item) for item in items]
+    for item in changed:
+        k = key_of(item)
+        if cursor is not None and k > cursor:
+            continue
+        pos = bisect_left(keys, k)
+        if pos < len(keys) and keys[pos] == k:
+            items[pos] = item
+        else:
+            keys.insert(pos, k)
+            items.insert(pos, item)
+    return items
+
+def reset_pages(key: str) -> None:
+    """Descarta las páginas cargadas para que se vuelvan a pedir."""
+    st.session_state.pop(key, None)
+
+def session_token() -> str:
+    """Identificador de la sesión del navegador (p. ej. para el guardado diferido)."""
+    return st.session_state.setdefault("session_token", uuid4().hex)
+
+def select_puzzle(label: str = "Selecciona un Puzzle") -> Optional[PuzzleSummary]:
+    """
+    Selector de puzzle alimentado por páginas de resúmenes (id, nombre, piezas).
+    Devuelve None si no hay puzzles.
+    """
+    puzzles = paged_items(PUZZLES_KEY, lambda cursor: list_puzzle_summaries(cursor), "Cargar más puzzles")
+    if not puzzles:
+        return None
+    return st.selectbox(
+        label,
+        puzzles,
+        format_func=lambda p: f"{p.name} (ID: {p.id})"
+    )
@@ -6,8 +6,9 @@ Permite ingresar el nombre, número total de piezas y sectores.
 Lista puzzles ya existentes.
 """
 import streamlit as st
-from services.puzzle_service import add_puzzle, list_puzzles
+from services.puzzle_service import add_puzzle, list_puzzle_summaries
 from models.puzzle import Puzzle
+from ui.components import PUZZLES_KEY, paged_items, reset_pages
 
 def run():
     st.header("1️⃣ Crear nuevo Puzzle")
@@ -38,6 +39,7 @@ def run():
             sectors = [s.strip() for s in sectors_input.split(",") if s.strip()]
             try:
                 puzzle: Puzzle = add_puzzle(name, total_pieces, sectors)
+                reset_pages(PUZZLES_KEY)
                 st.success(f"✔️ Puzzle creado: **{puzzle.name}** (ID: `{puzzle.id}`)")
             except Exception as e:
                 st.error(f"Error al crear el puzzle: {e}")
@@ -45,9 +47,10 @@ def run():
     # Listado de puzzles existentes
     st.markdown("---")
     st.subheader("📋 Puzzles existentes")
-    puzzles = list_puzzles()
+    puzzles = paged_items(PUZZLES_KEY, lambda cursor: list_puzzle_summaries(cursor), "Cargar más puzzles")
     if puzzles:
-        for p in puzzles:
-            st.write(f"- **{p.name}**  (ID: `{p.id}`, piezas: {p.totalPieces}, sectores: {p.sectors})")
+        st.markdown("\n".join(
+            f"- **{p.name}**  (ID: `{p.id}`, piezas: {p.totalPieces})" for p in puzzles
+        ))
     else:
         st.info("Aún no hay puzzles registrados.")
@@ -2,45 +2,208 @@
 """
 Interfaz Streamlit para visualizar las instrucciones de armado.
 
-Permite elegir la pieza inicial y muestra instrucciones generadas paso a paso.
+Permite elegir la pieza inicial (por defecto, la recomendada: el centro de la
+isla más grande) y muestra instrucciones generadas paso a paso.
+Los pasos se piden y se dibujan por ventanas (páginas), así el tiempo hasta
+ver el primer paso no depende del tamaño del puzzle.
+
+En el modo de varios armadores, el puzzle se divide en regiones: cada una
+tiene su pestaña (y su descarga) y una última pestaña explica cómo unirlas.
+
+En el modo por sectores se muestra el orden de los sectores y solo se
+cargan las piezas del sector que se abre.
 """
 
 import streamlit as st
-from services.puzzle_service import list_puzzles, list_pieces
-from services.instruction_service import generate_instructions
-from models.puzzle import Puzzle
-from models.piece import Piece
+from services.analysis_service import recommend_start_pieces
+from services.puzzle_service import list_piece_codes
+from services.instruction_service import (
+    find_piece_step, generate_sector_instructions, generate_sector_order,
+    generate_team_instructions, get_instruction_window
+)
+from models.puzzle import PuzzleSummary
+from ui.components import select_puzzle
+
+PAGE_SIZES = (25, 50, 100, 200)
+MODES = ("Un armador", "Varios armadores (por regiones)", "Por sectores")
+MAX_WORKERS = 16
+# Pasos que se dibujan por región; el resto se obtiene con la descarga
+MAX_TEAM_STEPS_SHOWN = 500
 
 def run():
     st.header("3️⃣ Ver instrucciones de armado")
 
     # 1. Selección de Puzzle
-    puzzles = list_puzzles()
-    if not puzzles:
+    puzzle: PuzzleSummary = select_puzzle("Selecciona un puzzle")
+    if puzzle is None:
         st.info("No hay puzzles creados. Crea uno primero en la sección ‘Crear Puzzle’.")
         return
 
-    puzzle: Puzzle = st.selectbox(
-        "Selecciona un puzzle",
-        puzzles,
-        format_func=lambda p: f"{p.name} (ID: {p.id})"
-    )
-
-    # 2. Obtener lista de códigos de piezas mapeadas
-    pieces: list[Piece] = list_pieces(puzzle.id)
-    if not pieces:
+    # 2. Obtener lista de códigos de piezas mapeadas (solo el campo code)
+    codes = list_piece_codes(puzzle.id)
+    if not codes:
         st.info("Aún no hay piezas mapeadas en este puzzle. Ve a ‘Mapear Piezas’ primero.")
         return
 
-    codes = [p.code for p in pieces]
-    start_code = st.selectbox("Seleccione la pieza base", codes)
+    # La pieza recomendada aparece seleccionada por defecto
+    recommended = recommend_start_pieces(puzzle.id, limit=1)
+    index = 0
+    if recommended and recommended[0].code in codes:
+        best = recommended[0]
+        index = codes.index(best.code)
+        st.caption(
+            f"⭐ Pieza recomendada: **{best.code}** (sector {best.sector}). "
+            f"Empezando por ella, ninguna pieza de su isla queda a más de {best.depth} uniones."
+        )
+    start_code = st.selectbox("Seleccione la pieza base", codes, index=index)
+    mode = st.radio("Modo de armado", MODES, horizontal=True)
+    if mode == MODES[1]:
+        render_team(puzzle, start_code, len(codes))
+        return
+    if mode == MODES[2]:
+        render_sectors(puzzle, start_code)
+        return
 
-    # 3. Generar instrucciones
+    # 3. Generar instrucciones (la vista queda abierta entre reruns)
+    view_key = (puzzle.id, start_code)
     if st.button("🧩 Generar instrucciones"):
-        try:
-            instructions = generate_instructions(puzzle.id, start_code)
-            st.subheader("Pasos para armar tu rompecabezas:")
-            for i, inst in enumerate(instructions, start=1):
-                st.write(f"{i}. {inst}")
-        except Exception as e:
-            st.error(f"Error al generar instrucciones: {e}")
+        st.session_state["instructions_view"] = view_key
+        st.session_state["instructions_offset"] = 0
+    if st.session_state.get("instructions_view") != view_key:
+        return
+
+    st.subheader("Pasos para armar tu rompecabezas:")
+    page_size = st.selectbox("Pasos por página", PAGE_SIZES, index=1)
+    offset = st.session_state.get("instructions_offset", 0)
+
+    # 4. Navegación: páginas, saltar a un paso o a una pieza
+    col_prev, col_next, col_step, col_piece = st.columns(4)
+    with col_prev:
+        if st.button("⬅️ Anterior", disabled=offset == 0):
+            offset = max(offset - page_size, 0)
+    with col_next:
+        if st.button("Siguiente ➡️"):
+            offset += page_size
+    with col_step:
+        step = st.number_input("Ir al paso", min_value=1, value=1, step=1)
+        if st.button("Ir al paso"):
+            offset = int(step) - 1
+    with col_piece:
+        target = st.text_input("Ir a la pieza", help="Código de la pieza, p. ej. P42").strip()
+        if st.button("Buscar pieza") and target:
+            found = find_piece_step(puzzle.id, start_code, target)
+            if found is None:
+                st.warning(f"La pieza {target} no se alcanza desde {start_code}.")
+            else:
+                offset = found
+
+    offset -= offset % page_size
+    st.session_state["instructions_offset"] = offset
+
+    # 5. Ventana actual: un solo elemento por página en lugar de uno por paso
+    try:
+        window = get_instruction_window(puzzle.id, start_code, offset, page_size)
+    except Exception as e:
+        st.error(f"Error al generar instrucciones: {e}")
+        return
+
+    if not window:
+        st.info("No hay más pasos.")
+        return
+    st.caption(f"Pasos {offset + 1}–{offset + len(window)}")
+    st.markdown("\n".join(
+        f"{i}. {inst}" for i, inst in enumerate(window, start=offset + 1)
+    ))
+
+
+def render_team(puzzle: PuzzleSummary, start_code: str, piece_count: int) -> None:
+    """Instrucciones por regiones para armar en equipo."""
+    max_workers = max(1, min(MAX_WORKERS, piece_count))
+    workers = st.number_input(
+        "Número de armadores", min_value=1, max_value=max_workers,
+        value=min(2, max_workers), step=1
+    )
+
+    view_key = (puzzle.id, start_code, int(workers))
+    if st.button("🧩 Generar instrucciones por regiones"):
+        st.session_state["team_view"] = view_key
+    if st.session_state.get("team_view") != view_key:
+        return
+
+    try:
+        regions, joins = generate_team_instructions(puzzle.id, int(workers), start_code)
+    except Exception as e:
+        st.error(f"Error al generar instrucciones: {e}")
+        return
+
+    labels = [f"Región {r} ({len(steps)} pasos)" for r, steps in enumerate(regions, start=1)]
+    tabs = st.tabs(labels + [f"Unión de regiones ({len(joins)} pasos)"])
+    for r, (tab, steps) in enumerate(zip(tabs, regions), start=1):
+        with tab:
+            st.download_button(
+                "Descargar pasos de la región",
+                "\n".join(f"{i}. {inst}" for i, inst in enumerate(steps, start=1)),
+                file_name=f"{puzzle.name}_region_{r}.txt",
+                mime="text/plain",
+                key=f"team_download_{r}",
+            )
+            if len(steps) > MAX_TEAM_STEPS_SHOWN:
+                st.caption(f"Se muestran los primeros {MAX_TEAM_STEPS_SHOWN} pasos de {len(steps)}.")
+            st.markdown("\n".join(
+                f"{i}. {inst}" for i, inst in enumerate(steps[:MAX_TEAM_STEPS_SHOWN], start=1)
+            ))
+    with tabs[-1]:
+        if not joins:
+            st.info("No hay regiones que unir.")
+        else:
+            st.caption("Cuando todas las regiones estén armadas, únelas en este orden:")
+            st.markdown("\n".join(f"{i}. {inst}" for i, inst in enumerate(joins, start=1)))
+
+
+def render_sectors(puzzle: PuzzleSummary, start_code: str) -> None:
+    """Instrucciones jerárquicas: orden de los sectores y pasos del sector elegido."""
+    try:
+        stages = generate_sector_order(puzzle.id, start_code)
+    except Exception as e:
+        st.error(f"Error al ordenar los sectores: {e}")
+        return
+
+    st.subheader("Orden de los sectores")
+    st.dataframe(
+        [
+            {
+                "etapa": i,
+                "sector": s.sector,
+                "piezas": s.pieces,
+                "se une a": s.joins_to or "— (aparte)",
+                "conexiones": s.links,
+            }
+            for i, s in enumerate(stages, start=1)
+        ],
+        use_container_width=True,
+        hide_index=True,
+    )
+
+    labels = [f"Etapa {i}: sector {s.sector} ({s.pieces} piezas)" for i, s in enumerate(stages, start=1)]
+    chosen = st.selectbox("Sector a armar", range(len(stages)), format_func=labels.__getitem__)
+    stage = stages[chosen]
+    if stage.joins_to:
+        st.caption(f"Se arma sobre lo ya armado, empezando por su unión con el sector {stage.joins_to}.")
+
+    try:
+        steps = generate_sector_instructions(puzzle.id, stage.sector, start_code)
+    except Exception as e:
+        st.error(f"Error al generar instrucciones: {e}")
+        return
+
+    st.download_button(
+        "Descargar pasos del sector",
+        "\n".join(f"{i}. {inst}" for i, inst in enumerate(steps, start=1)),
+        file_name=f"{puzzle.name}_sector_{stage.sector}.txt",
+        mime="text/plain",
+    )
+    if len(steps) > MAX_TEAM_STEPS_SHOWN:
+        st.caption(f"Se muestran los primeros {MAX_TEAM_STEPS_SHOWN} pasos de {len(steps)}.")
+    st.markdown("\n".join(
+        f"{i}. {inst}" for i, inst in enumerate(steps[:MAX_TEAM_STEPS_SHOWN], start=1)
+    ))
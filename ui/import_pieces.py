@@ -0,0 +1,69 @@
+# ui/import_pieces.py
+"""
+Interfaz Streamlit para la importación masiva de piezas.
+
+Permite subir un archivo CSV o JSON con muchas piezas y escribirlas por
+bloques, mostrando el progreso y los errores de validación por fila.
+"""
+
+import streamlit as st
+from services.import_service import import_pieces, DEFAULT_CHUNK_SIZE
+from models.puzzle import PuzzleSummary
+from models.import_report import ImportReport
+from ui.components import pieces_key, reset_pages, select_puzzle
+
+def run():
+    st.header("4️⃣ Importar piezas")
+
+    # 1. Selección de Puzzle
+    puzzle: PuzzleSummary = select_puzzle()
+    if puzzle is None:
+        st.info("No hay puzzles creados. Por favor, crea uno primero en la sección ‘Crear Puzzle’.")
+        return
+
+    st.caption(
+        "CSV con columnas `code,sector,edges,neighbors` (tipos y vecinos separados por `|`, "
+        "p. ej. `P1,A,macho|hembra,P2|`), o JSON/JSON Lines con objetos "
+        "`{code, sector, edges, neighbors}`."
+    )
+
+    # 2. Archivo y tamaño de bloque
+    uploaded = st.file_uploader("Archivo de piezas", type=["csv", "json", "jsonl"])
+    chunk_size = st.number_input(
+        "Piezas por bloque",
+        min_value=50, max_value=5000,
+        value=DEFAULT_CHUNK_SIZE, step=50
+    )
+
+    if uploaded is None or not st.button("📥 Importar"):
+        return
+
+    # 3. Importación con progreso
+    fmt = "csv" if uploaded.name.lower().endswith(".csv") else "json"
+    total_rows = max(uploaded.getvalue().count(b"\n"), 1)
+    progress = st.progress(0.0, text="Importando…")
+
+    def on_progress(report: ImportReport):
+        progress.progress(
+            min(report.processed / total_rows, 1.0),
+            text=f"{report.processed} filas procesadas"
+        )
+
+    try:
+        report = import_pieces(puzzle.id, uploaded, fmt, int(chunk_size), on_progress)
+    except Exception as e:
+        st.error(f"Error al importar las piezas: {e}")
+        return
+
+    progress.progress(1.0, text="Importación terminada")
+    reset_pages(pieces_key(puzzle.id))
+    st.success(
+        f"✔️ {report.valid} piezas válidas de {report.processed}: "
+        f"{report.upserted} nuevas, {report.modified} actualizadas."
+    )
+    if report.errors:
+        st.warning(f"{len(report.errors)} filas con errores:")
+        st.dataframe(
+            [e.model_dump() for e in report.errors],
+            use_container_width=True
+        )
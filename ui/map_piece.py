@@ -3,40 +3,92 @@
 Interfaz Streamlit para mapear piezas a un puzzle existente.
 
 Incluye selección del puzzle, definición de conexiones (edges) y vecinos (neighbors).
+El listado de piezas mapeadas se puede filtrar por sector: entonces solo se
+leen las piezas de ese sector. Una vez cargado, el listado se mantiene al día
+pidiendo solo las piezas escritas desde la última revisión vista.
+
+El listado se dibuja después de procesar el guardado (en un contenedor
+reservado encima del formulario), así que la pieza guardada aparece sin
+volver a ejecutar la página. Con el guardado diferido (`services.write_behind`)
+las piezas encoladas de esta sesión se mezclan en el listado y en la
+consulta de una pieza hasta que se escriben, y los errores de escritura se
+muestran en el siguiente rerun.
 """
 
+from typing import Optional
+
 import streamlit as st
-from services.puzzle_service import list_puzzles, add_or_update_piece as add_piece, list_pieces
+from services.puzzle_service import (
+    get_puzzle, get_puzzle_overview, list_piece_changes, list_piece_summaries,
+    list_sector_piece_summaries
+)
+from services.write_behind import (
+    get_piece, get_piece_neighbors, pending_summaries, save_piece, take_errors
+)
 from models.puzzle import Puzzle
-from models.piece import Piece
+from models.piece import Piece, PieceSummary
+from ui.components import (
+    PUZZLES_KEY, has_pages, merge_items, paged_items, pages_cursor, pieces_key, reset_pages,
+    seed_pages, select_puzzle, session_token, sync_pages
+)
+
+ALL_SECTORS = "Todos"
 
 def run():
     st.header("2️⃣ Mapear piezas del Puzzle")
 
     # 1. Selección de Puzzle
-    puzzles = list_puzzles()
-    if not puzzles:
+    summary = select_puzzle()
+    if summary is None:
         st.info("No hay puzzles creados. Por favor, crea uno primero en la sección ‘Crear Puzzle’.")
         return
 
-    puzzle: Puzzle = st.selectbox(
-        "Selecciona un Puzzle",
-        puzzles,
-        format_func=lambda p: f"{p.name} (ID: {p.id})"
-    )
+    session = session_token()
+    for error in take_errors(session):
+        st.error(f"❌ No se pudo guardar la pieza **{error.code}**: {error.message}")
+
+    # Sin páginas cargadas, el puzzle y su primera página se piden a la vez;
+    # con páginas cargadas, las piezas escritas desde entonces se piden al
+    # dibujar el listado (después del guardado)
+    key = pieces_key(summary.id)
+    if has_pages(key):
+        puzzle: Optional[Puzzle] = get_puzzle(summary.id)
+    else:
+        puzzle, first_page, cursor = get_puzzle_overview(summary.id)
+    if puzzle is None:
+        # Otra sesión lo borró: se olvida el listado para que deje de ofrecerse
+        reset_pages(PUZZLES_KEY)
+        reset_pages(key)
+        st.info("Este puzzle ya no existe (se borró en otra sesión). Selecciona otro.")
+        return
+    if not has_pages(key):
+        seed_pages(key, first_page, cursor, puzzle.revision)
 
-    # Función para obtener y mostrar piezas existentes
+    # Función para obtener y mostrar piezas existentes (por páginas)
     def refresh_existing():
-        pieces = list_pieces(puzzle.id)
+        sync_pages(key, lambda since: list_piece_changes(puzzle.id, since), lambda p: p.code)
+        shown = st.selectbox("Filtrar por sector", [ALL_SECTORS] + list(puzzle.sectors))
+        pending = pending_summaries(puzzle.id, session)
+        if shown == ALL_SECTORS:
+            pieces = paged_items(
+                key,
+                lambda cursor: list_piece_summaries(puzzle.id, cursor),
+                "Cargar más piezas"
+            )
+            pieces = merge_items(pieces, pending, lambda p: p.code, pages_cursor(key))
+        else:
+            pieces = list_sector_piece_summaries(puzzle.id, shown)
+            pieces = merge_items(pieces, [p for p in pending if p.sector == shown], lambda p: p.code)
         if pieces:
             st.subheader("📋 Piezas mapeadas")
-            for p in pieces:
-                st.write(f"- Código: **{p.code}**, Sector: **{p.sector}**")
+            st.markdown("\n".join(
+                f"- Código: **{p.code}**, Sector: **{p.sector}**" for p in pieces
+            ))
         else:
             st.info("Aún no has mapeado ninguna pieza para este puzzle.")
         return pieces
 
-    existing: list[Piece] = refresh_existing()
+    listing = st.container()
 
     st.markdown("---")
     st.subheader("📝 Mapear nueva pieza")
@@ -75,12 +127,10 @@ def run():
         # Submit button dentro del form
         submitted = st.form_submit_button("➕ Guardar Pieza")
 
-    # 3. Procesar envío y refetch
-    if submitted:
-        if not code:
-            st.error("❌ Debes indicar el código de la pieza.")
-            return
-
+    # 3. Procesar envío
+    if submitted and not code:
+        st.error("❌ Debes indicar el código de la pieza.")
+    elif submitted:
         # Construir edges y neighbors usando el edge_count actual
         edges = [
             {"edgeId": eid, "type": edge_types[eid]}
@@ -95,11 +145,30 @@ def run():
         ]
 
         try:
-            piece: Piece = add_piece(puzzle.id, code, sector, edges, neighbors)
+            piece: Piece = save_piece(puzzle.id, code, sector, edges, neighbors, session)
             st.success(f"✔️ Pieza **{piece.code}** guardada correctamente.")
         except Exception as e:
             st.error(f"Error al guardar la pieza: {e}")
 
-        # Refrescar lista y reiniciar la app
-        refresh_existing()
-        st.experimental_rerun()
+    # 4. Listado, ya con la pieza guardada
+    with listing:
+        existing: list[PieceSummary] = refresh_existing()
+
+    # 5. Consulta de una pieza, con lo guardado en esta sesión aunque aún no se haya escrito
+    with st.expander("🔎 Consultar pieza"):
+        lookup = st.text_input("Código de la pieza a consultar", key="lookup_code").strip()
+        if lookup:
+            render_piece(puzzle.id, lookup, session)
+
+def render_piece(puzzle_id: str, code: str, session: str) -> None:
+    """Muestra el sector de una pieza y sus conexiones en ambos sentidos."""
+    piece = get_piece(puzzle_id, code, session)
+    if piece is None:
+        st.info(f"La pieza **{code}** aún no está mapeada.")
+    else:
+        st.markdown(f"Pieza **{piece.code}**, sector **{piece.sector}**")
+    neighbors = get_piece_neighbors(puzzle_id, code, session)
+    for edge_id, to_code in neighbors.outgoing:
+        st.markdown(f"- Conexión {edge_id} → **{to_code}**")
+    for from_code, edge_id in neighbors.incoming:
+        st.markdown(f"- **{from_code}** (conexión {edge_id}) → esta pieza")
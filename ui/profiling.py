@@ -0,0 +1,58 @@
+# ui/profiling.py
+"""
+Panel de perfilado en la barra lateral.
+
+Muestra el desglose del último rerun (cada llamada instrumentada con
+`utils.metrics`, anidada bajo la que la originó: latencia y documentos) y
+los acumulados del proceso por función, con descarga en formato Prometheus.
+No importa servicios: se puede cargar al arrancar sin coste.
+"""
+
+import streamlit as st
+from utils.metrics import Trace, export_prometheus, snapshot
+
+def render_panel(trace: Trace) -> None:
+    with st.sidebar.expander("⏱️ Perfilado", expanded=True):
+        st.caption(
+            f"Último rerun: {len(trace.entries)} llamadas, "
+            f"{trace.total_seconds * 1000:.1f} ms en llamadas de primer nivel."
+        )
+        if trace.entries:
+            st.dataframe(
+                [
+                    {
+                        "llamada": "· " * e.depth + e.name,
+                        "capa": e.layer,
+                        "ms": round(e.seconds * 1000, 2),
+                        "docs": e.documents,
+                        "KB": round(e.bytes / 1024, 1) if e.bytes else None,
+                        "error": "⚠️" if e.failed else "",
+                    }
+                    for e in trace.entries
+                ],
+                use_container_width=True,
+            )
+
+        stats = sorted(snapshot().items(), key=lambda item: -item[1].seconds)
+        if stats:
+            st.caption("Acumulado del proceso (por tiempo total)")
+            st.dataframe(
+                [
+                    {
+                        "función": f"{layer}.{name}",
+                        "llamadas": s.calls,
+                        "media ms": round(s.seconds / s.calls * 1000, 2),
+                        "total ms": round(s.seconds * 1000, 1),
+                        "docs": s.documents,
+                        "errores": s.errors,
+                    }
+                    for (layer, name), s in stats[:20]
+                ],
+                use_container_width=True,
+            )
+        st.download_button(
+            "Descargar métricas (Prometheus)",
+            export_prometheus(),
+            file_name="metrics.prom",
+            mime="text/plain",
+        )
@@ -0,0 +1,90 @@
+# ui/snapshots.py
+"""
+Interfaz Streamlit para los snapshots binarios de puzzles.
+
+Permite exportar un puzzle completo a un archivo `.pzsnap`, importarlo como
+puzzle nuevo y ver las instrucciones de un snapshot sin tocar la base de
+datos (recorriendo directamente sus arreglos).
+"""
+
+import io
+from itertools import islice
+
+import streamlit as st
+from services.snapshot_service import (
+    SNAPSHOT_EXTENSION, export_snapshot, import_snapshot, iter_snapshot_instructions, load_snapshot
+)
+from models.puzzle import PuzzleSummary
+from ui.components import PUZZLES_KEY, reset_pages, select_puzzle
+
+# Pasos que se muestran al previsualizar un snapshot
+PREVIEW_STEPS = 50
+
+def run():
+    st.header("5️⃣ Snapshots de puzzles")
+    export_tab, import_tab, preview_tab = st.tabs(["Exportar", "Importar", "Ver instrucciones"])
+
+    with export_tab:
+        puzzle: PuzzleSummary = select_puzzle()
+        if puzzle is None:
+            st.info("No hay puzzles creados. Crea uno primero en la sección ‘Crear Puzzle’.")
+        elif st.button("📦 Generar snapshot"):
+            out = io.BytesIO()
+            try:
+                info = export_snapshot(puzzle.id, out)
+            except Exception as e:
+                st.error(f"Error al exportar el puzzle: {e}")
+            else:
+                st.success(
+                    f"✔️ Snapshot de {info.pieces} piezas (revisión {info.revision}, "
+                    f"{info.bytes / 1024:.1f} KB)."
+                )
+                st.download_button(
+                    "Descargar snapshot",
+                    out.getvalue(),
+                    file_name=f"{puzzle.name}{SNAPSHOT_EXTENSION}",
+                    mime="application/octet-stream",
+                )
+
+    with import_tab:
+        uploaded = st.file_uploader("Snapshot a importar", type=[SNAPSHOT_EXTENSION.lstrip(".")], key="snapshot_import")
+        name = st.text_input("Nombre del puzzle nuevo", help="Vacío: el nombre guardado en el snapshot")
+        if uploaded is not None and st.button("📥 Importar snapshot"):
+            try:
+                created, report = import_snapshot(uploaded.getvalue(), name.strip() or None)
+            except Exception as e:
+                st.error(f"Error al importar el snapshot: {e}")
+            else:
+                reset_pages(PUZZLES_KEY)
+                st.success(
+                    f"✔️ Puzzle **{created.name}** creado con {report.upserted} piezas "
+                    f"de {report.processed}."
+                )
+                if report.errors:
+                    st.warning(f"{len(report.errors)} piezas con errores:")
+                    st.dataframe([e.model_dump() for e in report.errors], use_container_width=True)
+
+    with preview_tab:
+        uploaded = st.file_uploader("Snapshot", type=[SNAPSHOT_EXTENSION.lstrip(".")], key="snapshot_preview")
+        if uploaded is None:
+            return
+        try:
+            snapshot = load_snapshot(uploaded.getvalue())
+        except Exception as e:
+            st.error(f"El archivo no es un snapshot válido: {e}")
+            return
+        graph = snapshot.graph
+        st.caption(
+            f"**{snapshot.meta.get('name')}**: {len(graph)} piezas, {graph.edge_count} conexiones "
+            f"(revisión {snapshot.meta.get('revision')}, exportado {snapshot.meta.get('exportedAt')})."
+        )
+        if not len(graph):
+            st.info("El snapshot no tiene piezas.")
+            return
+        start_code = st.text_input("Pieza base", value=graph.codes[0]).strip()
+        try:
+            steps = list(islice(iter_snapshot_instructions(snapshot, start_code), PREVIEW_STEPS))
+        except ValueError as e:
+            st.error(str(e))
+            return
+        st.markdown("\n".join(f"{i}. {inst}" for i, inst in enumerate(steps, start=1)))
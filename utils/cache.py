@@ -0,0 +1,125 @@
+# utils/cache.py
+"""
+Caché LRU en memoria, segura entre hilos.
+
+Streamlit atiende cada sesión en su propio hilo, por lo que todas las
+operaciones se protegen con un lock. La caché puede acotarse por número de
+entradas, por memoria estimada mediante una función `sizeof` y/o por número
+de elementos mediante una función `count` (p. ej. una lista de N modelos
+cuenta como N), y sus entradas pueden caducar tras `ttl` segundos.
+"""
+
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+
+class LRUCache:
+    """
+    Caché con desalojo LRU.
+    - max_entries: número máximo de entradas (None = sin límite)
+    - max_bytes: memoria máxima estimada (None = sin límite)
+    - sizeof: función que estima los bytes de un valor (por defecto sys.getsizeof)
+    - max_items: total máximo de elementos según `count` (None = sin límite)
+    - count: función que cuenta los elementos de un valor (por defecto 1)
+    - ttl: segundos de vida de cada entrada desde que se guarda (None = sin caducidad)
+    """
+
+    def __init__(
+        self,
+        max_entries: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        sizeof: Callable[[Any], int] = sys.getsizeof,
+        ttl: Optional[float] = None,
+        max_items: Optional[int] = None,
+        count: Callable[[Any], int] = lambda value: 1
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_items = max_items
+        self.ttl = ttl
+        self._sizeof = sizeof
+        self._count = count
+        # clave -> (valor, bytes, caducidad, elementos)
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._bytes = 0
+        self._items = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Devuelve el valor asociado a `key` y lo marca como usado recientemente."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            if entry[2] is not None and entry[2] <= time.monotonic():
+                self._discard(key)
+                return default
+            self._data.move_to_end(key)
+            return entry[0]
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """
+        Guarda un valor; si no cabe en `max_bytes` o `max_items` por sí solo,
+        no se guarda.
+        """
+        size = self._sizeof(value)
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+        items = self._count(value)
+        if self.max_items is not None and items > self.max_items:
+            return
+        expires = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            self._discard(key)
+            self._data[key] = (value, size, expires, items)
+            self._bytes += size
+            self._items += items
+            self._evict()
+
+    def invalidate(self, predicate: Callable[[Hashable], bool]) -> int:
+        """Elimina las entradas cuya clave cumple `predicate`. Devuelve cuántas borró."""
+        with self._lock:
+            doomed = [k for k in self._data if predicate(k)]
+            for k in doomed:
+                self._discard(k)
+            return len(doomed)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+            self._items = 0
+
+    @property
+    def nbytes(self) -> int:
+        return self._bytes
+
+    @property
+    def nitems(self) -> int:
+        return self._items
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._data
+
+    def _evict(self) -> None:
+        while self._data and (
+            (self.max_entries is not None and len(self._data) > self.max_entries)
+            or (self.max_bytes is not None and self._bytes > self.max_bytes)
+            or (self.max_items is not None and self._items > self.max_items)
+        ):
+            _, entry = self._data.popitem(last=False)
+            self._bytes -= entry[1]
+            self._items -= entry[3]
+
+    def _discard(self, key: Hashable) -> None:
+        # Se llama con el lock tomado
+        entry = self._data.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[1]
+            self._items -= entry[3]
@@ -0,0 +1,145 @@
+# utils/center.py
+"""
+Centro de cada isla del grafo de piezas: la pieza de excentricidad mínima
+(la que tiene más cerca a la pieza más lejana de su isla). Empezar el armado
+por ella da el plan menos profundo.
+
+Calcular la excentricidad de todas las piezas exige una BFS por pieza
+(O(n·m)). En su lugar se acotan por abajo con pocas BFS:
+
+1. Doble barrido: BFS desde una pieza cualquiera, luego desde la más lejana
+   (a) y desde la más lejana a esta (b). Para toda pieza v y toda pieza s
+   ya usada como origen, ecc(v) >= d(s, v).
+2. Se evalúa con una BFS la pieza de menor cota (a igualdad, la de menor
+   suma de distancias a las piezas ya usadas, es decir, la más céntrica).
+   Sus distancias a las demás también son cotas inferiores.
+3. Otra BFS desde la pieza más lejana a la evaluada (un nuevo extremo del
+   grafo, como a y b) sube las cotas del resto: es la que descarta más
+   candidatas, p. ej. las esquinas que el doble barrido no distingue.
+4. Se repite desde 2 hasta que ninguna pieza sin evaluar tenga una cota menor que la
+   mejor excentricidad encontrada (el centro es exacto) o hasta agotar
+   `max_sweeps` BFS por isla (el resultado es una aproximación).
+
+En árboles y cuadrículas el doble barrido suele bastar. Cada BFS cuesta
+O(piezas + conexiones) de la isla.
+"""
+
+from array import array
+from typing import List, NamedTuple
+
+from utils.graph import PuzzleGraph
+
+# Número máximo de BFS por isla (incluidas las tres del doble barrido)
+MAX_SWEEPS = 8
+
+# Puntuación de las piezas ya evaluadas (nunca vuelven a ser candidatas)
+_EVALUATED = 1 << 62
+
+
+class IslandCenter(NamedTuple):
+    """Centro de una isla: pieza (id entero), su excentricidad y si es exacta."""
+    island: int
+    size: int
+    center: int
+    eccentricity: int
+    exact: bool
+
+
+def island_centers(graph: PuzzleGraph, max_sweeps: int = MAX_SWEEPS) -> List[IslandCenter]:
+    """
+    Centro de cada isla del grafo, de la isla más grande a la más pequeña.
+    Las islas se numeran como en `connected_components` (por su primera
+    pieza), pero se descubren con la propia BFS inicial de cada una.
+    """
+    n = len(graph)
+    # Arreglos compartidos por todas las islas; cada BFS solo toca la suya
+    dist = array("i", [-1]) * n
+    bound = array("i", [0]) * n
+    score = array("q", [0]) * n
+    seen = bytearray(n)
+    centers = []
+    for seed in range(n):
+        if not seen[seed]:
+            centers.append(_island_center(
+                graph, len(centers), seed, dist, bound, score, seen, max(3, max_sweeps)
+            ))
+    centers.sort(key=lambda c: (-c.size, c.island))
+    return centers
+
+
+def _island_center(
+    graph: PuzzleGraph, island: int, seed: int, dist: array, bound: array,
+    score: array, seen: bytearray, max_sweeps: int
+) -> IslandCenter:
+    members = _bfs(graph, seed, dist)
+    a = members[-1]
+    # score = cota * scale + suma de distancias: ordena por cota y desempata
+    # por centralidad con una sola comparación de enteros
+    scale = max_sweeps * len(members) + 1
+    for v in members:
+        seen[v] = 1
+        d = bound[v] = dist[v]
+        score[v] = d * scale + d
+        dist[v] = -1
+    if len(members) <= 2:
+        return IslandCenter(island, len(members), seed, len(members) - 1, True)
+
+    # Doble barrido: cotas desde los extremos a y b
+    b = _bfs(graph, a, dist)[-1]
+    _tighten(members, dist, bound, score, scale)
+    _bfs(graph, b, dist)
+    _tighten(members, dist, bound, score, scale)
+
+    best, best_ecc = -1, len(members)
+    evaluated: List[int] = []
+    sweeps = 3
+    while True:
+        candidate = min(members, key=score.__getitem__)
+        if score[candidate] >= _EVALUATED or bound[candidate] >= best_ecc:
+            exact = True  # ninguna pieza sin evaluar puede mejorar la mejor
+            break
+        if sweeps >= max_sweeps:
+            exact = False
+            break
+        order = _bfs(graph, candidate, dist)
+        eccentricity = dist[order[-1]]
+        if eccentricity < best_ecc:
+            best, best_ecc = candidate, eccentricity
+        evaluated.append(candidate)
+        _tighten(members, dist, bound, score, scale)
+        sweeps += 1
+        if sweeps < max_sweeps:
+            # Nuevo extremo: la pieza más lejana a la candidata
+            _bfs(graph, order[-1], dist)
+            _tighten(members, dist, bound, score, scale)
+            sweeps += 1
+        for v in evaluated:
+            score[v] = _EVALUATED
+    return IslandCenter(island, len(members), best, best_ecc, exact)
+
+
+def _bfs(graph: PuzzleGraph, source: int, dist: array) -> List[int]:
+    """BFS desde `source`: rellena `dist` y devuelve las piezas en orden de visita."""
+    offsets, targets = graph.offsets, graph.targets
+    dist[source] = 0
+    order = [source]
+    for u in order:
+        d = dist[u] + 1
+        for v in targets[offsets[u]:offsets[u + 1]]:
+            if dist[v] < 0:
+                dist[v] = d
+                order.append(v)
+    return order
+
+
+def _tighten(members: List[int], dist: array, bound: array, score: array, scale: int) -> None:
+    """Sube cotas y puntuaciones con las distancias de la última BFS y deja `dist` a -1."""
+    for v in members:
+        d = dist[v]
+        b = bound[v]
+        if d > b:
+            bound[v] = d
+            score[v] += d + (d - b) * scale
+        else:
+            score[v] += d
+        dist[v] = -1
@@ -0,0 +1,331 @@
+# utils/graph.py
+"""
+Representación compacta del grafo de vecinos de un puzzle.
+
+`PuzzleGraph` asigna a cada código de pieza un identificador entero denso
+y guarda las conexiones en formato CSR (compressed sparse row) con arreglos
+de `array`: offsets, vecinos, edgeIds y tipos de conexión. Así una arista
+ocupa unos pocos bytes en lugar de un modelo Pydantic anidado, y los
+recorridos trabajan solo con enteros.
+
+Una conexión basta con que la declare una de las dos piezas: al construir el
+grafo se añade el enlace inverso si la otra pieza no lo declaró. Los enlaces
+inversos llevan el edgeId en negativo (-k = "Conexión k de la pieza vecina"),
+porque no se sabe qué conexión de la pieza propia participa.
+"""
+
+from array import array
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Codificación de Edge.type en el arreglo `edge_types`
+EDGE_TYPES = {"hembra": 0, "macho": 1}
+EDGE_TYPE_NAMES = {v: k for k, v in EDGE_TYPES.items()}
+UNKNOWN_EDGE_TYPE = -1
+
+# Proyección con los únicos campos que lee `PuzzleGraph.from_documents`
+GRAPH_FIELDS = {"_id": 0, "code": 1, "sector": 1, "edges": 1, "neighbors": 1}
+
+
+class PuzzleGraph:
+    """
+    Grafo de piezas indexado por enteros.
+    - codes[i] / sector_names[sectors[i]]: código y sector de la pieza i
+    - offsets[i]..offsets[i+1]: rango de las conexiones de la pieza i en
+      `targets` (id del vecino), `edge_ids` y `edge_types`
+    Solo se guardan conexiones hacia piezas mapeadas. Un edgeId negativo -k
+    indica un enlace inverso: la conexión k es la de la pieza vecina.
+    """
+
+    __slots__ = (
+        "codes", "index", "sector_names", "sectors",
+        "offsets", "targets", "edge_ids", "edge_types",
+    )
+
+    def __init__(
+        self,
+        codes: List[str],
+        sector_names: List[str],
+        sectors: array,
+        offsets: array,
+        targets: array,
+        edge_ids: array,
+        edge_types: array,
+        index: Optional[Dict[str, int]] = None
+    ):
+        self.codes = codes
+        self.index: Dict[str, int] = index if index is not None else {
+            code: i for i, code in enumerate(codes)
+        }
+        self.sector_names = sector_names
+        self.sectors = sectors
+        self.offsets = offsets
+        self.targets = targets
+        self.edge_ids = edge_ids
+        self.edge_types = edge_types
+
+    # ─── C O N S T R U C C I Ó N ──────────────────────────────────────────────
+
+    @classmethod
+    def from_pieces(cls, pieces: Iterable[Any], symmetric: bool = True) -> "PuzzleGraph":
+        """
+        Construye el grafo a partir de piezas (Piece o los PieceRecord de list_pieces).
+        Con `symmetric`, las conexiones declaradas por un solo lado se
+        recorren en ambos sentidos.
+        """
+        builder = _GraphBuilder()
+        for p in pieces:
+            builder.add(
+                p.code,
+                p.sector,
+                {e.edgeId: e.type for e in p.edges},
+                [(nb.edgeId, nb.neighborCode) for nb in p.neighbors],
+            )
+        return builder.build(symmetric)
+
+    @classmethod
+    def from_documents(cls, docs: Iterable[Dict[str, Any]], symmetric: bool = True) -> "PuzzleGraph":
+        """
+        Construye el grafo directamente desde documentos crudos de MongoDB
+        (camino rápido: sin modelos intermedios). Acepta un cursor, de modo
+        que los documentos se descartan a medida que se consumen.
+        """
+        builder = _GraphBuilder()
+        for d in docs:
+            builder.add(
+                d["code"],
+                d.get("sector", ""),
+                {e["edgeId"]: e.get("type") for e in d.get("edges") or ()},
+                [(nb["edgeId"], nb.get("neighborCode")) for nb in d.get("neighbors") or ()],
+            )
+        return builder.build(symmetric)
+
+    # ─── C O N S U L T A S ────────────────────────────────────────────────────
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    @property
+    def edge_count(self) -> int:
+        return len(self.targets)
+
+    def id_of(self, code: str) -> Optional[int]:
+        """Id entero de una pieza por su código, o None si no está mapeada."""
+        return self.index.get(code)
+
+    def sector_of(self, i: int) -> str:
+        return self.sector_names[self.sectors[i]]
+
+    def neighbors(self, i: int) -> Iterator[Tuple[int, int]]:
+        """Itera (edgeId, id del vecino) de la pieza i."""
+        for k in range(self.offsets[i], self.offsets[i + 1]):
+            yield self.edge_ids[k], self.targets[k]
+
+    def subgraph(self, members: List[int]) -> "PuzzleGraph":
+        """
+        Grafo inducido por las piezas `members` (ids de este grafo): la pieza
+        members[j] pasa a tener id j y solo se conservan las conexiones entre
+        miembros. Comparte la tabla de nombres de sector.
+        """
+        local = {u: j for j, u in enumerate(members)}
+        offsets = array("q", [0])
+        targets = array("i")
+        edge_ids = array("h")
+        edge_types = array("b")
+        for u in members:
+            for k in range(self.offsets[u], self.offsets[u + 1]):
+                j = local.get(self.targets[k])
+                if j is not None:
+                    targets.append(j)
+                    edge_ids.append(self.edge_ids[k])
+                    edge_types.append(self.edge_types[k])
+            offsets.append(len(targets))
+        return PuzzleGraph(
+            [self.codes[u] for u in members],
+            self.sector_names,
+            array("H", (self.sectors[u] for u in members)),
+            offsets, targets, edge_ids, edge_types,
+        )
+
+    def nbytes(self) -> int:
+        """Bytes ocupados por los arreglos numéricos (sin la tabla de códigos)."""
+        return sum(
+            a.itemsize * len(a)
+            for a in (self.sectors, self.offsets, self.targets, self.edge_ids, self.edge_types)
+        )
+
+    def to_numpy(self) -> Dict[str, Any]:
+        """
+        Devuelve vistas NumPy (sin copia) de los arreglos CSR.
+        Requiere NumPy, que es una dependencia opcional.
+        """
+        try:
+            import numpy as np
+        except ImportError as exc:
+            raise ImportError("PuzzleGraph.to_numpy() requiere NumPy instalado.") from exc
+        return {
+            "sectors":    np.frombuffer(self.sectors, dtype=np.uint16),
+            "offsets":    np.frombuffer(self.offsets, dtype=np.int64),
+            "targets":    np.frombuffer(self.targets, dtype=np.int32),
+            "edge_ids":   np.frombuffer(self.edge_ids, dtype=np.int16),
+            "edge_types": np.frombuffer(self.edge_types, dtype=np.int8),
+        }
+
+
+def connected_components(graph: PuzzleGraph) -> Tuple[array, int]:
+    """
+    Detecta las islas (componentes conexas) del grafo con union-find
+    (compresión de caminos y unión por tamaño), en tiempo casi lineal.
+    Devuelve (labels, count): labels[i] es el número de isla de la pieza i,
+    numeradas desde 0 en orden de aparición de su primera pieza.
+    """
+    n = len(graph)
+    parent = array("i", range(n))
+    size = array("i", [1]) * n
+
+    def find(x: int) -> int:
+        root = x
+        while parent[root] != root:
+            root = parent[root]
+        while parent[x] != root:
+            parent[x], x = root, parent[x]
+        return root
+
+    offsets, targets = graph.offsets, graph.targets
+    for u in range(n):
+        for k in range(offsets[u], offsets[u + 1]):
+            a, b = find(u), find(targets[k])
+            if a == b:
+                continue
+            if size[a] < size[b]:
+                a, b = b, a
+            parent[b] = a
+            size[a] += size[b]
+
+    labels = array("i", [-1]) * n
+    root_label = array("i", [-1]) * n
+    count = 0
+    for u in range(n):
+        r = find(u)
+        if root_label[r] < 0:
+            root_label[r] = count
+            count += 1
+        labels[u] = root_label[r]
+    return labels, count
+
+
+class _GraphBuilder:
+    """
+    Construcción en dos pasadas: primero se asignan ids y se acumulan las
+    conexiones pendientes; al final se resuelven los códigos vecinos a ids
+    (los que no estén mapeados se descartan) y se compacta todo en CSR.
+    """
+
+    def __init__(self):
+        self.codes: List[str] = []
+        self.seen: Dict[str, int] = {}
+        self.sector_names: List[str] = []
+        self.sector_ids: Dict[str, int] = {}
+        self.sectors = array("H")
+        self.row_sizes = array("q")
+        self.pending_codes: List[str] = []
+        self.pending_edges = array("h")
+        self.pending_types = array("b")
+
+    def add(
+        self,
+        code: str,
+        sector: str,
+        types: Dict[int, Optional[str]],
+        neighbors: List[Tuple[int, Optional[str]]]
+    ) -> None:
+        if code in self.seen:
+            return
+        self.seen[code] = len(self.codes)
+        self.codes.append(code)
+
+        sid = self.sector_ids.get(sector)
+        if sid is None:
+            sid = self.sector_ids[sector] = len(self.sector_names)
+            self.sector_names.append(sector)
+        self.sectors.append(sid)
+
+        size = 0
+        for eid, neighbor_code in neighbors:
+            if not neighbor_code:
+                continue
+            self.pending_codes.append(neighbor_code)
+            self.pending_edges.append(eid)
+            self.pending_types.append(EDGE_TYPES.get(types.get(eid), UNKNOWN_EDGE_TYPE))
+            size += 1
+        self.row_sizes.append(size)
+
+    def build(self, symmetric: bool = True) -> PuzzleGraph:
+        seen = self.seen
+        pending_codes = self.pending_codes
+        pending_edges = self.pending_edges
+        pending_types = self.pending_types
+
+        offsets = array("q", [0])
+        targets = array("i")
+        edge_ids = array("h")
+        edge_types = array("b")
+        start = 0
+        for size in self.row_sizes:
+            end = start + size
+            for k in range(start, end):
+                j = seen.get(pending_codes[k])
+                if j is not None:
+                    targets.append(j)
+                    edge_ids.append(pending_edges[k])
+                    edge_types.append(pending_types[k])
+            start = end
+            offsets.append(len(targets))
+
+        if symmetric:
+            offsets, targets, edge_ids, edge_types = _add_reverse_links(
+                offsets, targets, edge_ids, edge_types
+            )
+
+        return PuzzleGraph(
+            self.codes, self.sector_names, self.sectors,
+            offsets, targets, edge_ids, edge_types, index=seen
+        )
+
+
+def _add_reverse_links(
+    offsets: array, targets: array, edge_ids: array, edge_types: array
+) -> Tuple[array, array, array, array]:
+    """
+    Añade v→u (edgeId -k) por cada u→v (edgeId k) que v no declare.
+    Los enlaces inversos van después de los propios de cada pieza.
+    """
+    n = len(offsets) - 1
+    extra: Dict[int, List[Tuple[int, int, int]]] = {}
+    for u in range(n):
+        for i in range(offsets[u], offsets[u + 1]):
+            v = targets[i]
+            declared = False
+            for j in range(offsets[v], offsets[v + 1]):
+                if targets[j] == u:
+                    declared = True
+                    break
+            if not declared:
+                extra.setdefault(v, []).append((u, -edge_ids[i], edge_types[i]))
+    if not extra:
+        return offsets, targets, edge_ids, edge_types
+
+    new_offsets = array("q", [0])
+    new_targets = array("i")
+    new_edge_ids = array("h")
+    new_edge_types = array("b")
+    for u in range(n):
+        lo, hi = offsets[u], offsets[u + 1]
+        new_targets.extend(targets[lo:hi])
+        new_edge_ids.extend(edge_ids[lo:hi])
+        new_edge_types.extend(edge_types[lo:hi])
+        for v, eid, etype in extra.get(u, ()):
+            new_targets.append(v)
+            new_edge_ids.append(eid)
+            new_edge_types.append(etype)
+        new_offsets.append(len(new_targets))
+    return new_offsets, new_targets, new_edge_ids, new_edge_types
@@ -3,7 +3,9 @@
 Configuración del sistema de logging.
 
 Permite obtener loggers personalizados con formato estandarizado
-usando el nivel definido en las variables de entorno.
+usando el nivel definido en las variables de entorno. La configuración se
+aplica una sola vez (`setup_logging`), al importar este módulo; app.py no
+configura logging por su cuenta.
 """
 
 import logging
@@ -12,12 +14,25 @@ from configs.config import LOG_LEVEL
 # Convertir nivel de logging de texto a constante de logging
 _level = getattr(logging, LOG_LEVEL.upper(), logging.INFO)
 
+_configured = False
+
+def setup_logging() -> None:
+    """
+    Configura el logging raíz (nivel y formato). Es idempotente: Streamlit
+    re-ejecuta app.py en cada interacción y no debe duplicar handlers.
+    """
+    global _configured
+    if _configured:
+        return
+    logging.basicConfig(
+        level=_level,
+        format="%(asctime)s %(levelname)s [%(name)s]: %(message)s",
+        datefmt="%Y-%m-%d %H:%M:%S"
+    )
+    _configured = True
+
 # Configuración básica – se puede importar desde cualquier módulo
-logging.basicConfig(
-    level=_level,
-    format="%(asctime)s %(levelname)s [%(name)s]: %(message)s",
-    datefmt="%Y-%m-%d %H:%M:%S"
-)
+setup_logging()
 
 def get_logger(name: str) -> logging.Logger:
     """
@@ -0,0 +1,372 @@
+# utils/metrics.py
+"""
+Instrumentación de las rutas calientes.
+
+`timed` (decorador) y `timer` (gestor de contexto) miden cada llamada a
+repositorios, servicios y generación de instrucciones, y acumulan por
+(capa, nombre): histograma de latencia, llamadas, errores, documentos
+devueltos y, opcionalmente, bytes (tamaño BSON de los documentos; desactivado
+por defecto porque serializar cada resultado cuesta casi tanto como leerlo).
+
+Además de los acumulados globales, `trace()` recoge las llamadas de un
+bloque concreto (p. ej. un rerun de Streamlit) para ver su desglose. La
+traza viaja en una ContextVar, así que incluye las llamadas anidadas y las
+consultas asíncronas lanzadas desde ese hilo (ver `database.async_client`).
+
+Las llamadas que superan METRICS_SLOW_CALL_MS se registran en el log.
+Los acumulados se exportan en formato de texto de Prometheus con
+`export_prometheus()` o, si se configura METRICS_PORT, en `/metrics` por HTTP.
+"""
+
+import contextvars
+import functools
+import inspect
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from configs.config import METRICS_ENABLED, METRICS_SLOW_CALL_MS, METRICS_TRACK_BYTES
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Límites superiores (segundos) de los buckets del histograma de latencia
+BUCKETS: Tuple[float, ...] = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+
+
+@dataclass
+class CallStats:
+    """Acumulados de una función instrumentada."""
+    calls: int = 0
+    errors: int = 0
+    seconds: float = 0.0
+    documents: int = 0
+    bytes: int = 0
+    buckets: List[int] = field(default_factory=lambda: [0] * len(BUCKETS))
+
+    def observe(self, seconds: float, documents: int, size: int, failed: bool) -> None:
+        self.calls += 1
+        self.errors += failed
+        self.seconds += seconds
+        self.documents += documents
+        self.bytes += size
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                self.buckets[i] += 1
+                break
+
+
+@dataclass
+class TraceEntry:
+    """Una llamada dentro de una traza; `depth` indica el anidamiento."""
+    layer: str
+    name: str
+    depth: int
+    seconds: float = 0.0
+    documents: int = 0
+    bytes: int = 0
+    failed: bool = False
+
+
+class Trace:
+    """Llamadas registradas durante un bloque `trace()`, en orden de inicio."""
+
+    def __init__(self):
+        self.entries: List[TraceEntry] = []
+        self._lock = threading.Lock()
+
+    def _add(self, entry: TraceEntry) -> None:
+        with self._lock:
+            self.entries.append(entry)
+
+    @property
+    def total_seconds(self) -> float:
+        return sum(e.seconds for e in self.entries if e.depth == 0)
+
+
+_stats: Dict[Tuple[str, str], CallStats] = {}
+_stats_lock = threading.Lock()
+_current_trace: contextvars.ContextVar[Optional[Trace]] = contextvars.ContextVar(
+    "metrics_trace", default=None
+)
+_depth: contextvars.ContextVar[int] = contextvars.ContextVar("metrics_depth", default=0)
+
+# ─── M E D I C I Ó N ──────────────────────────────────────────────────────────
+
+def _documents(result: Any) -> int:
+    if result is None or isinstance(result, (bool, int, float, str)):
+        return 0
+    if isinstance(result, list):
+        return len(result)
+    if isinstance(result, tuple):
+        # Resultados compuestos (p. ej. página y cursor): las listas que contienen
+        return sum(len(v) for v in result if isinstance(v, list))
+    return 1
+
+
+def _bytes(result: Any) -> int:
+    if not METRICS_TRACK_BYTES:
+        return 0
+    from bson import encode
+    if isinstance(result, dict):
+        return len(encode(result))
+    if isinstance(result, list):
+        return sum(len(encode(d)) for d in result if isinstance(d, dict))
+    return 0
+
+
+def _record(
+    layer: str, name: str, entry: Optional[TraceEntry],
+    seconds: float, documents: int, size: int, failed: bool
+) -> None:
+    with _stats_lock:
+        stats = _stats.get((layer, name))
+        if stats is None:
+            stats = _stats[(layer, name)] = CallStats()
+        stats.observe(seconds, documents, size, failed)
+    if METRICS_SLOW_CALL_MS and seconds * 1000 >= METRICS_SLOW_CALL_MS:
+        logger.warning(
+            "Llamada lenta %s.%s: %.1f ms, %d documentos", layer, name, seconds * 1000, documents
+        )
+    if entry is not None:
+        entry.seconds, entry.documents, entry.bytes, entry.failed = seconds, documents, size, failed
+
+
+class _Call:
+    """Medición de una llamada en curso: anidamiento y entrada de la traza."""
+
+    __slots__ = ("layer", "name", "entry", "token", "start")
+
+    def __init__(self, layer: str, name: str):
+        self.layer, self.name = layer, name
+        depth = _depth.get()
+        trace = _current_trace.get()
+        self.entry = TraceEntry(layer, name, depth) if trace is not None else None
+        if trace is not None:
+            trace._add(self.entry)
+        self.token = _depth.set(depth + 1)
+        self.start = time.perf_counter()
+
+    def finish(self, result: Any = None, failed: bool = False) -> None:
+        seconds = time.perf_counter() - self.start
+        _depth.reset(self.token)
+        documents = 0 if failed else _documents(result)
+        size = 0 if failed else _bytes(result)
+        _record(self.layer, self.name, self.entry, seconds, documents, size, failed)
+
+
+def timed(layer: str, name: Optional[str] = None) -> Callable[[Callable], Callable]:
+    """
+    Decorador que mide cada llamada a la función (síncrona o corrutina).
+    Los documentos se cuentan según el resultado: longitud de una lista (o
+    de las listas de una tupla), 1 para un documento o modelo, 0 para None y
+    escalares. Si la función
+    devuelve un iterador, se cuentan los documentos a medida que se consumen.
+    """
+    def decorate(fn: Callable) -> Callable:
+        if not METRICS_ENABLED:
+            return fn
+        metric = name or fn.__name__
+
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                call = _Call(layer, metric)
+                try:
+                    result = await fn(*args, **kwargs)
+                except BaseException:
+                    call.finish(failed=True)
+                    raise
+                call.finish(result)
+                return result
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            call = _Call(layer, metric)
+            try:
+                result = fn(*args, **kwargs)
+            except BaseException:
+                call.finish(failed=True)
+                raise
+            if isinstance(result, Iterator):
+                return _CountingIterator(result, call)
+            call.finish(result)
+            return result
+        return wrapper
+    return decorate
+
+
+class _CountingIterator:
+    """
+    Cuenta documentos y bytes de un iterador (p. ej. un cursor). El tiempo
+    registrado es el de abrirlo más el pasado dentro de `next()` (traer y
+    decodificar lotes), no el de quien consume. Se registra una sola vez: al
+    agotarlo, al cerrarlo con `close()` o, si quien consume lo abandona a
+    medias (p. ej. con `islice`), cuando el recolector de basura lo libera.
+    """
+
+    def __init__(self, iterator: Iterator[Any], call: _Call):
+        self._iterator = iterator
+        self._call = call
+        self._count = 0
+        self._bytes = 0
+        self._seconds = time.perf_counter() - call.start
+        _depth.reset(call.token)
+
+    def __iter__(self) -> "_CountingIterator":
+        return self
+
+    def __next__(self) -> Any:
+        start = time.perf_counter()
+        try:
+            item = next(self._iterator)
+        except StopIteration:
+            self._finish(time.perf_counter() - start, False)
+            raise
+        except BaseException:
+            self._finish(time.perf_counter() - start, True)
+            raise
+        self._seconds += time.perf_counter() - start
+        self._count += 1
+        if METRICS_TRACK_BYTES:
+            self._bytes += _bytes(item)
+        return item
+
+    def close(self) -> None:
+        """Cierra el iterador envuelto (generador o cursor) y registra lo consumido."""
+        start = time.perf_counter()
+        close = getattr(self._iterator, "close", None)
+        try:
+            if close is not None:
+                close()
+        finally:
+            self._finish(time.perf_counter() - start, False)
+
+    def __del__(self) -> None:
+        if getattr(self, "_call", None) is not None:
+            self._finish(0.0, False)
+
+    def _finish(self, extra: float, failed: bool) -> None:
+        if self._call is not None:
+            call, self._call = self._call, None
+            seconds = self._seconds + extra
+            _record(call.layer, call.name, call.entry, seconds, self._count, self._bytes, failed)
+
+
+@contextmanager
+def timer(layer: str, name: str) -> Iterator[None]:
+    """Mide un bloque de código como si fuera una llamada instrumentada."""
+    if not METRICS_ENABLED:
+        yield
+        return
+    call = _Call(layer, name)
+    try:
+        yield
+    except BaseException:
+        call.finish(failed=True)
+        raise
+    call.finish()
+
+
+@contextmanager
+def trace() -> Iterator[Trace]:
+    """Recoge en una `Trace` las llamadas instrumentadas del bloque."""
+    current = Trace()
+    token = _current_trace.set(current)
+    try:
+        yield current
+    finally:
+        _current_trace.reset(token)
+
+# ─── E X P O R T A C I Ó N ────────────────────────────────────────────────────
+
+def snapshot() -> Dict[Tuple[str, str], CallStats]:
+    """Copia de los acumulados por (capa, nombre)."""
+    with _stats_lock:
+        return {
+            key: CallStats(s.calls, s.errors, s.seconds, s.documents, s.bytes, list(s.buckets))
+            for key, s in _stats.items()
+        }
+
+
+def reset() -> None:
+    """Descarta los acumulados."""
+    with _stats_lock:
+        _stats.clear()
+
+
+def export_prometheus(prefix: str = "puzzle") -> str:
+    """Acumulados en el formato de texto de exposición de Prometheus."""
+    stats = sorted(snapshot().items())
+    lines = [
+        f"# HELP {prefix}_call_duration_seconds Latencia de las llamadas instrumentadas.",
+        f"# TYPE {prefix}_call_duration_seconds histogram",
+    ]
+    for (layer, name), s in stats:
+        labels = f'layer="{_escape(layer)}",name="{_escape(name)}"'
+        cumulative = 0
+        for bound, count in zip(BUCKETS, s.buckets):
+            cumulative += count
+            lines.append(f'{prefix}_call_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f'{prefix}_call_duration_seconds_bucket{{{labels},le="+Inf"}} {s.calls}')
+        lines.append(f"{prefix}_call_duration_seconds_sum{{{labels}}} {s.seconds:.6f}")
+        lines.append(f"{prefix}_call_duration_seconds_count{{{labels}}} {s.calls}")
+    for metric, help_text, attr in (
+        ("call_errors_total", "Llamadas que terminaron con excepción.", "errors"),
+        ("call_documents_total", "Documentos devueltos por las llamadas.", "documents"),
+        ("call_bytes_total", "Bytes (BSON) devueltos por las llamadas.", "bytes"),
+    ):
+        lines.append(f"# HELP {prefix}_{metric} {help_text}")
+        lines.append(f"# TYPE {prefix}_{metric} counter")
+        for (layer, name), s in stats:
+            labels = f'layer="{_escape(layer)}",name="{_escape(name)}"'
+            lines.append(f"{prefix}_{metric}{{{labels}}} {getattr(s, attr)}")
+    return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+_server: Optional[ThreadingHTTPServer] = None
+_server_lock = threading.Lock()
+
+
+def start_http_server(port: int, host: str = "0.0.0.0") -> None:
+    """
+    Sirve `export_prometheus()` en http://host:port/metrics desde un hilo de
+    fondo. Solo se arranca una vez por proceso (Streamlit re-ejecuta app.py).
+    """
+    global _server
+    with _server_lock:
+        if _server is not None:
+            return
+        try:
+            _server = ThreadingHTTPServer((host, port), _MetricsHandler)
+        except OSError as e:
+            logger.warning("No se pudo abrir el puerto de métricas %s: %s", port, e)
+            return
+        threading.Thread(target=_server.serve_forever, name="metrics-http", daemon=True).start()
+        logger.info("Métricas de Prometheus en http://%s:%s/metrics", host, port)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.rstrip("/") != "/metrics":
+            self.send_error(404)
+            return
+        body = export_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug("metrics-http: " + format, *args)
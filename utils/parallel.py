@@ -0,0 +1,146 @@
+# utils/parallel.py
+"""
+Cálculo de recorridos en paralelo sobre varios procesos.
+
+Los procesos salen de un único ProcessPoolExecutor del proceso, creado la
+primera vez que compensa usarlo y reutilizado después, para no pagar el
+arranque de procesos en cada plan. Se crean con "spawn", no con "fork": la
+aplicación tiene hilos vivos (Streamlit, el pool de MongoDB, el guardado
+diferido) y un fork copiaría sus locks en el estado en que estuvieran.
+
+Cada tarea lleva un grafo y las raíces a recorrer en él, y devuelve las
+aristas de cada árbol empaquetadas en un `array`. Las raíces de un mismo
+grafo se reparten en un bloque por proceso, así que el grafo se serializa
+una vez por proceso y no una por raíz. Este módulo no depende de la base de
+datos, para que los procesos hijos arranquen sin abrir conexiones.
+"""
+
+import multiprocessing
+import os
+import threading
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Optional, Sequence, Tuple
+from utils.graph import PuzzleGraph
+from utils.logger import get_logger
+from utils.traversal import iter_traverse
+
+logger = get_logger(__name__)
+
+# Por debajo de estos umbrales el coste de enviar el grafo no compensa
+PARALLEL_MIN_ROOTS = 4
+PARALLEL_MIN_PIECES = 20_000
+
+# Procesos del pool
+PARALLEL_WORKERS = os.cpu_count() or 1
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    """Pool único del proceso (con `spawn`), creado en la primera llamada."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=PARALLEL_WORKERS,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return _pool
+
+
+def _discard_pool(pool: ProcessPoolExecutor) -> None:
+    """Olvida un pool roto (murió un proceso) para que la próxima llamada cree otro."""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False)
+
+
+def _run_tasks(
+    tasks: Sequence[Tuple[PuzzleGraph, Sequence[int]]], strategy: str
+) -> List[List[List[Tuple[int, int, int]]]]:
+    """
+    Recorre cada (grafo, raíces) en el pool; si el pool se rompe, calcula en
+    el proceso actual.
+    """
+    pool = _get_pool()
+    try:
+        packed = pool.map(
+            _traverse_subgraph_packed,
+            [graph for graph, _ in tasks],
+            [list(roots) for _, roots in tasks],
+            [strategy] * len(tasks),
+        )
+        return [[_unpack(p) for p in trees] for trees in packed]
+    except BrokenProcessPool:
+        logger.warning("El pool de recorridos se rompió; se calcula en el proceso actual", exc_info=True)
+        _discard_pool(pool)
+        return [
+            [list(iter_traverse(graph, root, strategy)) for root in roots]
+            for graph, roots in tasks
+        ]
+
+
+def traverse_roots(
+    graph: PuzzleGraph,
+    roots: Sequence[int],
+    strategy: str = "dfs"
+) -> List[List[Tuple[int, int, int]]]:
+    """
+    Recorre el grafo desde cada raíz y devuelve, por raíz, la lista de aristas
+    (padre, hijo, edgeId) de su árbol de recorrido. Las raíces deben estar en
+    islas distintas. Usa el pool de procesos cuando hay suficientes raíces y
+    piezas como para que compense; si no, calcula en el proceso actual.
+    """
+    if len(roots) < PARALLEL_MIN_ROOTS or len(graph) < PARALLEL_MIN_PIECES:
+        return [list(iter_traverse(graph, root, strategy)) for root in roots]
+
+    workers = min(len(roots), PARALLEL_WORKERS)
+    chunks = [roots[i::workers] for i in range(workers)]
+    trees = _run_tasks([(graph, chunk) for chunk in chunks], strategy)
+    # Deshace el reparto intercalado para devolver los árboles en orden de raíz
+    result: List[List[Tuple[int, int, int]]] = [[] for _ in roots]
+    for i, chunk_trees in enumerate(trees):
+        result[i::workers] = chunk_trees
+    return result
+
+
+def _unpack(packed: array) -> List[Tuple[int, int, int]]:
+    return [
+        (packed[i], packed[i + 1], packed[i + 2])
+        for i in range(0, len(packed), 3)
+    ]
+
+
+def traverse_subgraphs(
+    tasks: Sequence[Tuple[PuzzleGraph, Sequence[int]]],
+    strategy: str = "dfs"
+) -> List[List[List[Tuple[int, int, int]]]]:
+    """
+    Recorre varios grafos independientes (p. ej. las regiones de un plan en
+    equipo): por cada (grafo, raíces) devuelve, por raíz, las aristas de su
+    árbol de recorrido con ids locales de ese grafo. Cada grafo viaja a un
+    proceso distinto cuando hay suficientes piezas como para que compense.
+    """
+    pieces = sum(len(graph) for graph, _ in tasks)
+    if len(tasks) < 2 or pieces < PARALLEL_MIN_PIECES:
+        return [
+            [list(iter_traverse(graph, root, strategy)) for root in roots]
+            for graph, roots in tasks
+        ]
+    return _run_tasks(tasks, strategy)
+
+
+def _traverse_subgraph_packed(graph: PuzzleGraph, roots: List[int], strategy: str) -> List[array]:
+    # (padre, hijo, edgeId) aplanados: mucho más barato de serializar que tuplas
+    trees = []
+    for root in roots:
+        packed = array("q")
+        for edge in iter_traverse(graph, root, strategy):
+            packed.extend(edge)
+        trees.append(packed)
+    return trees
@@ -0,0 +1,225 @@
+# utils/partition.py
+"""
+Partición del grafo de un puzzle en regiones de trabajo para armar en equipo.
+
+`partition_regions` reparte las piezas en k regiones conexas y equilibradas
+por número de piezas:
+
+1. Las regiones se reparten entre las islas en proporción a su tamaño; las
+   islas demasiado pequeñas para recibir una región se agregan al final a la
+   región más pequeña (es la única forma en que una región no es conexa).
+2. Dentro de cada isla, las semillas se reparten entre los sectores en
+   proporción a sus piezas; en cada sector se elige la pieza más alejada de
+   las semillas ya elegidas, para que las regiones no nazcan juntas.
+3. Las regiones crecen a la vez desde sus semillas (siempre la más pequeña
+   primero) por piezas vecinas, prefiriendo las de su mismo sector.
+
+`region_joins` elige, para unir las regiones ya armadas, una conexión por
+cada par de regiones unidas en un árbol que recorre las regiones de cada isla.
+
+Como `utils.graph`, no depende de la base de datos.
+"""
+
+import heapq
+from array import array
+from collections import deque
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from utils.graph import PuzzleGraph, connected_components
+
+
+class Partition(NamedTuple):
+    """labels[i]: región de la pieza i; seeds[r]: pieza semilla de la región r."""
+    labels: array
+    seeds: List[int]
+
+    @property
+    def count(self) -> int:
+        return len(self.seeds)
+
+
+# Unión entre regiones: (región base, región que se une, pieza base, pieza que se une, edgeId)
+RegionJoin = Tuple[int, int, int, int, int]
+
+
+def partition_regions(graph: PuzzleGraph, k: int, start: Optional[int] = None) -> Partition:
+    """
+    Divide el grafo en hasta `k` regiones (nunca más que piezas). Si se indica
+    `start`, esa pieza es la semilla de la región 0.
+    """
+    n = len(graph)
+    labels = array("i", [-1]) * n
+    if n == 0:
+        return Partition(labels, [])
+    k = max(1, min(int(k), n))
+
+    components, count = connected_components(graph)
+    islands: List[List[int]] = [[] for _ in range(count)]
+    for i in range(n):
+        islands[components[i]].append(i)
+    # La isla de `start` primero; el resto, de mayor a menor
+    first = components[start] if start is not None else None
+    order = sorted(range(count), key=lambda c: (c != first, -len(islands[c]), c))
+    quotas = _apportion(k, [len(islands[c]) for c in order])
+    if quotas[0] == 0:
+        # La isla de `start` siempre tiene región propia
+        quotas[quotas.index(max(quotas))] -= 1
+        quotas[0] = 1
+
+    seeds: List[int] = []
+    loose: List[List[int]] = []
+    for c, quota in zip(order, quotas):
+        members = islands[c]
+        if quota == 0:
+            loose.append(members)
+            continue
+        island_start = start if c == first else None
+        island_seeds = _choose_seeds(graph, members, quota, island_start)
+        _grow(graph, island_seeds, labels, len(seeds))
+        seeds.extend(island_seeds)
+
+    # Islas sueltas: a la región más pequeña en cada momento
+    sizes = [0] * len(seeds)
+    for i in range(n):
+        if labels[i] >= 0:
+            sizes[labels[i]] += 1
+    heap = [(size, r) for r, size in enumerate(sizes)]
+    heapq.heapify(heap)
+    for members in loose:
+        size, r = heapq.heappop(heap)
+        for i in members:
+            labels[i] = r
+        heapq.heappush(heap, (size + len(members), r))
+    return Partition(labels, seeds)
+
+
+def region_joins(graph: PuzzleGraph, partition: Partition) -> List[RegionJoin]:
+    """
+    Conexiones para unir las regiones: recorre en anchura el grafo de
+    regiones desde la región 0 (y desde la primera de cada isla restante) y,
+    por cada región nueva, toma la primera conexión que la une a la región
+    desde la que se alcanzó.
+    """
+    labels = partition.labels
+    links: Dict[int, Dict[int, Tuple[int, int, int]]] = {}
+    for u in range(len(graph)):
+        ru = labels[u]
+        for k in range(graph.offsets[u], graph.offsets[u + 1]):
+            v = graph.targets[k]
+            rv = labels[v]
+            if rv != ru:
+                links.setdefault(ru, {}).setdefault(rv, (u, v, graph.edge_ids[k]))
+
+    joins: List[RegionJoin] = []
+    visited = bytearray(partition.count)
+    for root in range(partition.count):
+        if visited[root]:
+            continue
+        visited[root] = 1
+        queue = deque([root])
+        while queue:
+            r = queue.popleft()
+            for s, (u, v, edge_id) in sorted(links.get(r, {}).items()):
+                if not visited[s]:
+                    visited[s] = 1
+                    joins.append((r, s, u, v, edge_id))
+                    queue.append(s)
+    return joins
+
+
+def _apportion(total: int, weights: List[int]) -> List[int]:
+    """Reparte `total` en proporción a `weights` (método del resto mayor)."""
+    weight_sum = sum(weights)
+    exact = [total * w / weight_sum for w in weights]
+    shares = [int(x) for x in exact]
+    remainders = sorted(range(len(weights)), key=lambda i: (shares[i] - exact[i], i))
+    for i in remainders[:total - sum(shares)]:
+        shares[i] += 1
+    return shares
+
+
+def _choose_seeds(
+    graph: PuzzleGraph, members: List[int], quota: int, start: Optional[int]
+) -> List[int]:
+    """Semillas de una isla: repartidas por sector y alejadas entre sí."""
+    by_sector: Dict[int, List[int]] = {}
+    for i in members:
+        by_sector.setdefault(graph.sectors[i], []).append(i)
+    sectors = sorted(by_sector, key=lambda s: (-len(by_sector[s]), s))
+    per_sector = dict(zip(sectors, _apportion(quota, [len(by_sector[s]) for s in sectors])))
+
+    seeds: List[int] = []
+    distance = array("q", [len(graph)]) * len(graph)
+    if start is not None:
+        seeds.append(start)
+        sector = graph.sectors[start]
+        if per_sector[sector] == 0:
+            sector = max(per_sector, key=lambda s: per_sector[s])
+        per_sector[sector] -= 1
+        _relax(graph, start, distance)
+
+    for sector in sectors:
+        for _ in range(per_sector[sector]):
+            # La pieza del sector más lejana de las semillas ya elegidas
+            candidates = by_sector[sector]
+            seed = max(candidates, key=lambda i: distance[i]) if seeds else candidates[0]
+            if distance[seed] == 0:
+                break  # el sector ya no tiene piezas libres
+            seeds.append(seed)
+            _relax(graph, seed, distance)
+    return seeds
+
+
+def _relax(graph: PuzzleGraph, source: int, distance: array) -> None:
+    """Actualiza `distance` (a la semilla más cercana) con una BFS desde `source`."""
+    offsets, targets = graph.offsets, graph.targets
+    distance[source] = 0
+    queue = deque([source])
+    while queue:
+        u = queue.popleft()
+        d = distance[u] + 1
+        for k in range(offsets[u], offsets[u + 1]):
+            v = targets[k]
+            if d < distance[v]:
+                distance[v] = d
+                queue.append(v)
+
+
+def _grow(graph: PuzzleGraph, seeds: List[int], labels: array, first_label: int) -> None:
+    """
+    Crecimiento simultáneo desde las semillas: en cada paso la región más
+    pequeña toma una pieza libre vecina, primero de su sector y luego de otros.
+    """
+    offsets, targets, sectors = graph.offsets, graph.targets, graph.sectors
+    same = [deque() for _ in seeds]
+    other = [deque() for _ in seeds]
+    heap = []
+
+    def claim(r: int, u: int) -> None:
+        labels[u] = first_label + r
+        home = sectors[seeds[r]]
+        for k in range(offsets[u], offsets[u + 1]):
+            v = targets[k]
+            if labels[v] < 0:
+                (same if sectors[v] == home else other)[r].append(v)
+
+    for r, seed in enumerate(seeds):
+        claim(r, seed)
+        heap.append((1, r))
+    heapq.heapify(heap)
+
+    while heap:
+        size, r = heapq.heappop(heap)
+        piece = -1
+        for frontier in (same[r], other[r]):
+            while frontier:
+                v = frontier.popleft()
+                if labels[v] < 0:
+                    piece = v
+                    break
+            if piece >= 0:
+                break
+        if piece < 0:
+            continue  # la región no puede crecer más
+        claim(r, piece)
+        heapq.heappush(heap, (size + 1, r))
@@ -0,0 +1,205 @@
+# utils/plan_patch.py
+"""
+Mantenimiento incremental de un plan de armado cuando cambia una sola pieza.
+
+Un plan es un bosque de recorrido en orden: cada isla empieza con
+(raíz, None, None) y cada arista (pieza, conexión, pieza base) coloca una
+pieza junto a otra ya colocada. Al cambiar los vecinos de una pieza basta
+con reparar lo que toca ese cambio:
+
+- Pieza nueva: se une al final de la isla de su primer vecino colocado o,
+  si no tiene vecinos, forma una isla nueva.
+- Conexiones añadidas dentro de la misma isla: el plan sigue siendo válido
+  (solo se actualizan los edgeIds de las aristas del plan que la tocan).
+- Conexiones quitadas que el plan no usaba: ídem.
+- Conexiones quitadas que el plan usaba: el subárbol que colgaba de ellas se
+  quita del plan y se vuelve a unir por otra conexión con lo ya colocado (al
+  final de esa isla); lo que no se pueda unir pasa a ser una isla nueva.
+
+Solo se leen los enlaces de las piezas afectadas (`links_touching`). Si el
+cambio une dos islas, o el subárbol afectado supera `max_affected` piezas,
+se devuelve None y el llamante recalcula el plan completo.
+
+El plan reparado es válido, pero no tiene por qué coincidir con el que daría
+un recorrido nuevo (las partes reparadas se recorren en profundidad, sea
+cual sea la estrategia del plan).
+"""
+
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+PlanEdge = Tuple[str, Optional[int], Optional[str]]
+# Enlaces tal como los guarda `piece_links`: {fromCode, edgeId, toCode}
+LinksLoader = Callable[[List[str]], List[dict]]
+
+
+def patch_plan(
+    plan: List[PlanEdge],
+    code: str,
+    old_links: Iterable[Tuple[int, str]],
+    links_touching: LinksLoader,
+    max_affected: int
+) -> Optional[List[PlanEdge]]:
+    """
+    Repara `plan` tras cambiar los enlaces de la pieza `code`. `old_links`
+    son los (edgeId, vecino) que la pieza declaraba antes del cambio;
+    `links_touching` lee los enlaces vigentes de un grupo de piezas.
+    Devuelve el plan reparado o None si hay que recalcularlo entero.
+    """
+    patcher = _Patcher(plan, links_touching)
+    return patcher.apply(code, old_links, max_affected)
+
+
+class _Patcher:
+    def __init__(self, plan: List[PlanEdge], links_touching: LinksLoader):
+        self.links_touching = links_touching
+        self.islands: List[List[PlanEdge]] = []
+        self.island_of: Dict[str, int] = {}
+        self.position: Dict[str, int] = {}
+        for i, (child, k, parent) in enumerate(plan):
+            if parent is None:
+                self.islands.append([])
+            self.islands[-1].append((child, k, parent))
+            self.island_of[child] = len(self.islands) - 1
+            self.position[child] = i
+        # (desde, hacia) -> edgeId declarado por `desde`
+        self.declared: Dict[Tuple[str, str], int] = {}
+        self.adjacency: Dict[str, Set[str]] = {}
+
+    def apply(
+        self, code: str, old_links: Iterable[Tuple[int, str]], max_affected: int
+    ) -> Optional[List[PlanEdge]]:
+        self._load([code], mapped=set(self.island_of) | {code})
+        placed = self.island_of
+        new_adjacent = self.adjacency.get(code, set())
+
+        if code not in placed:
+            if not new_adjacent:
+                self.islands.append([(code, None, None)])
+                return self._flatten()
+            islands = {placed[p] for p in new_adjacent}
+            if len(islands) > 1:
+                return None  # la pieza nueva une dos islas
+            base = min(new_adjacent, key=self.position.__getitem__)
+            self.islands[placed[base]].append((code, self._edge_id(base, code), base))
+            return self._flatten()
+
+        # Vecinos antes del cambio: lo que declaraba la pieza y lo que
+        # declaran las demás hacia ella (eso no ha cambiado)
+        declared_by_others = {f for (f, t) in self.declared if t == code and f != code}
+        old_adjacent = ({t for _, t in old_links} | declared_by_others) & set(placed)
+        old_adjacent.discard(code)
+        if any(placed[p] != placed[code] for p in new_adjacent - old_adjacent):
+            return None  # el cambio une dos islas
+
+        removed = old_adjacent - new_adjacent
+        cut = [
+            child for child, parent in self._tree_edges_of(code)
+            if (parent if child == code else child) in removed
+        ]
+        if not cut:
+            self._refresh_edge_ids(code)
+            return self._flatten()
+
+        detached = self._subtrees(cut)
+        if len(detached) > max_affected:
+            return None
+        self._load(sorted(detached), mapped=set(placed))
+        for i, island in enumerate(self.islands):
+            if any(child in detached for child, _, _ in island):
+                self.islands[i] = [e for e in island if e[0] not in detached]
+        self._refresh_edge_ids(code)
+        self._reattach(detached)
+        return self._flatten()
+
+    # ─── E N L A C E S ──────────────────────────────────────────────────────
+
+    def _load(self, codes: List[str], mapped: Set[str]) -> None:
+        """Lee los enlaces de `codes` y los añade a la adyacencia (solo piezas mapeadas)."""
+        for link in self.links_touching(codes):
+            f, t = link["fromCode"], link["toCode"]
+            if f == t or f not in mapped or t not in mapped:
+                continue
+            key = (f, t)
+            if key not in self.declared or link["edgeId"] < self.declared[key]:
+                self.declared[key] = link["edgeId"]
+            self.adjacency.setdefault(f, set()).add(t)
+            self.adjacency.setdefault(t, set()).add(f)
+
+    def _edge_id(self, parent: str, child: str) -> int:
+        """Conexión de una arista del plan, como en `PuzzleGraph` (-k si solo la declara `child`)."""
+        k = self.declared.get((parent, child))
+        return k if k is not None else -self.declared[(child, parent)]
+
+    # ─── Á R B O L ──────────────────────────────────────────────────────────
+
+    def _tree_edges_of(self, code: str) -> List[Tuple[str, str]]:
+        """Aristas del plan (hijo, padre) que tocan `code`."""
+        edges = [(child, parent) for child, _, parent in self._edges() if code in (child, parent)]
+        return [(c, p) for c, p in edges if p is not None]
+
+    def _subtrees(self, roots: List[str]) -> Set[str]:
+        children: Dict[str, List[str]] = {}
+        for child, _, parent in self._edges():
+            if parent is not None:
+                children.setdefault(parent, []).append(child)
+        detached: Set[str] = set()
+        stack = list(roots)
+        while stack:
+            u = stack.pop()
+            if u not in detached:
+                detached.add(u)
+                stack.extend(children.get(u, ()))
+        return detached
+
+    def _refresh_edge_ids(self, code: str) -> None:
+        """Actualiza el edgeId de las aristas del plan que tocan `code`."""
+        for island in self.islands:
+            for i, (child, k, parent) in enumerate(island):
+                if parent is not None and code in (child, parent):
+                    island[i] = (child, self._edge_id(parent, child), parent)
+
+    def _reattach(self, detached: Set[str]) -> None:
+        """
+        Vuelve a colocar las piezas de `detached`: cada grupo conexo se une por
+        su primera conexión con lo ya colocado; los que no tienen ninguna
+        forman islas nuevas al final del plan.
+        """
+        order = sorted(detached, key=lambda c: self.position.get(c, len(self.position)))
+        pending = set(detached)
+        progress = True
+        while pending and progress:
+            progress = False
+            for x in order:
+                if x not in pending:
+                    continue
+                anchors = [y for y in self.adjacency.get(x, ()) if y not in pending]
+                if anchors:
+                    base = min(anchors, key=lambda y: self.position.get(y, len(self.position)))
+                    island = self.islands[self.island_of[base]]
+                    island.append((x, self._edge_id(base, x), base))
+                    island.extend(self._grow(x, pending))
+                    progress = True
+        for x in order:
+            if x in pending:
+                self.islands.append([(x, None, None)] + self._grow(x, pending))
+
+    def _grow(self, root: str, pending: Set[str]) -> List[PlanEdge]:
+        """Recorrido en profundidad desde `root` sobre las piezas pendientes."""
+        pending.discard(root)
+        edges: List[PlanEdge] = []
+        stack = [root]
+        while stack:
+            u = stack.pop()
+            for v in sorted(self.adjacency.get(u, ()), key=lambda c: self.position.get(c, 0)):
+                if v in pending:
+                    pending.discard(v)
+                    edges.append((v, self._edge_id(u, v), u))
+                    stack.append(v)
+        return edges
+
+    def _edges(self) -> Iterable[PlanEdge]:
+        for island in self.islands:
+            yield from island
+
+    def _flatten(self) -> List[PlanEdge]:
+        return [edge for island in self.islands for edge in island]
@@ -0,0 +1,390 @@
+# utils/snapshot.py
+"""
+Snapshot binario de un puzzle completo: un solo archivo, versionado, que se
+abre con `mmap` sin analizar pieza por pieza.
+
+El archivo guarda el mismo CSR que `PuzzleGraph` (ver `utils.graph`), en
+little-endian y con cada sección alineada a 8 bytes:
+
+    cabecera    magic, versión, nº de secciones, piezas, enlaces, conexiones libres
+    índice      (offset, bytes) de cada sección, en el orden de SECTIONS
+    meta        JSON con los datos del puzzle y la tabla de nombres de sector
+    códigos     tabla de cadenas: offsets (q) + bytes UTF-8 concatenados, y
+                los ids ordenados por código (búsqueda binaria sin diccionario)
+    grafo       sectors (H), offsets (q), targets (i), edge_ids (h), edge_types (b)
+    libres      conexiones declaradas que no llevan a una pieza mapeada:
+                offsets por pieza (q), edgeId (h), tipo (b) y código del
+                vecino sin mapear (tabla de cadenas; vacío = sin vecino)
+
+Al abrirlo, cada sección es una vista `memoryview` sobre el archivo mapeado:
+el grafo resultante (`SnapshotGraph`) sirve tal cual a `utils.traversal` y a
+las instrucciones, y los códigos se decodifican solo cuando se leen. Con las
+conexiones libres, `Snapshot.piece_documents` reconstruye los documentos de
+piezas originales para importarlos de nuevo.
+"""
+
+import json
+import mmap
+import struct
+import sys
+from array import array
+from collections.abc import Mapping, Sequence
+from typing import IO, Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from utils.graph import EDGE_TYPE_NAMES, EDGE_TYPES, UNKNOWN_EDGE_TYPE, PuzzleGraph
+
+MAGIC = b"PZSNAP\r\n"
+VERSION = 1
+
+# Secciones del archivo, en orden, con el tipo de `array` de sus elementos
+SECTIONS: Tuple[Tuple[str, str], ...] = (
+    ("meta", "B"),
+    ("code_offsets", "q"),
+    ("code_bytes", "B"),
+    ("code_order", "i"),
+    ("sectors", "H"),
+    ("offsets", "q"),
+    ("targets", "i"),
+    ("edge_ids", "h"),
+    ("edge_types", "b"),
+    ("free_offsets", "q"),
+    ("free_ids", "h"),
+    ("free_types", "b"),
+    ("free_code_offsets", "q"),
+    ("free_code_bytes", "B"),
+)
+
+_HEADER = struct.Struct("<8sHHqqq")   # magic, versión, secciones, piezas, enlaces, libres
+_SECTION = struct.Struct("<qq")       # offset, bytes
+_ALIGN = 8
+_LITTLE = sys.byteorder == "little"
+
+
+class SnapshotError(ValueError):
+    """El archivo no es un snapshot válido o es de una versión no soportada."""
+
+
+# ─── E S C R I T U R A ────────────────────────────────────────────────────────
+
+def write_snapshot(
+    docs: Iterable[Dict[str, Any]], meta: Dict[str, Any], out: IO[bytes]
+) -> int:
+    """
+    Escribe en `out` el snapshot de las piezas `docs` (documentos crudos con
+    al menos code, sector, edges y neighbors; puede ser un cursor) y los
+    metadatos `meta`. Devuelve los bytes escritos.
+    """
+    declared = _DeclaredEdges()
+    graph = PuzzleGraph.from_documents(declared.collect(docs))
+    free = declared.free_edges(graph)
+
+    codes = graph.codes
+    code_offsets, code_bytes = _string_table(codes)
+    code_order = array("i", sorted(range(len(codes)), key=codes.__getitem__))
+    free_code_offsets, free_code_bytes = _string_table(free[3])
+
+    payload = dict(meta, sectorNames=list(graph.sector_names))
+    sections = {
+        "meta": json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8"),
+        "code_offsets": code_offsets,
+        "code_bytes": code_bytes,
+        "code_order": code_order,
+        "sectors": graph.sectors,
+        "offsets": graph.offsets,
+        "targets": graph.targets,
+        "edge_ids": graph.edge_ids,
+        "edge_types": graph.edge_types,
+        "free_offsets": free[0],
+        "free_ids": free[1],
+        "free_types": free[2],
+        "free_code_offsets": free_code_offsets,
+        "free_code_bytes": free_code_bytes,
+    }
+
+    # Las posiciones se conocen de antemano: el archivo se escribe de una pasada
+    position = _align(_HEADER.size + _SECTION.size * len(SECTIONS))
+    table = []
+    for name, _ in SECTIONS:
+        size = _nbytes(sections[name])
+        table.append((position, size))
+        position = _align(position + size)
+
+    out.write(_HEADER.pack(
+        MAGIC, VERSION, len(SECTIONS), len(graph), graph.edge_count, len(free[1])
+    ))
+    for entry in table:
+        out.write(_SECTION.pack(*entry))
+    written = _HEADER.size + _SECTION.size * len(SECTIONS)
+    for (name, _), (offset, size) in zip(SECTIONS, table):
+        out.write(b"\0" * (offset - written))
+        out.write(_little_endian(sections[name]))
+        written = offset + size
+    return written
+
+
+class _DeclaredEdges:
+    """
+    Recoge, al paso de los documentos, las conexiones que declara cada pieza
+    (edgeId, tipo y código del vecino), para saber después cuáles no quedaron
+    en el grafo: las libres.
+    """
+
+    def __init__(self):
+        self.seen = set()
+        self.offsets = array("q", [0])
+        self.ids = array("h")
+        self.types = array("b")
+        self.neighbors: List[str] = []
+
+    def collect(self, docs: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        for d in docs:
+            code = d["code"]
+            # Mismo criterio que PuzzleGraph: cuenta la primera aparición
+            if code not in self.seen:
+                self.seen.add(code)
+                neighbor_of = {nb["edgeId"]: nb.get("neighborCode") for nb in d.get("neighbors") or ()}
+                for e in d.get("edges") or ():
+                    self.ids.append(e["edgeId"])
+                    self.types.append(EDGE_TYPES.get(e.get("type"), UNKNOWN_EDGE_TYPE))
+                    self.neighbors.append(neighbor_of.get(e["edgeId"]) or "")
+                self.offsets.append(len(self.ids))
+            yield d
+
+    def free_edges(self, graph: PuzzleGraph) -> Tuple[array, array, array, List[str]]:
+        offsets = array("q", [0])
+        ids = array("h")
+        types = array("b")
+        neighbors: List[str] = []
+        for i in range(len(graph)):
+            linked = {
+                graph.edge_ids[k] for k in range(graph.offsets[i], graph.offsets[i + 1])
+                if graph.edge_ids[k] > 0
+            }
+            for j in range(self.offsets[i], self.offsets[i + 1]):
+                if self.ids[j] not in linked:
+                    ids.append(self.ids[j])
+                    types.append(self.types[j])
+                    neighbors.append(self.neighbors[j])
+            offsets.append(len(ids))
+        return offsets, ids, types, neighbors
+
+
+def _string_table(strings: Sequence) -> Tuple[array, bytes]:
+    offsets = array("q", [0])
+    chunks = []
+    size = 0
+    for s in strings:
+        encoded = s.encode("utf-8")
+        chunks.append(encoded)
+        size += len(encoded)
+        offsets.append(size)
+    return offsets, b"".join(chunks)
+
+
+def _little_endian(data: Union[array, bytes]) -> Union[array, bytes]:
+    if _LITTLE or not isinstance(data, array) or data.itemsize == 1:
+        return data
+    swapped = array(data.typecode, data)
+    swapped.byteswap()
+    return swapped
+
+
+def _nbytes(data: Union[array, bytes]) -> int:
+    return len(data) * data.itemsize if isinstance(data, array) else len(data)
+
+
+def _align(position: int) -> int:
+    return -(-position // _ALIGN) * _ALIGN
+
+
+# ─── L E C T U R A ────────────────────────────────────────────────────────────
+
+class CodeTable(Sequence):
+    """Códigos de pieza sobre la tabla de cadenas del snapshot (se decodifican al leerlos)."""
+
+    __slots__ = ("offsets", "data")
+
+    def __init__(self, offsets: Sequence, data: memoryview):
+        self.offsets = offsets
+        self.data = data
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("índice de pieza fuera de rango")
+        return str(self.data[self.offsets[i]:self.offsets[i + 1]], "utf-8")
+
+    def __iter__(self) -> Iterator[str]:
+        offsets, data = self.offsets, self.data
+        for i in range(len(self)):
+            yield str(data[offsets[i]:offsets[i + 1]], "utf-8")
+
+
+class CodeIndex(Mapping):
+    """Código -> id por búsqueda binaria sobre los ids ordenados por código."""
+
+    __slots__ = ("codes", "order")
+
+    def __init__(self, codes: CodeTable, order: Sequence):
+        self.codes = codes
+        self.order = order
+
+    def __getitem__(self, code: str) -> int:
+        codes, order = self.codes, self.order
+        # Orden de str == orden de sus bytes UTF-8, así que basta comparar texto
+        lo, hi = 0, len(order)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if codes[order[mid]] < code:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < len(order) and codes[order[lo]] == code:
+            return order[lo]
+        raise KeyError(code)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.codes)
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+
+class SnapshotGraph(PuzzleGraph):
+    """
+    `PuzzleGraph` cuyos arreglos son vistas sobre un snapshot. Al enviarse a
+    otro proceso (p. ej. en `utils.parallel`) no se copian los arreglos: el
+    proceso vuelve a mapear el archivo.
+    """
+
+    __slots__ = ("source",)
+
+    def __reduce__(self):
+        if isinstance(self.source, str):
+            return _reopen_graph, (self.source,)
+        return _reopen_graph, (bytes(self.source),)
+
+
+def _reopen_graph(source: Union[str, bytes]) -> SnapshotGraph:
+    return open_snapshot(source).graph
+
+
+class Snapshot:
+    """
+    Snapshot abierto: `meta` (datos del puzzle), `graph` (grafo sobre el
+    archivo mapeado) y las conexiones libres, necesarias para reconstruir
+    las piezas.
+    """
+
+    __slots__ = ("meta", "graph", "free_offsets", "free_ids", "free_types", "free_codes")
+
+    def __init__(self, meta: Dict[str, Any], graph: SnapshotGraph, free: Dict[str, Any]):
+        self.meta = meta
+        self.graph = graph
+        self.free_offsets = free["free_offsets"]
+        self.free_ids = free["free_ids"]
+        self.free_types = free["free_types"]
+        self.free_codes = CodeTable(free["free_code_offsets"], free["free_code_bytes"])
+
+    def __len__(self) -> int:
+        return len(self.graph)
+
+    def piece_documents(self) -> Iterator[Dict[str, Any]]:
+        """
+        Reconstruye, una a una, las piezas tal como se exportaron (code,
+        sector, edges, neighbors). Los enlaces inversos del grafo (edgeId
+        negativo) no los declaró la pieza y no se incluyen.
+        """
+        graph = self.graph
+        codes = graph.codes
+        for i in range(len(graph)):
+            connections: Dict[int, Tuple[int, Optional[str]]] = {}
+            for k in range(graph.offsets[i], graph.offsets[i + 1]):
+                edge_id = graph.edge_ids[k]
+                if edge_id > 0:
+                    connections.setdefault(edge_id, (graph.edge_types[k], codes[graph.targets[k]]))
+            for j in range(self.free_offsets[i], self.free_offsets[i + 1]):
+                connections.setdefault(
+                    self.free_ids[j], (self.free_types[j], self.free_codes[j] or None)
+                )
+            edge_ids = sorted(connections)
+            yield {
+                "code": codes[i],
+                "sector": graph.sector_of(i),
+                "edges": [
+                    {"edgeId": k, "type": EDGE_TYPE_NAMES[connections[k][0]]}
+                    for k in edge_ids if connections[k][0] != UNKNOWN_EDGE_TYPE
+                ],
+                "neighbors": [
+                    {"edgeId": k, "neighborCode": connections[k][1]} for k in edge_ids
+                ],
+            }
+
+
+def open_snapshot(source: Union[str, bytes, bytearray, memoryview]) -> Snapshot:
+    """
+    Abre un snapshot desde una ruta (se mapea con `mmap`, de solo lectura)
+    o desde un buffer ya en memoria (p. ej. un archivo subido). Solo se leen
+    la cabecera y el JSON de metadatos; el resto son vistas sin copia.
+    """
+    if isinstance(source, str):
+        with open(source, "rb") as f:
+            buffer = memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+    else:
+        buffer = memoryview(source).cast("B")
+
+    if len(buffer) < _HEADER.size:
+        raise SnapshotError("El archivo es demasiado corto para ser un snapshot.")
+    magic, version, section_count, pieces, links, free_count = _HEADER.unpack_from(buffer)
+    if magic != MAGIC:
+        raise SnapshotError("El archivo no es un snapshot de puzzle.")
+    if version != VERSION or section_count != len(SECTIONS):
+        raise SnapshotError(f"Versión de snapshot no soportada: {version}.")
+
+    expected = {
+        "code_offsets": pieces + 1, "code_order": pieces, "sectors": pieces,
+        "offsets": pieces + 1, "targets": links, "edge_ids": links, "edge_types": links,
+        "free_offsets": pieces + 1, "free_ids": free_count, "free_types": free_count,
+        "free_code_offsets": free_count + 1,
+    }
+    views: Dict[str, Any] = {}
+    for s, (name, typecode) in enumerate(SECTIONS):
+        offset, size = _SECTION.unpack_from(buffer, _HEADER.size + s * _SECTION.size)
+        if offset < 0 or size < 0 or offset + size > len(buffer):
+            raise SnapshotError(f"Sección '{name}' fuera del archivo.")
+        view = _typed_view(buffer[offset:offset + size], typecode)
+        if name in expected and len(view) != expected[name]:
+            raise SnapshotError(f"Sección '{name}' con tamaño inesperado.")
+        views[name] = view
+
+    meta = json.loads(str(views.pop("meta"), "utf-8"))
+    codes = CodeTable(views["code_offsets"], views["code_bytes"])
+    graph = SnapshotGraph(
+        codes,
+        meta.pop("sectorNames"),
+        views["sectors"],
+        views["offsets"],
+        views["targets"],
+        views["edge_ids"],
+        views["edge_types"],
+        index=CodeIndex(codes, views["code_order"]),
+    )
+    graph.source = source if isinstance(source, str) else buffer
+    return Snapshot(meta, graph, views)
+
+
+def _typed_view(raw: memoryview, typecode: str) -> Union[memoryview, array]:
+    if typecode == "B":
+        return raw
+    if _LITTLE:
+        return raw.cast(typecode)
+    # Máquina big-endian: copia con los bytes invertidos
+    data = array(typecode, raw.tobytes())
+    data.byteswap()
+    return data
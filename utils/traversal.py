@@ -1,13 +1,23 @@
 # utils/traversal.py
 """
-Funciones de recorrido de piezas (DFS) sobre un grafo de rompecabezas.
+Motor de recorrido de piezas sobre un grafo de rompecabezas.
 
-`dfs_traverse()` permite recorrer piezas desde una inicial y aplicar lógica personalizada
-al visitar cada conexión entre piezas.
+Los recorridos son iterativos (pila/cola explícita), por lo que no dependen
+del límite de recursión de Python y soportan cadenas de millones de piezas.
+Trabajan sobre un `PuzzleGraph` (ids enteros y adyacencia CSR): los códigos
+se resuelven una sola vez al construir el grafo y el recorrido nunca vuelve a
+hashear un código por arista.
+
+Estrategias disponibles:
+- "dfs":    profundidad, mismo orden que el DFS recursivo original.
+- "bfs":    anchura, por capas alrededor de la pieza inicial.
+- "sector": profundidad que completa el sector actual antes de cruzar a otro.
 """
 
-from typing import Dict, List, Set, Optional
+from collections import deque
+from typing import Callable, Iterator, List, Optional, Tuple
 from models.piece import Piece
+from utils.graph import PuzzleGraph
 
 # Mapeo de edgeId a nombre de dirección (reutilizado por instruction_service)
 EDGE_DIRECTION = {
@@ -17,38 +27,154 @@ EDGE_DIRECTION = {
     4: "oeste"
 }
 
+STRATEGIES = ("dfs", "bfs", "sector")
+
+# Visitante: recibe (padre, hijo, edgeId) por cada arista del árbol de recorrido
+Visitor = Callable[[int, int, int], None]
+# Arista del árbol de recorrido: (padre, hijo, edgeId)
+TreeEdge = Tuple[int, int, int]
+
+def iter_traverse(graph: PuzzleGraph, start: int, strategy: str = "dfs") -> Iterator[TreeEdge]:
+    """
+    Recorre el grafo desde la pieza `start` (id entero) de forma perezosa:
+    produce (padre, hijo, edgeId) cada vez que se alcanza una pieza nueva,
+    sin calcular el resto del recorrido hasta que se pida.
+    """
+    if strategy == "dfs":
+        return _dfs(graph, start)
+    if strategy == "bfs":
+        return _bfs(graph, start)
+    if strategy == "sector":
+        return _sector_first(graph, start)
+    raise ValueError(f"Estrategia de recorrido desconocida: '{strategy}'.")
+
+def traverse(
+    graph: PuzzleGraph,
+    start: int,
+    on_visit: Optional[Visitor] = None,
+    strategy: str = "dfs"
+) -> List[int]:
+    """
+    Recorre el grafo desde la pieza `start` (id entero) con la estrategia indicada.
+    - on_visit: función opcional llamada con (padre, hijo, edgeId) cada vez
+      que se alcanza una pieza nueva; útil para generar instrucciones.
+    Devuelve los ids visitados en orden de visita.
+    """
+    order = [start]
+    for parent, child, edge_id in iter_traverse(graph, start, strategy):
+        order.append(child)
+        if on_visit:
+            on_visit(parent, child, edge_id)
+    return order
+
 def dfs_traverse(
     pieces: List[Piece],
     start_code: str,
-    on_visit: Optional[callable] = None
+    on_visit: Optional[Callable[[Piece, Piece, int], None]] = None,
+    strategy: str = "dfs"
 ) -> None:
     """
-    Recorrido en profundidad (DFS) sobre el grafo de piezas.
-    - pieces: lista de Piece con 'code' y 'neighbors'
-    - start_code: código de la pieza inicial
+    Recorrido sobre una lista de Piece, identificando piezas por código.
     - on_visit: función opcional que recibe (current: Piece, neighbor: Piece, edgeId: int)
       por cada arista recorrida; útil para generar instrucciones.
     """
-    code_map: Dict[str, Piece] = {p.code: p for p in pieces}
-    id_map:   Dict[str, str]   = {p.id:   p.code for p in pieces}
-    visited: Set[str] = set()
+    graph = PuzzleGraph.from_pieces(pieces)
+    start = graph.id_of(start_code)
+    if start is None:
+        raise ValueError(f"Pieza inicial '{start_code}' no encontrada.")
 
-    def _dfs(current_code: str):
-        visited.add(current_code)
-        current_piece = code_map[current_code]
+    visitor = None
+    if on_visit:
+        by_code = {p.code: p for p in pieces}
+        visitor = lambda parent, child, edge_id: on_visit(
+            by_code[graph.codes[parent]], by_code[graph.codes[child]], edge_id
+        )
+    traverse(graph, start, visitor, strategy)
 
-        for nb in current_piece.neighbors:
-            if not nb.neighborPiece:
-                continue
-            neighbor_code = id_map.get(nb.neighborPiece)
-            if not neighbor_code or neighbor_code in visited:
+# ─── E S T R A T E G I A S ────────────────────────────────────────────────────
+
+def _dfs(graph: PuzzleGraph, start: int) -> Iterator[TreeEdge]:
+    # Pila de (pieza, posición del siguiente vecino a revisar): reproduce el
+    # orden exacto del DFS recursivo sin consumir marcos de la pila de Python.
+    offsets, targets, edge_ids = graph.offsets, graph.targets, graph.edge_ids
+    visited = bytearray(len(graph))
+    visited[start] = 1
+    stack = [start]
+    positions = [offsets[start]]
+
+    while stack:
+        current = stack[-1]
+        end = offsets[current + 1]
+        i = positions[-1]
+        while i < end and visited[targets[i]]:
+            i += 1
+        if i == end:
+            stack.pop()
+            positions.pop()
+            continue
+
+        positions[-1] = i + 1
+        neighbor = targets[i]
+        visited[neighbor] = 1
+        yield current, neighbor, edge_ids[i]
+        stack.append(neighbor)
+        positions.append(offsets[neighbor])
+
+def _bfs(graph: PuzzleGraph, start: int) -> Iterator[TreeEdge]:
+    offsets, targets, edge_ids = graph.offsets, graph.targets, graph.edge_ids
+    visited = bytearray(len(graph))
+    visited[start] = 1
+    queue = deque([start])
+
+    while queue:
+        current = queue.popleft()
+        for i in range(offsets[current], offsets[current + 1]):
+            neighbor = targets[i]
+            if visited[neighbor]:
                 continue
+            visited[neighbor] = 1
+            yield current, neighbor, edge_ids[i]
+            queue.append(neighbor)
 
-            if on_visit:
-                on_visit(current_piece, code_map[neighbor_code], nb.edgeId)
+def _sector_first(graph: PuzzleGraph, start: int) -> Iterator[TreeEdge]:
+    # DFS que no cruza de sector mientras queden piezas del sector actual;
+    # las aristas hacia otros sectores se aplazan y se retoman en orden FIFO.
+    offsets, targets, edge_ids = graph.offsets, graph.targets, graph.edge_ids
+    sectors = graph.sectors
+    visited = bytearray(len(graph))
+    deferred = deque([(-1, start, 0)])
 
-            _dfs(neighbor_code)
+    while deferred:
+        parent, root, root_edge = deferred.popleft()
+        if visited[root]:
+            continue
+        visited[root] = 1
+        if parent >= 0:
+            yield parent, root, root_edge
 
-    if start_code not in code_map:
-        raise ValueError(f"Pieza inicial '{start_code}' no encontrada.")
-    _dfs(start_code)
+        stack = [root]
+        positions = [offsets[root]]
+        while stack:
+            current = stack[-1]
+            end = offsets[current + 1]
+            i = positions[-1]
+            while i < end:
+                neighbor = targets[i]
+                if visited[neighbor]:
+                    i += 1
+                elif sectors[neighbor] != sectors[current]:
+                    deferred.append((current, neighbor, edge_ids[i]))
+                    i += 1
+                else:
+                    break
+            if i == end:
+                stack.pop()
+                positions.pop()
+                continue
+
+            positions[-1] = i + 1
+            neighbor = targets[i]
+            visited[neighbor] = 1
+            yield current, neighbor, edge_ids[i]
+            stack.append(neighbor)
+            positions.append(offsets[neighbor])